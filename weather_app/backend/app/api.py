@@ -1,16 +1,86 @@
-from fastapi import FastAPI, HTTPException, Query, Depends, APIRouter
+from fastapi import FastAPI, HTTPException, Query, Depends, APIRouter, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+from typing import Callable, Hashable, List, Optional, Dict, Any, Tuple
+import base64
+import binascii
 import datetime
 import json
-from . import models, database, scraper, ml_model
+import os
+import secrets
+import time
+from . import (
+    models, database, scraper, ml_model, http_client, jobs, features, response_cache, export, serialization,
+    executors, metrics, profiling,
+)
 
 router = APIRouter()
 
+async def run_blocking(pool: executors.BoundedExecutor, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Выполнение блокирующего вызова в пуле; 503, если очередь пула заполнена."""
+    try:
+        return await pool.run(func, *args, **kwargs)
+    except executors.PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def cached_response(
+    request: Request,
+    key: Hashable,
+    city: Optional[str],
+    build: Callable[[], Any],
+    media_types: Tuple[str, ...] = (serialization.JSON_MEDIA_TYPE,),
+    pool: executors.BoundedExecutor = executors.io_pool,
+) -> Response:
+    """
+    Ответ из кэша или от build() с заголовком ETag.
+    
+    build() возвращает данные ответа или пару (данные, дополнительные заголовки);
+    build() и сериализация выполняются в пуле pool, не блокируя цикл событий.
+    Формат выбирается из media_types по заголовку Accept и входит в ключ кэша.
+    Если ETag совпадает с If-None-Match, возвращается 304 без тела.
+    Ошибки build() (HTTPException) не кэшируются.
+    """
+    try:
+        media_type = serialization.negotiate(request.headers.get("accept"), media_types)
+    except serialization.NotAcceptableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    
+    cache = response_cache.response_cache
+    key = (key, media_type)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation(city)
+        
+        def render():
+            content, extra_headers = build(), None
+            if isinstance(content, tuple):
+                content, extra_headers = content
+            return serialization.encode(media_type, content), extra_headers
+        
+        body, extra_headers = await run_blocking(pool, render)
+        entry = cache.put(key, body, city, generation, extra_headers)
+    
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if len(media_types) > 1:
+        headers["Vary"] = "Accept"
+    if response_cache.etag_matches(request.headers.get("if-none-match"), entry.etag):
+        cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=media_type, headers=headers)
+
+# Форматы ответа /weather (первый - по умолчанию)
+WEATHER_MEDIA_TYPES = (
+    serialization.JSON_MEDIA_TYPE,
+    serialization.MSGPACK_MEDIA_TYPE,
+    serialization.ARROW_MEDIA_TYPE,
+)
+
 # Получение всех городов в базе
 @router.get("/cities", response_model=List[str])
-async def get_cities():
-    return database.get_all_cities()
+async def get_cities(request: Request):
+    return await cached_response(request, ("cities",), None, database.get_all_cities)
 
 # Скрапинг данных о погоде для указанного города
 @router.post("/scrape", response_model=models.ScrapingResponse)
@@ -18,11 +88,15 @@ async def scrape_weather(
     city: str = Query(..., description="Название города"),
     start_date: Optional[datetime.date] = Query(None, description="Начальная дата для сбора данных"),
     end_date: Optional[datetime.date] = Query(None, description="Конечная дата для сбора данных"),
-    disable_limit: bool = Query(True, description="Отключить ограничение на количество дней")
+    disable_limit: bool = Query(True, description="Отключить ограничение на количество дней"),
+    incremental: bool = Query(False, description="Собирать только даты, данных за которые нет в БД"),
+    refresh_days: int = Query(0, ge=0, description="Сколько последних дней периода собрать заново в инкрементном режиме")
 ):
     try:
         
-        log_id = database.save_scraping_log(
+        log_id = await run_blocking(
+            executors.io_pool,
+            database.save_scraping_log,
             city=city,
             start_date=start_date or (datetime.date.today() - datetime.timedelta(days=9)),
             end_date=end_date or datetime.date.today(),
@@ -30,49 +104,74 @@ async def scrape_weather(
             message="Начало сбора данных"
         )
         
-        # Выполняем скрапинг
+        # Выполняем скрапинг: сбор идёт в пуле ввода-вывода в собственном цикле
+        # событий потока, поэтому генерация и проверка данных не задерживают другие запросы
+        # Собранные строки остаются проверенными записями до сохранения: объекты WeatherData не нужны
         try:
-            data = scraper.scrape_weather_data(
-                city=city, 
-                start_date=start_date, 
-                end_date=end_date, 
-                disable_limit=disable_limit
-            )
-            
-            # Если нет данных, возвращаем ошибку
-            if not data:
-                database.save_scraping_log(
-                    city=city,
-                    start_date=start_date or (datetime.date.today() - datetime.timedelta(days=9)),
-                    end_date=end_date or datetime.date.today(),
-                    status="error",
-                    message=f"Не удалось получить данные о погоде для города {city}"
+            period_start, period_end = scraper.resolve_period(start_date, end_date)
+            if incremental:
+                plan = await run_blocking(
+                    executors.io_pool, scraper.plan_incremental_scrape, city, period_start, period_end, refresh_days
+                )
+                data = await run_blocking(executors.io_pool, scraper.scrape_weather_records, city, plan.ranges)
+                skipped = plan.skipped
+            else:
+                data = await run_blocking(
+                    executors.io_pool, scraper.scrape_weather_records, city, [(period_start, period_end)]
                 )
-                raise HTTPException(status_code=404, detail=f"Не удалось получить данные о погоде для города {city}")
+                skipped = 0
+                
+                # Если нет данных, возвращаем ошибку
+                if not data:
+                    await run_blocking(
+                        executors.io_pool,
+                        database.save_scraping_log,
+                        city=city,
+                        start_date=start_date or (datetime.date.today() - datetime.timedelta(days=9)),
+                        end_date=end_date or datetime.date.today(),
+                        status="error",
+                        message=f"Не удалось получить данные о погоде для города {city}"
+                    )
+                    raise HTTPException(status_code=404, detail=f"Не удалось получить данные о погоде для города {city}")
             
             # Сохраняем полученные данные в базу
-            weather_id = database.save_weather_data(data)
+            saved = await run_blocking(executors.io_pool, database.upsert_weather_data, data)
+            message = (
+                f"Успешно собрано {len(data)} записей "
+                f"(пропущено {skipped}, обновлено {saved['updated']})"
+            )
             
             # Регистрируем успешное завершение операции
-            database.save_scraping_log(
+            await run_blocking(
+                executors.io_pool,
+                database.save_scraping_log,
                 city=city,
                 start_date=start_date or (datetime.date.today() - datetime.timedelta(days=9)),
                 end_date=end_date or datetime.date.today(),
                 status="success",
-                message=f"Успешно собрано {len(data)} записей"
+                message=message,
+                fetched=len(data),
+                skipped=skipped,
+                updated=saved["updated"]
             )
             
             return models.ScrapingResponse(
                 success=True,
                 city=city,
                 data_points=len(data),
-                weather_id=weather_id,
-                message=f"Успешно собрано {len(data)} записей"
+                weather_id=saved["last_id"],
+                fetched=len(data),
+                skipped=skipped,
+                updated=saved["updated"]
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
           
-            database.save_scraping_log(
+            await run_blocking(
+                executors.io_pool,
+                database.save_scraping_log,
                 city=city,
                 start_date=start_date or (datetime.date.today() - datetime.timedelta(days=9)),
                 end_date=end_date or datetime.date.today(),
@@ -81,52 +180,140 @@ async def scrape_weather(
             )
             raise HTTPException(status_code=500, detail=f"Ошибка скрапинга: {str(e)}")
             
+    except HTTPException:
+        raise
     except Exception as e:
         
         raise HTTPException(status_code=500, detail=f"Ошибка скрапинга: {str(e)}")
 
+# Максимальный размер страницы /weather
+WEATHER_PAGE_MAX_LIMIT = 10000
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    """Непрозрачный курсор страницы из ключа (город, дата) последней строки."""
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Ключ (город, дата) из курсора; ValueError, если курсор повреждён."""
+    try:
+        city, date = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        datetime.date.fromisoformat(date)
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    return str(city), date
+
 # Получение погодных данных из БД
 @router.get("/weather", response_model=List[models.WeatherData])
 async def get_weather_data(
-    city: Optional[str] = Query(None, description="Фильтр по городу"),
-    days: Optional[int] = Query(7, description="Количество дней для получения данных"),
+    request: Request,
+    city: Optional[List[str]] = Query(None, description="Фильтр по городу (можно указать несколько)"),
+    days: Optional[int] = Query(7, description="Количество дней для получения данных (если не задана start_date)"),
+    start_date: Optional[datetime.date] = Query(None, description="Начальная дата периода"),
+    end_date: Optional[datetime.date] = Query(None, description="Конечная дата периода"),
+    fields: Optional[str] = Query(None, description="Возвращаемые поля через запятую"),
+    limit: Optional[int] = Query(None, ge=1, le=WEATHER_PAGE_MAX_LIMIT, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (заголовок X-Next-Cursor)"),
 ):
-    return database.get_weather_data(city, days)
+    cities = sorted(set(city)) if city else None
+    cache_city = cities[0] if cities and len(cities) == 1 else None
+    
+    # Без параметров периода и страниц - прежний ответ: последние days дней, новые даты первыми
+    if start_date is None and end_date is None and fields is None and limit is None \
+            and cursor is None and (cities is None or len(cities) == 1):
+        return await cached_response(
+            request, ("weather", cache_city, days), cache_city,
+            lambda: database.get_weather_records(cache_city, days), WEATHER_MEDIA_TYPES
+        )
+    
+    # Иначе строки упорядочены по (city, date) и читаются страницами по ключу
+    if start_date is None and days:
+        start_date = datetime.date.today() - datetime.timedelta(days=days)
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    
+    def build():
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            rows, next_key = database.query_weather_data(
+                cities, start_date, end_date, field_list, limit, after
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return rows, ({"X-Next-Cursor": encode_cursor(next_key)} if next_key else None)
+    
+    key = ("weather_range", tuple(cities or ()), start_date, end_date, tuple(field_list or ()), limit, cursor)
+    return await cached_response(request, key, cache_city, build, WEATHER_MEDIA_TYPES)
 
+# Время ожидания свободного места для выгрузки (database.EXPORT_MAX_STREAMS), затем 503
+EXPORT_SLOT_TIMEOUT = float(os.environ.get("WEATHER_EXPORT_SLOT_TIMEOUT", "5"))
+
+# Потоковая выгрузка погодных данных (вся история по умолчанию)
+@router.get("/export/weather")
+async def export_weather_data(
+    city: Optional[str] = Query(None, description="Фильтр по городу"),
+    days: int = Query(0, ge=0, description="Количество дней (0 - вся история)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Формат выгрузки: ndjson или csv"),
+):
+    encode, media_type = export.EXPORT_FORMATS[format]
+    try:
+        weather_export = await run_blocking(
+            executors.io_pool, database.WeatherExport, city, days, timeout=EXPORT_SLOT_TIMEOUT
+        )
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    # Синхронный генератор StreamingResponse перебирает в пуле потоков, чтение БД не блокирует цикл событий.
+    # Фоновая задача выполняется и после обрыва соединения клиентом: соединение выгрузки закрывается сразу,
+    # а не при сборке мусора брошенного генератора
+    return StreamingResponse(
+        encode(weather_export),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="weather.{format}"'},
+        background=BackgroundTask(weather_export.close),
+    )
 
 @router.get("/forecast", response_model=List[models.WeatherForecast])
 async def get_forecast(
+    request: Request,
     city: str = Query(..., description="Город для прогноза"),
     days: int = Query(5, description="Количество дней для прогноза"),
 ):
+    def build():
+        data = database.get_weather_columns(city, 30)
+        if len(data) < 5:
+            raise HTTPException(status_code=400, detail="Недостаточно данных для прогноза. Сначала выполните скрапинг.")
+        
+        try:
+            return ml_model.make_forecast(data, days, features.feature_store)
+        except ml_model.ModelNotFoundError as e:
+            raise HTTPException(status_code=404, detail=f"{str(e)}. Сначала обучите модель.")
     
-    data = database.get_weather_data(city, 30)  
-    if len(data) < 5:
-        raise HTTPException(status_code=400, detail="Недостаточно данных для прогноза. Сначала выполните скрапинг.")
-    
-    forecast = ml_model.make_forecast(data, days)
-    return forecast
+    # Чтение истории из БД и прогноз по модели - в пуле вычислений
+    return await cached_response(request, ("forecast", city, days), city, build, pool=executors.cpu_pool)
 
 
-@router.post("/train_model", response_model=models.TrainingResponse)
+# Постановка задачи обучения модели в фоновую очередь
+@router.post("/train_model", response_model=models.TrainingJobStatus, status_code=202)
 async def train_model(city: str = Query(..., description="Город для обучения модели")):
+    data = await run_blocking(executors.io_pool, database.get_weather_columns, city, jobs.TRAINING_HISTORY_DAYS)
+    if len(data) < 5:
+        raise HTTPException(status_code=400, detail="Недостаточно данных для обучения модели")
+    
     try:
-        data = database.get_weather_data(city, 30)  # Берем данные за 30 дней для обучения
-        if len(data) < 5:
-            raise HTTPException(status_code=400, detail="Недостаточно данных для обучения модели")
-        
-        metrics = ml_model.train_model(data)
-        
-        # Сохраняем метрики модели в БД
-        database.save_model_metrics(city, metrics, ml_model.MODEL_PATH)
-        
-        return models.TrainingResponse(
-            success=True,
-            city=city,
-            metrics=metrics
-        )
+        # Если город уже обучается, возвращается существующая задача
+        job = jobs.get_job_manager().submit(city)
+    except jobs.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при обучении модели: {str(e)}")
+    
+    return jobs.get_job_manager().get(job.id)
+
+# Состояние задачи обучения
+@router.get("/jobs/{job_id}", response_model=models.TrainingJobStatus)
+async def get_job(job_id: str):
+    job = jobs.get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+    return job
 
 # Получение логов скрапинга
 @router.get("/scraping_logs", response_model=List[Dict])
@@ -135,7 +322,7 @@ async def get_scraping_logs(
     limit: int = Query(10, description="Ограничение количества возвращаемых записей")
 ):
     try:
-        logs = database.get_scraping_logs(city, limit)
+        logs = await run_blocking(executors.io_pool, database.get_scraping_logs, city, limit)
         
         # Преобразуем объекты datetime в строки для JSON
         for log in logs:
@@ -147,6 +334,8 @@ async def get_scraping_logs(
                 log['end_date'] = log['end_date'].isoformat()
                 
         return logs
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при получении логов: {str(e)}")
 
@@ -158,44 +347,267 @@ async def get_data_availability(
     end_date: Optional[datetime.date] = Query(None, description="Конечная дата для проверки")
 ):
     try:
-   
         if not start_date:
             start_date = datetime.date.today() - datetime.timedelta(days=29)
         if not end_date:
             end_date = datetime.date.today()
-            
         
-        availability = database.get_data_availability(city)
-        
-        
-        existing_dates = []
-        
-        
-        weather_data = database.get_weather_data(city, 100)  
+        # Всё считается по таблице покрытия: диапазоны дат вместо списков дней
+        def load():
+            return (
+                database.get_data_availability(city),
+                database.get_coverage(city, start_date, end_date),
+                database.get_missing_ranges(city, start_date, end_date),
+            )
         
-        for data in weather_data:
-            if start_date <= data.date <= end_date:
-                existing_dates.append(data.date.isoformat())
+        availability, existing_ranges, missing_ranges = await run_blocking(executors.io_pool, load)
         
-      
-        missing_dates = database.get_missing_dates(city, start_date, end_date)
-        missing_dates_iso = [d.isoformat() for d in missing_dates]
+        def as_ranges(ranges):
+            return [{"start": start.isoformat(), "end": end.isoformat()} for start, end in ranges]
         
         return {
             "available": availability["available"],
             "min_date": availability["min_date"].isoformat() if availability["min_date"] else None,
             "max_date": availability["max_date"].isoformat() if availability["max_date"] else None,
             "count": availability["count"],
-            "existing_dates": existing_dates,
-            "missing_dates": missing_dates_iso,
+            "existing_ranges": as_ranges(existing_ranges),
+            "missing_ranges": as_ranges(missing_ranges),
+            "existing_days": sum((end - start).days + 1 for start, end in existing_ranges),
+            "missing_days": sum((end - start).days + 1 for start, end in missing_ranges),
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при получении информации о доступности данных: {str(e)}")
 
+# Статистика пула соединений с БД
+@router.get("/stats/db_pool", response_model=Dict[str, Any])
+async def get_db_pool_stats():
+    return {**database.get_pool_stats(), "exports": database.get_export_stats()}
+
+# Статистика кэша геокодирования
+@router.get("/stats/geocode", response_model=Dict[str, Any])
+async def get_geocode_stats():
+    return scraper.geocode_cache.stats()
+
+# Статистика реестра загруженных моделей
+@router.get("/stats/models", response_model=Dict[str, Any])
+async def get_model_registry_stats():
+    return ml_model.model_registry.stats()
+
+# Статистика очереди обучения моделей
+@router.get("/stats/jobs", response_model=Dict[str, Any])
+async def get_job_stats():
+    return jobs.get_job_manager().stats()
+
+# Статистика хранилища признаков
+@router.get("/stats/features", response_model=Dict[str, Any])
+async def get_feature_store_stats():
+    return features.feature_store.stats()
+
+# Статистика кэша ответов
+@router.get("/stats/response_cache", response_model=Dict[str, Any])
+async def get_response_cache_stats():
+    return response_cache.response_cache.stats()
+
+# Статистика общего HTTP-клиента
+@router.get("/stats/http_client", response_model=Dict[str, Any])
+async def get_http_client_stats():
+    return http_client.get_http_client().stats()
+
+# Статистика пулов блокирующих операций
+@router.get("/stats/executors", response_model=Dict[str, Any])
+async def get_executor_stats():
+    return executors.get_pool_stats()
+
+# Метрики в текстовом формате Prometheus
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def collect_runtime_metrics() -> List[metrics.Sample]:
+    """Текущее состояние пулов и очереди обучения (снимается при выдаче /metrics)."""
+    pools = executors.get_pool_stats()
+    db_pool = database.get_pool_stats()
+    job_stats = jobs.get_job_manager().stats()
+    return [
+        ("weather_executor_queued", "gauge", "Задачи, ожидающие потока пула",
+         [({"pool": name}, stats["queued"]) for name, stats in pools.items()]),
+        ("weather_executor_running", "gauge", "Задачи, выполняемые потоками пула",
+         [({"pool": name}, stats["running"]) for name, stats in pools.items()]),
+        ("weather_executor_rejected_total", "counter", "Задачи, отклонённые из-за заполненной очереди пула",
+         [({"pool": name}, stats["rejected"]) for name, stats in pools.items()]),
+        ("weather_db_pool_connections", "gauge", "Соединения пула БД по состоянию",
+         [({"state": "in_use"}, db_pool["in_use"]), ({"state": "idle"}, db_pool["idle"])]),
+        ("weather_training_jobs", "gauge", "Активные задачи обучения по состоянию",
+         [({"state": "queued"}, job_stats["queued"]), ({"state": "running"}, job_stats["running"])]),
+    ]
+
+metrics.REGISTRY.add_collector(collect_runtime_metrics)
+
+class RequestMetricsMiddleware:
+    """
+    ASGI-middleware: время обработки и классы статусов ответов по шаблонам маршрутов.
+
+    Дочерние метрики маршрута и метода привязываются при первом запросе к ним;
+    запросы без маршрута (404) учитываются с route="unmatched".
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._bound: Dict[str, Dict[str, Tuple[Any, List[Any]]]] = {}
+    
+    def _bind(self, path: str, method: str) -> Tuple[Any, List[Any]]:
+        bound = (
+            metrics.HTTP_REQUEST_DURATION.labels(method, path),
+            [metrics.HTTP_RESPONSES.labels(method, path, f"{status_class}xx") for status_class in range(1, 6)],
+        )
+        self._bound.setdefault(path, {})[method] = bound
+        return bound
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Маршрутизатор записывает найденный маршрут в scope; метка - шаблон пути
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            by_method = self._bound.get(path)
+            bound = by_method.get(scope["method"]) if by_method is not None else None
+            if bound is None:
+                bound = self._bind(path, scope["method"])
+            latency, responses = bound
+            latency.observe(time.perf_counter() - started)
+            responses[min(max(status // 100, 1), 5) - 1].inc()
+
+# Токен административных запросов (заголовок X-Admin-Token); без него доступ открыт, как и к остальному API
+ADMIN_TOKEN = os.environ.get("WEATHER_ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if ADMIN_TOKEN and not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Неверный токен администратора")
+
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+# Настройки профилирования запросов
+@admin_router.get("/profiling", response_model=Dict[str, Any])
+async def get_profiling_settings():
+    return profiling.profiler.settings()
+
+# Включение и выключение профилирования без перезапуска
+@admin_router.put("/profiling", response_model=Dict[str, Any])
+async def update_profiling_settings(
+    enabled: Optional[bool] = Query(None, description="Профилировать запросы"),
+    sample_rate: Optional[float] = Query(None, ge=0, le=1, description="Доля запросов, профилируемых без заголовка X-Profile"),
+):
+    profiling.profiler.configure(enabled=enabled, sample_rate=sample_rate)
+    return profiling.profiler.settings()
+
+# Последние профили запросов
+@admin_router.get("/profiles", response_model=List[Dict[str, Any]])
+async def get_profiles():
+    return profiling.profiler.summaries()
+
+def get_profile(profile_id: str) -> profiling.RequestProfile:
+    profile = profiling.profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Профиль {profile_id} не найден")
+    return profile
+
+# Профиль в формате .pstats (python -m pstats, snakeviz)
+@admin_router.get("/profiles/{profile_id}.pstats")
+async def download_profile_pstats(profile_id: str):
+    profile = get_profile(profile_id)
+    return Response(
+        content=await run_blocking(executors.cpu_pool, profile.pstats_bytes),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+# Выборка стеков в формате collapsed stacks (flamegraph.pl, speedscope)
+@admin_router.get("/profiles/{profile_id}.collapsed")
+async def download_profile_collapsed(profile_id: str):
+    profile = get_profile(profile_id)
+    return Response(
+        content=profile.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed"'},
+    )
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware: профилирование запросов с заголовком X-Profile или из случайной выборки.
+
+    Идентификатор профиля возвращается в заголовке X-Profile-Id. Пока
+    профилирование выключено, запрос проходит после проверки одного флага.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        profiler = profiling.profiler
+        if not profiler.enabled or scope["type"] != "http" or not profiler.wants(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        
+        profile = profiler.start(scope["method"], scope["path"])
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+        
+        status = None
+        profile_header = (profiling.PROFILE_ID_HEADER.lower().encode("latin-1"), profile.id.encode("latin-1"))
+        
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), profile_header]}
+            await send(message)
+        
+        # Пулы executors читают профиль запроса из контекста
+        token = profiling.current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiling.current_profile.reset(token)
+            profiler.finish(profile, status)
+
+# Инициализация БД при запуске, закрытие соединений при остановке
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_db()
+    # Координаты известных городов загружаются в кэш геокодирования в фоне,
+    # чтобы запросы к API геокодирования не задерживали запуск сервера
+    warm_up = executors.io_pool.submit(
+        lambda: scraper.warm_up_geocode_cache(database.get_all_cities())
+    )
+    yield
+    # Если прогрев ещё не начался, он не нужен
+    warm_up.cancel()
+    jobs.close_job_manager()
+    executors.shutdown_pools(wait=False)
+    http_client.close_http_client()
+    database.close_pool()
+
 # Создание приложения FastAPI
-app = FastAPI(title="Weather API", description="API для работы с погодными данными")
+app = FastAPI(title="Weather API", description="API для работы с погодными данными", lifespan=lifespan)
 
 # Настройка CORS для взаимодействия с фронтендом Streamlit
 app.add_middleware(
@@ -204,11 +616,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", profiling.PROFILE_ID_HEADER],
 )
+app.add_middleware(ProfilingMiddleware)
+# Добавлено последним - внешний слой, время включает CORS, профилирование и обработку ошибок
+app.add_middleware(RequestMetricsMiddleware)
 
-@app.on_event("startup")
-async def startup():
-    database.init_db()
-
-
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+app.include_router(admin_router)
\ No newline at end of file
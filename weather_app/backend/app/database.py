@@ -1,10 +1,18 @@
 import sqlite3
 import os
 import datetime
+import functools
+import itertools
 import logging
 import json
-from typing import List, Optional, Dict, Any
-from . import models
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Iterator, Mapping, Set, Tuple, Callable, Union
+import numpy as np
+from . import metrics, models, validation
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +21,53 @@ logger = logging.getLogger(__name__)
 # Путь к файлу БД
 DATABASE_PATH = "/app/database/weather.db"
 
+# Параметры пула соединений
+DB_POOL_SIZE = int(os.environ.get("WEATHER_DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.environ.get("WEATHER_DB_POOL_TIMEOUT", "30"))
+
+# Размер пакета для массовой вставки данных о погоде
+UPSERT_CHUNK_SIZE = int(os.environ.get("WEATHER_DB_UPSERT_CHUNK_SIZE", "5000"))
+
+# Число строк в одной инструкции INSERT ... VALUES (...), (...): по 8 параметров
+# на строку, 100 строк укладываются в старый предел SQLite в 999 параметров
+UPSERT_ROWS_PER_STATEMENT = 100
+
+# Число строк, читаемых из курсора за раз при потоковой выгрузке
+EXPORT_BATCH_SIZE = int(os.environ.get("WEATHER_DB_EXPORT_BATCH_SIZE", "1000"))
+
+# Число одновременных потоковых выгрузок: каждая читает через собственное
+# соединение только для чтения, а не через соединение из пула
+EXPORT_MAX_STREAMS = int(os.environ.get("WEATHER_DB_EXPORT_MAX_STREAMS", "2"))
+
+# Столбцы weather_data при потоковой выгрузке (поля WeatherData)
+EXPORT_COLUMNS = (
+    "id", "city", "date", "temperature", "humidity", "pressure",
+    "wind_speed", "precipitation", "weather_condition", "created_at",
+)
+
+# PRAGMA, применяемые к каждому новому соединению
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # 16 МБ страничного кэша на соединение
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+
+# Столбцы weather_data для чтения в структурированный массив NumPy
+WEATHER_COLUMNS_DTYPE = np.dtype([
+    ("city", object),
+    ("date", "datetime64[D]"),
+    ("temperature", np.float64),
+    ("humidity", np.float64),
+    ("pressure", np.float64),
+    ("wind_speed", np.float64),
+    ("precipitation", np.float64),
+    ("weather_condition", object),
+])
+
 def dict_factory(cursor, row):
     """Преобразование строк в словари для удобной работы с данными."""
     d = {}
@@ -20,137 +75,590 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
-def get_db_connection():
-    """Создание соединения с БД с настройкой конвертации типов."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = dict_factory
-    
-    # Настройка для правильной работы с датами
-    conn.execute("PRAGMA foreign_keys = ON")
-    
-    # Конвертация строк в даты и обратно
+def _register_type_adapters():
+    """Регистрация конвертеров дат (глобально для модуля sqlite3, один раз)."""
     sqlite3.register_adapter(datetime.date, lambda val: val.isoformat())
     sqlite3.register_adapter(datetime.datetime, lambda val: val.isoformat())
     sqlite3.register_converter("DATE", lambda val: datetime.date.fromisoformat(val.decode()))
     sqlite3.register_converter("TIMESTAMP", lambda val: datetime.datetime.fromisoformat(val.decode()))
+
+_register_type_adapters()
+
+def get_db_connection(path: Optional[str] = None):
+    """Создание нового соединения с БД с настройкой PRAGMA.
+
+    Соединение можно передавать между потоками: пул гарантирует, что
+    в каждый момент времени им пользуется только один поток.
+    """
+    conn = sqlite3.connect(path or DATABASE_PATH, check_same_thread=False)
+    conn.row_factory = dict_factory
+    
+    for pragma, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
     
     return conn
 
+class ConnectionPool:
+    """Пул долгоживущих соединений SQLite на основе очереди.
+
+    Соединения создаются лениво, но не более ``size`` штук. Если все
+    соединения заняты, вызывающий поток ждёт освобождения не дольше
+    ``timeout`` секунд.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def acquire(self) -> sqlite3.Connection:
+        """Получение соединения из пула."""
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+        
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+                self._in_use += 1
+            return conn
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        
+        if can_create:
+            try:
+                conn = get_db_connection(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._misses += 1
+                self._in_use += 1
+            return conn
+        
+        # Все соединения заняты - ждём освобождения
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"Не удалось получить соединение с БД за {self.timeout} с")
+        waited = time.perf_counter() - started
+        metrics.DB_POOL_WAIT.observe(waited)
+        
+        with self._lock:
+            self._waits += 1
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+            self._in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Возврат соединения в пул; после close() соединение закрывается."""
+        # Незавершённая транзакция не должна перейти к следующему владельцу
+        if conn.in_transaction and not self._closed:
+            conn.rollback()
+        
+        # Флаг проверяется под той же блокировкой, под которой его ставит close():
+        # соединение не попадёт в очередь, которую close() уже опустошил
+        with self._lock:
+            self._in_use -= 1
+            closed = self._closed
+            if not closed:
+                self._idle.put(conn)
+        if closed:
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Контекстный менеджер: соединение возвращается в пул при выходе."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Закрытие всех свободных соединений; занятые закроются при возврате."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики использования пула."""
+        with self._lock:
+            requests_total = self._hits + self._misses + self._waits
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_time, 6),
+                "wait_time_max": round(self._max_wait_time, 6),
+                "hit_rate": round(self._hits / requests_total, 4) if requests_total else 0.0,
+            }
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Получение пула соединений для текущего DATABASE_PATH (создаётся лениво)."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.path != DATABASE_PATH:
+        with _pool_lock:
+            if _pool is None or _pool.path != DATABASE_PATH:
+                if _pool is not None:
+                    _pool.close()
+                _pool = ConnectionPool(DATABASE_PATH)
+            pool = _pool
+    return pool
+
+@contextmanager
+def db_connection() -> Iterator[sqlite3.Connection]:
+    """Соединение из пула на время блока ``with``."""
+    with get_pool().connection() as conn:
+        yield conn
+
+def close_pool() -> None:
+    """Закрытие пула соединений (вызывается при остановке приложения)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    logger.info("Пул соединений с БД закрыт")
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Статистика пула соединений."""
+    return get_pool().stats()
+
 def init_db():
     """Инициализация базы данных при первом запуске."""
     os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Создание таблицы с погодными данными
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS weather_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        city TEXT NOT NULL,
-        date DATE NOT NULL,
-        temperature REAL NOT NULL,
-        humidity REAL NOT NULL,
-        pressure REAL NOT NULL,
-        wind_speed REAL NOT NULL,
-        precipitation REAL NOT NULL,
-        weather_condition TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        source TEXT DEFAULT 'scraper',
-        UNIQUE(city, date)
-    )
-    ''')
-    
-    # Создание индекса для ускорения поиска по городу и дате
-    cursor.execute('''
-    CREATE INDEX IF NOT EXISTS idx_weather_city_date ON weather_data (city, date)
-    ''')
-    
-    # Создание таблицы для хранения моделей
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS models (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        city TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        metrics TEXT NOT NULL,
-        file_path TEXT NOT NULL,
-        UNIQUE(city)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        # Создание таблицы с погодными данными
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weather_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT NOT NULL,
+            date DATE NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            pressure REAL NOT NULL,
+            wind_speed REAL NOT NULL,
+            precipitation REAL NOT NULL,
+            weather_condition TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            source TEXT DEFAULT 'scraper',
+            UNIQUE(city, date)
+        )
+        ''')
+    
+        # Поиск по городу и дате идёт по индексу ограничения UNIQUE(city, date);
+        # отдельный индекс с теми же столбцами только замедлял вставку
+        cursor.execute("DROP INDEX IF EXISTS idx_weather_city_date")
+    
+        # Создание таблицы для хранения моделей
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            metrics TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            UNIQUE(city)
+        )
+        ''')
+    
+        # Версия модели города: файл артефакта хранит номер версии в имени
+        model_columns = [row['name'] for row in cursor.execute("PRAGMA table_info(models)").fetchall()]
+        if 'version' not in model_columns:
+            cursor.execute("ALTER TABLE models ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    
+        # Создание таблицы для хранения параметров конфигурации
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(key)
+        )
+        ''')
+    
+        # Создание таблицы для логов скрапинга
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scraping_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+    
+        # Счётчики инкрементного сбора: собрано, пропущено (уже в БД), обновлено дней
+        log_columns = [row['name'] for row in cursor.execute("PRAGMA table_info(scraping_logs)").fetchall()]
+        for column in ("fetched", "skipped", "updated"):
+            if column not in log_columns:
+                cursor.execute(f"ALTER TABLE scraping_logs ADD COLUMN {column} INTEGER")
+    
+        # Покрытие данными: непрерывные диапазоны дат по городам
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weather_coverage (
+            city TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            PRIMARY KEY (city, start_date)
+        ) WITHOUT ROWID
+        ''')
+        
+        # Заполнение покрытия по уже собранным данным (при первом запуске после обновления)
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM weather_coverage) AS filled")
+        if not cursor.fetchone()['filled']:
+            cursor.execute(_BUILD_COVERAGE_SQL)
+    
+        # Создание таблицы для кэша геокодирования (координаты городов)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            city_key TEXT PRIMARY KEY,
+            city TEXT NOT NULL,
+            lat REAL,
+            lon REAL,
+            found INTEGER NOT NULL,
+            checked_at REAL NOT NULL
+        )
+        ''')
+    
+        conn.commit()
+    
+    logger.info("База данных инициализирована")
+
+# Диапазоны подряд идущих дат: у дат одного диапазона разность номера дня
+# и порядкового номера строки одинакова
+_BUILD_COVERAGE_SQL = '''
+INSERT INTO weather_coverage (city, start_date, end_date)
+SELECT city, MIN(date), MAX(date)
+FROM (
+    SELECT city, date,
+           CAST(julianday(date) AS INTEGER) - ROW_NUMBER() OVER (PARTITION BY city ORDER BY date) AS grp
+    FROM weather_data
+)
+GROUP BY city, grp
+'''
+
+# Обновление покрытия по сохранённому пакету. Диапазоны подряд идущих дат пакета
+# (_date_ranges) и пересекающиеся или соседние с ними диапазоны покрытия собираются
+# во временной таблице, затронутые диапазоны удаляются из покрытия, а объединение
+# записывается заново. Даты обновлённых строк уже покрыты, поэтому в объединение
+# можно передавать диапазоны всего пакета, а не только вставленных строк.
+_COVERAGE_DELTA_TABLE_SQL = '''
+CREATE TEMP TABLE IF NOT EXISTS coverage_delta (
+    city TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    existing INTEGER NOT NULL
+)
+'''
+
+_INSERT_COVERAGE_DELTA_SQL = '''
+INSERT INTO temp.coverage_delta (city, start_date, end_date, existing) VALUES (?, ?, ?, 0)
+'''
+
+_UPDATE_COVERAGE_SQL = (
+    # Затронутые диапазоны ищутся по первичному ключу (city, start_date): начинающиеся
+    # внутри диапазона пакета или сразу после него и предыдущий, если он доходит до него
+    '''
+    INSERT INTO temp.coverage_delta (city, start_date, end_date, existing)
+    SELECT c.city, c.start_date, c.end_date, 1
+    FROM temp.coverage_delta n
+    JOIN weather_coverage c
+      ON c.city = n.city AND c.start_date BETWEEN n.start_date AND date(n.end_date, '+1 day')
+    UNION
+    SELECT c.city, c.start_date, c.end_date, 1
+    FROM temp.coverage_delta n
+    JOIN weather_coverage c ON c.city = n.city AND c.start_date = (
+        SELECT MAX(p.start_date) FROM weather_coverage p WHERE p.city = n.city AND p.start_date < n.start_date
     )
-    ''')
-    
-    # Создание таблицы для хранения параметров конфигурации
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS config (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        key TEXT NOT NULL,
-        value TEXT NOT NULL,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(key)
+    WHERE c.end_date >= date(n.start_date, '-1 day')
+    ''',
+    '''
+    DELETE FROM weather_coverage
+    WHERE (city, start_date) IN (SELECT city, start_date FROM temp.coverage_delta WHERE existing)
+    ''',
+    # Диапазон, начинающийся не позже дня после конца предыдущих, входит в их группу
+    '''
+    INSERT INTO weather_coverage (city, start_date, end_date)
+    SELECT city, MIN(start_date), MAX(end_date)
+    FROM (
+        SELECT city, start_date, end_date,
+               SUM(starts_group) OVER (PARTITION BY city ORDER BY start_date) AS grp
+        FROM (
+            SELECT city, start_date, end_date,
+                   date(start_date, '-1 day') > COALESCE(MAX(end_date) OVER (
+                       PARTITION BY city ORDER BY start_date
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ), '') AS starts_group
+            FROM temp.coverage_delta
+        )
     )
-    ''')
-    
-    # Создание таблицы для логов скрапинга
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS scraping_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        city TEXT NOT NULL,
-        start_date DATE NOT NULL,
-        end_date DATE NOT NULL,
-        status TEXT NOT NULL,
-        message TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    GROUP BY city, grp
+    ''',
+    "DELETE FROM temp.coverage_delta",
+)
+
+def _date_ranges(rows: List[Tuple[Any, ...]]) -> List[Tuple[str, str, str]]:
+    """Диапазоны подряд идущих дат (city, start_date, end_date) строк, отсортированных по (city, date)."""
+    ranges = []
+    fromisoformat = datetime.date.fromisoformat
+    city = start = end = None
+    end_day = 0
+    for row in rows:
+        day = fromisoformat(row[1]).toordinal()
+        if row[0] != city or day != end_day + 1:
+            if city is not None:
+                ranges.append((city, start, end))
+            city, start = row[0], row[1]
+        end, end_day = row[1], day
+    ranges.append((city, start, end))
+    return ranges
+
+def _update_coverage(cursor: sqlite3.Cursor, rows: List[Tuple[Any, ...]]) -> None:
+    """Добавление дат сохранённых строк в покрытие (в той же транзакции)."""
+    cursor.execute(_COVERAGE_DELTA_TABLE_SQL)
+    cursor.executemany(_INSERT_COVERAGE_DELTA_SQL, _date_ranges(rows))
+    for sql in _UPDATE_COVERAGE_SQL:
+        cursor.execute(sql)
+
+# Массовая вставка с обновлением существующих строк без удаления
+_UPSERT_WEATHER_SQL = '''
+INSERT INTO weather_data
+(city, date, temperature, humidity, pressure, wind_speed, precipitation, weather_condition)
+VALUES {values}
+ON CONFLICT(city, date) DO UPDATE SET
+    temperature = excluded.temperature,
+    humidity = excluded.humidity,
+    pressure = excluded.pressure,
+    wind_speed = excluded.wind_speed,
+    precipitation = excluded.precipitation,
+    weather_condition = excluded.weather_condition
+'''
+
+@functools.lru_cache(maxsize=8)
+def _upsert_sql(n_rows: int) -> str:
+    """Инструкция вставки n_rows строк за одно выполнение."""
+    return _UPSERT_WEATHER_SQL.format(values=", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * n_rows))
+
+def _execute_upsert(cursor: sqlite3.Cursor, rows: List[Tuple[Any, ...]]) -> None:
+    # Одна инструкция на UPSERT_ROWS_PER_STATEMENT строк: выполнение инструкции
+    # (и обновление sqlite_sequence для AUTOINCREMENT) обходится дороже вставки строки
+    per_statement = UPSERT_ROWS_PER_STATEMENT
+    full = len(rows) - len(rows) % per_statement
+    if full:
+        cursor.executemany(_upsert_sql(per_statement), (
+            tuple(itertools.chain.from_iterable(rows[start:start + per_statement]))
+            for start in range(0, full, per_statement)
+        ))
+    if full < len(rows):
+        cursor.execute(_upsert_sql(len(rows) - full), tuple(itertools.chain.from_iterable(rows[full:])))
+
+@metrics.db_timed("upsert_weather_data")
+def upsert_weather_data(
+    data_list: List[Union[models.WeatherData, Mapping[str, Any]]],
+    chunk_size: int = UPSERT_CHUNK_SIZE
+) -> Dict[str, int]:
+    """
+    Массовое сохранение данных о погоде через executemany и ON CONFLICT DO UPDATE.
+    
+    Все пакеты выполняются в одной транзакции: при ошибке откатывается вся вставка.
+    Существующие строки обновляются на месте, поэтому их id сохраняются.
+    
+    Args:
+        data_list: Список объектов WeatherData или проверенных записей
+            (validation.validate_weather_batch) с теми же полями
+        chunk_size: Количество строк в одном вызове executemany
+            (по UPSERT_ROWS_PER_STATEMENT строк в инструкции)
+        
+    Returns:
+        Словарь с количеством добавленных (inserted) и обновлённых (updated)
+        строк, а также id последней сохранённой строки (last_id)
+    """
+    result = {"inserted": 0, "updated": 0, "last_id": 0}
+    if not data_list:
+        return result
+    if chunk_size < 1:
+        raise ValueError("Размер пакета должен быть не меньше 1")
+    
+    rows = [
+        (
+            data["city"],
+            data["date"].isoformat(),
+            data["temperature"],
+            data["humidity"],
+            data["pressure"],
+            data["wind_speed"],
+            data["precipitation"],
+            data["weather_condition"]
+        )
+        # Поля модели WeatherData хранятся в её __dict__, как и в записи
+        for data in (item.__dict__ if isinstance(item, models.WeatherData) else item for item in data_list)
+    ]
+    last_key = rows[-1][:2]
+    
+    # Повторяющиеся в пакете ключи (city, date) сохраняются один раз: побеждает последняя строка.
+    # Вставка в порядке индекса (city, date) уменьшает число перестроений страниц B-дерева;
+    # ключи уникальны, поэтому строки сравниваются только по ним
+    rows = sorted({row[:2]: row for row in rows}.values())
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # id новых строк всегда больше текущего максимума (AUTOINCREMENT),
+            # а обновление на месте id не меняет - по этому признаку считаем вставки
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM weather_data")
+            max_id_before = cursor.fetchone()['max_id']
+            
+            for start in range(0, len(rows), chunk_size):
+                _execute_upsert(cursor, rows[start:start + chunk_size])
+            
+            cursor.execute("SELECT COUNT(*) AS inserted FROM weather_data WHERE id > ?", (max_id_before,))
+            result["inserted"] = cursor.fetchone()['inserted']
+            
+            # Обновления существующих дат покрытие не меняют
+            if result["inserted"]:
+                _update_coverage(cursor, rows)
+            result["updated"] = len(rows) - result["inserted"]
+            
+            cursor.execute("SELECT id FROM weather_data WHERE city = ? AND date = ?", last_key)
+            result["last_id"] = cursor.fetchone()['id']
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    logger.info(
+        f"Сохранено {len(rows)} записей о погоде "
+        f"(добавлено {result['inserted']}, обновлено {result['updated']})"
     )
-    ''')
+    _notify_write({row[0] for row in rows})
     
-    conn.commit()
-    conn.close()
+    return result
+
+# Обработчики, вызываемые после сохранения данных о погоде
+_write_listeners: List[Callable[[Set[str]], None]] = []
+
+def add_write_listener(callback: Callable[[Set[str]], None]) -> None:
+    """
+    Регистрация обработчика записи в weather_data.
     
-    logger.info("База данных инициализирована")
+    Обработчик вызывается после фиксации транзакции с множеством городов,
+    данные которых сохранены: по строкам ему проходить не нужно, поэтому
+    цена записи от числа обработчиков почти не зависит.
+    """
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+def remove_write_listener(callback: Callable[[Set[str]], None]) -> None:
+    """Отмена регистрации обработчика записи."""
+    if callback in _write_listeners:
+        _write_listeners.remove(callback)
 
+def _notify_write(cities: Set[str]) -> None:
+    # Ошибка обработчика не должна отменять уже сохранённые данные
+    for callback in list(_write_listeners):
+        try:
+            callback(cities)
+        except Exception as e:
+            logger.warning(f"Ошибка обработчика записи данных о погоде: {str(e)}")
+
+@metrics.db_timed("save_weather_data")
 def save_weather_data(data_list: List[models.WeatherData]) -> int:
-    """Сохранение данных о погоде в БД."""
+    """Сохранение данных о погоде в БД. Возвращает id последней сохранённой записи."""
     if not data_list:
         logger.warning("Попытка сохранить пустой список данных о погоде")
         return 0
-        
-    conn = get_db_connection()
-    cursor = conn.cursor()
     
-    # Сохраняем данные, обрабатывая возможные дубликаты
-    last_id = 0
-    saved_count = 0
+    return upsert_weather_data(data_list)["last_id"]
+
+def _weather_data_filter(city: Optional[str], days: int) -> Tuple[str, List[Any]]:
+    """Условие WHERE по городу и периоду для выборок из weather_data."""
+    params = []
+    where_clauses = []
     
-    for data in data_list:
-        try:
-            cursor.execute('''
-            INSERT OR REPLACE INTO weather_data
-            (city, date, temperature, humidity, pressure, wind_speed, precipitation, weather_condition)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.city,
-                data.date,
-                data.temperature,
-                data.humidity,
-                data.pressure,
-                data.wind_speed,
-                data.precipitation,
-                data.weather_condition
-            ))
-            
-            last_id = cursor.lastrowid
-            saved_count += 1
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении данных о погоде: {str(e)}")
+    if city:
+        where_clauses.append("city = ?")
+        params.append(city)
+    
+    # Добавляем фильтр по дате, вместо ограничения количества записей
+    if days > 0:
+        cutoff_date = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+        where_clauses.append("date >= ?")
+        params.append(cutoff_date)
     
-    conn.commit()
+    where_sql = f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    return where_sql, params
+
+@metrics.db_timed("get_weather_records")
+def get_weather_records(city: Optional[str] = None, days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Проверенные строки данных о погоде в виде словарей с полями WeatherData.
     
-    logger.info(f"Сохранено {saved_count} записей о погоде")
+    Фильтры и порядок те же, что у get_weather_data, но объекты WeatherData
+    не создаются: записи сразу годятся для сериализации ответа.
+    """
+    where_sql, params = _weather_data_filter(city, days)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        # Сортируем по дате, но уже не ограничиваем количество записей
+        cursor.execute(f"SELECT * FROM weather_data{where_sql} ORDER BY date DESC", params)
+        result = cursor.fetchall()
     
-    conn.close()
+    # Проверяем строки пакетом
+    batch = validation.validate_weather_batch(result)
+    for error in batch.errors:
+        print(f"Ошибка при преобразовании данных о погоде: {error['errors']}")
     
-    return last_id
+    return batch.records
 
+@metrics.db_timed("get_weather_data")
 def get_weather_data(city: Optional[str] = None, days: int = 7) -> List[models.WeatherData]:
     """
     Получение данных о погоде из БД с фильтрацией по городу и периоду.
@@ -162,96 +670,280 @@ def get_weather_data(city: Optional[str] = None, days: int = 7) -> List[models.W
     Returns:
         Список объектов WeatherData с данными о погоде
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = '''
-    SELECT * FROM weather_data
-    '''
+    return validation.to_models(get_weather_records(city, days))
+
+@metrics.db_timed("get_weather_columns")
+def get_weather_columns(city: Optional[str] = None, days: int = 7, limit: Optional[int] = None) -> np.ndarray:
+    """
+    Данные о погоде в виде структурированного массива NumPy (по столбцам).
     
-    params = []
-    where_clauses = []
+    Строки читаются из курсора сразу в массив с типами WEATHER_COLUMNS_DTYPE,
+    без промежуточных словарей и объектов WeatherData. Фильтры и порядок
+    строк те же, что у get_weather_data; limit ограничивает число последних дат.
     
-    if city:
-        where_clauses.append("city = ?")
-        params.append(city)
+    Returns:
+        Массив с полями city, date (datetime64[D]), temperature, humidity,
+        pressure, wind_speed, precipitation, weather_condition
+    """
+    where_sql, params = _weather_data_filter(city, days)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"""
+        SELECT city, date, temperature, humidity, pressure, wind_speed, precipitation, weather_condition
+        FROM weather_data{where_sql} ORDER BY date DESC{" LIMIT ?" if limit is not None else ""}
+        """, params + ([limit] if limit is not None else []))
+        return np.fromiter(cursor, dtype=WEATHER_COLUMNS_DTYPE)
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_STREAMS)
+_export_lock = threading.Lock()
+_exports_active = 0
+
+def _get_export_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """Соединение только для чтения для потоковой выгрузки (журнал WAL уже включён пулом)."""
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(path or DATABASE_PATH)) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    for pragma in ("cache_size", "mmap_size", "temp_store", "busy_timeout"):
+        conn.execute(f"PRAGMA {pragma} = {SQLITE_PRAGMAS[pragma]}")
+    return conn
+
+class WeatherExport:
+    """
+    Потоковое чтение данных о погоде пакетами по batch_size строк (fetchmany).
     
-    # Добавляем фильтр по дате, вместо ограничения количества записей
-    if days > 0:
-        cutoff_date = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    Выгрузка держит собственное соединение только для чтения, поэтому долгий
+    ответ не занимает соединение пула; одновременно открыто не больше
+    EXPORT_MAX_STREAMS выгрузок. Строки - кортежи значений EXPORT_COLUMNS
+    (даты в ISO), упорядоченные по (city, date), чтобы SQLite читал их по
+    индексу без сортировки всей выборки. Соединение закрывается по исчерпании
+    строк или вызовом close(), который можно выполнять из другого потока
+    (например, в фоновой задаче ответа при обрыве соединения с клиентом).
+    """
+
+    def __init__(
+        self,
+        city: Optional[str] = None,
+        days: int = 0,
+        batch_size: int = EXPORT_BATCH_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+    ):
+        global _exports_active
+        if batch_size < 1:
+            raise ValueError("Размер пакета должен быть не меньше 1")
+        if not _export_slots.acquire(timeout=timeout):
+            raise TimeoutError(f"Все {EXPORT_MAX_STREAMS} потока выгрузки заняты дольше {timeout} с")
+        
+        where_sql, params = _weather_data_filter(city, days)
+        try:
+            self._conn = _get_export_connection()
+            self._cursor = self._conn.cursor()
+            self._cursor.execute(
+                f"SELECT {', '.join(EXPORT_COLUMNS)} FROM weather_data{where_sql} ORDER BY city, date",
+                params
+            )
+        except Exception:
+            if getattr(self, "_conn", None) is not None:
+                self._conn.close()
+            _export_slots.release()
+            raise
+        
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._closed = False
+        with _export_lock:
+            _exports_active += 1
+
+    def __iter__(self) -> Iterator[List[Tuple[Any, ...]]]:
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                batch = self._cursor.fetchmany(self.batch_size)
+            if not batch:
+                self.close()
+                return
+            yield batch
+
+    def close(self) -> None:
+        """Закрытие соединения и освобождение места выгрузки (повторный вызов ничего не делает)."""
+        global _exports_active
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._cursor.close()
+            self._conn.close()
+        _export_slots.release()
+        with _export_lock:
+            _exports_active -= 1
+
+def iter_weather_data(
+    city: Optional[str] = None,
+    days: int = 0,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Пакеты строк WeatherExport; соединение закрывается и при досрочном закрытии генератора."""
+    weather_export = WeatherExport(city, days, batch_size)
+    try:
+        yield from weather_export
+    finally:
+        weather_export.close()
+
+def get_export_stats() -> Dict[str, int]:
+    """Число открытых потоковых выгрузок и их предел."""
+    with _export_lock:
+        return {"active": _exports_active, "max_streams": EXPORT_MAX_STREAMS}
+
+# Города по возрастанию начиная с заданного: каждый следующий город ищется
+# по индексу (city, date), без просмотра строк предыдущего
+_CITIES_FROM_SQL = '''
+WITH RECURSIVE cities(city) AS (
+    SELECT MIN(city) FROM weather_data WHERE city >= ?
+    UNION ALL
+    SELECT (SELECT MIN(city) FROM weather_data WHERE city > cities.city)
+    FROM cities WHERE cities.city IS NOT NULL
+)
+SELECT city FROM cities WHERE city IS NOT NULL
+'''
+
+def _weather_range_sql(
+    columns: List[str],
+    start_date: Optional[datetime.date],
+    end_date: Optional[datetime.date],
+    after_date: Optional[str] = None
+) -> Tuple[str, List[Any]]:
+    """Запрос строк одного города в диапазоне дат (поиск по индексу (city, date))."""
+    where_clauses = ["city = ?"]
+    params: List[Any] = []
+    if after_date is not None and (start_date is None or after_date >= start_date.isoformat()):
+        where_clauses.append("date > ?")
+        params.append(after_date)
+    elif start_date is not None:
         where_clauses.append("date >= ?")
-        params.append(cutoff_date)
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        where_clauses.append("date <= ?")
+        params.append(end_date.isoformat())
+    sql = (
+        f"SELECT {', '.join(columns)} FROM weather_data "
+        f"WHERE {' AND '.join(where_clauses)} ORDER BY date LIMIT ?"
+    )
+    return sql, params
+
+@metrics.db_timed("query_weather_data")
+def query_weather_data(
+    cities: Optional[List[str]] = None,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[str, str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str]]]:
+    """
+    Выборка данных о погоде за произвольный период с постраничным чтением по ключу.
     
-    if where_clauses:
-        query += f" WHERE {' AND '.join(where_clauses)}"
+    Строки упорядочены по (city, date). Для каждого города выполняется поиск
+    диапазона по индексу (city, date), поэтому стоимость страницы зависит
+    от limit, а не от её номера.
     
-    # Сортируем по дате, но уже не ограничиваем количество записей
-    query += " ORDER BY date DESC"
+    Args:
+        cities: Города (если None, все города)
+        start_date: Начальная дата (включительно, None - без ограничения)
+        end_date: Конечная дата (включительно, None - без ограничения)
+        fields: Возвращаемые столбцы из EXPORT_COLUMNS (если None, все)
+        limit: Максимум строк на странице (если None, все строки)
+        after: Ключ (город, дата в ISO) последней строки предыдущей страницы
     
-    cursor.execute(query, params)
-    result = cursor.fetchall()
-    conn.close()
+    Returns:
+        Строки-словари и ключ для следующей страницы (None, если строк больше нет)
+    """
+    fields = list(fields or EXPORT_COLUMNS)
+    unknown = [field for field in fields if field not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    if limit is not None and limit < 1:
+        raise ValueError("Ограничение количества строк должно быть не меньше 1")
     
-    # Преобразуем в объекты Pydantic
-    weather_data = []
-    for row in result:
-        try:
-            # Преобразуем строки дат в объекты datetime
-            if isinstance(row['date'], str):
-                row['date'] = datetime.date.fromisoformat(row['date'])
-            if isinstance(row['created_at'], str):
-                row['created_at'] = datetime.datetime.fromisoformat(row['created_at'])
-                
-            # Удаляем поля, которых нет в модели WeatherData (если такие есть)
-            filtered_row = {k: v for k, v in row.items() if k in models.WeatherData.__annotations__}
-            
-            weather_data.append(models.WeatherData(**filtered_row))
-        except Exception as e:
-            print(f"Ошибка при преобразовании данных о погоде: {str(e)}")
+    # city и date нужны для ключа следующей страницы, даже если не запрошены
+    columns = fields + [name for name in ("city", "date") if name not in fields]
+    after_city, after_date = after if after else ("", None)
     
-    return weather_data
+    rows: List[Dict[str, Any]] = []
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        if cities is None:
+            cursor.execute(_CITIES_FROM_SQL, (after_city,))
+            city_list = [row['city'] for row in cursor.fetchall()]
+        else:
+            city_list = sorted(city for city in set(cities) if city >= after_city)
+        
+        for city in city_list:
+            # Лишняя строка показывает, есть ли следующая страница
+            remaining = -1 if limit is None else limit + 1 - len(rows)
+            sql, params = _weather_range_sql(
+                columns, start_date, end_date, after_date if city == after_city else None
+            )
+            cursor.execute(sql, [city, *params, remaining])
+            rows.extend(cursor.fetchall())
+            if limit is not None and len(rows) > limit:
+                break
+    
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_key = (rows[-1]['city'], rows[-1]['date'])
+    
+    if len(columns) != len(fields):
+        rows = [{field: row[field] for field in fields} for row in rows]
+    return rows, next_key
 
+@metrics.db_timed("get_all_cities")
 def get_all_cities() -> List[str]:
     """Получение списка всех городов в БД."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("SELECT DISTINCT city FROM weather_data")
-    result = cursor.fetchall()
-    conn.close()
+        cursor.execute("SELECT DISTINCT city FROM weather_data")
+        result = cursor.fetchall()
     
     return [row['city'] for row in result]
 
-def save_model_metrics(city: str, metrics: Dict[str, float], file_path: str) -> int:
-    """Сохранение метрик модели в БД."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@metrics.db_timed("save_model_metrics")
+def save_model_metrics(city: str, metrics: Dict[str, float], file_path: str, version: int = 0) -> int:
+    """Сохранение метрик и текущей версии модели города в БД."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Сериализуем метрики в JSON
-    metrics_json = json.dumps(metrics)
+        # Сериализуем метрики в JSON
+        metrics_json = json.dumps(metrics)
     
-    cursor.execute('''
-    INSERT OR REPLACE INTO models (city, metrics, file_path)
-    VALUES (?, ?, ?)
-    ''', (city, metrics_json, file_path))
+        cursor.execute('''
+        INSERT INTO models (city, metrics, file_path, version)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(city) DO UPDATE SET
+            metrics = excluded.metrics,
+            file_path = excluded.file_path,
+            version = excluded.version,
+            created_at = CURRENT_TIMESTAMP
+        ''', (city, metrics_json, file_path, version))
     
-    model_id = cursor.lastrowid
+        cursor.execute("SELECT id FROM models WHERE city = ?", (city,))
+        model_id = cursor.fetchone()['id']
     
-    conn.commit()
-    conn.close()
+        conn.commit()
     
     logger.info(f"Сохранены метрики модели для города {city}")
     
     return model_id
 
+@metrics.db_timed("get_model_metrics")
 def get_model_metrics(city: str) -> Optional[Dict[str, float]]:
     """Получение метрик модели из БД."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("SELECT metrics FROM models WHERE city = ?", (city,))
-    result = cursor.fetchone()
-    conn.close()
+        cursor.execute("SELECT metrics FROM models WHERE city = ?", (city,))
+        result = cursor.fetchone()
     
     if result and 'metrics' in result:
         try:
@@ -262,49 +954,71 @@ def get_model_metrics(city: str) -> Optional[Dict[str, float]]:
     
     return None
 
+@metrics.db_timed("get_model_record")
+def get_model_record(city: str) -> Optional[Dict[str, Any]]:
+    """Получение записи о текущей модели города (путь к файлу, версия, дата обучения)."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute(
+            "SELECT city, file_path, version, created_at FROM models WHERE city = ?",
+            (city,)
+        )
+        result = cursor.fetchone()
+    
+    return result
+
+@metrics.db_timed("save_scraping_log")
 def save_scraping_log(
     city: str, 
     start_date: datetime.date, 
     end_date: datetime.date, 
     status: str, 
-    message: Optional[str] = None
+    message: Optional[str] = None,
+    fetched: Optional[int] = None,
+    skipped: Optional[int] = None,
+    updated: Optional[int] = None
 ) -> int:
-    """Сохранение лога скрапинга в БД."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """
+    Сохранение лога скрапинга в БД.
+    
+    fetched, skipped и updated - число собранных дней, дней, пропущенных
+    из-за уже имеющихся данных, и дней, данные за которые перезаписаны.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    INSERT INTO scraping_logs (city, start_date, end_date, status, message)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (city, start_date, end_date, status, message))
+        cursor.execute('''
+        INSERT INTO scraping_logs (city, start_date, end_date, status, message, fetched, skipped, updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (city, start_date, end_date, status, message, fetched, skipped, updated))
     
-    log_id = cursor.lastrowid
+        log_id = cursor.lastrowid
     
-    conn.commit()
-    conn.close()
+        conn.commit()
     
     logger.info(f"Сохранен лог скрапинга для города {city}")
     
     return log_id
 
+@metrics.db_timed("get_scraping_logs")
 def get_scraping_logs(city: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
     """Получение логов скрапинга из БД."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    query = "SELECT * FROM scraping_logs"
-    params = []
+        query = "SELECT * FROM scraping_logs"
+        params = []
     
-    if city:
-        query += " WHERE city = ?"
-        params.append(city)
+        if city:
+            query += " WHERE city = ?"
+            params.append(city)
     
-    query += " ORDER BY created_at DESC LIMIT ?"
-    params.append(limit)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
     
-    cursor.execute(query, params)
-    result = cursor.fetchall()
-    conn.close()
+        cursor.execute(query, params)
+        result = cursor.fetchall()
     
     # Преобразуем даты в строках в объекты datetime
     for row in result:
@@ -317,74 +1031,129 @@ def get_scraping_logs(city: Optional[str] = None, limit: int = 10) -> List[Dict[
     
     return result
 
+@metrics.db_timed("get_data_availability")
 def get_data_availability(city: str) -> Dict[str, Any]:
-    """Получение информации о доступности данных для города."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем самую раннюю и самую позднюю даты, а также количество записей
-    cursor.execute('''
-    SELECT 
-        MIN(date) as min_date, 
-        MAX(date) as max_date, 
-        COUNT(*) as count 
-    FROM weather_data 
-    WHERE city = ?
-    ''', (city,))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
-        return {
-            "available": False,
-            "min_date": None,
-            "max_date": None,
-            "count": 0
-        }
-    
-    # Преобразуем строки дат в объекты datetime
-    min_date = None
-    max_date = None
-    
-    if result['min_date']:
-        min_date = datetime.date.fromisoformat(result['min_date']) if isinstance(result['min_date'], str) else result['min_date']
-    
-    if result['max_date']:
-        max_date = datetime.date.fromisoformat(result['max_date']) if isinstance(result['max_date'], str) else result['max_date']
+    """Получение информации о доступности данных для города (по таблице покрытия)."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        # Самая ранняя и самая поздняя даты и число дней с данными (дата города уникальна)
+        cursor.execute('''
+        SELECT 
+            MIN(start_date) as min_date, 
+            MAX(end_date) as max_date, 
+            COALESCE(SUM(julianday(end_date) - julianday(start_date) + 1), 0) as count 
+        FROM weather_coverage 
+        WHERE city = ?
+        ''', (city,))
+    
+        result = cursor.fetchone()
     
+    count = int(result['count'])
     return {
-        "available": result['count'] > 0,
-        "min_date": min_date,
-        "max_date": max_date,
-        "count": result['count']
+        "available": count > 0,
+        "min_date": datetime.date.fromisoformat(result['min_date']) if result['min_date'] else None,
+        "max_date": datetime.date.fromisoformat(result['max_date']) if result['max_date'] else None,
+        "count": count
     }
 
-def get_missing_dates(city: str, start_date: datetime.date, end_date: datetime.date) -> List[datetime.date]:
-    """Получение списка дат, для которых отсутствуют данные в указанном промежутке."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Получаем все даты в промежутке
-    all_dates = []
-    current_date = start_date
-    while current_date <= end_date:
-        all_dates.append(current_date.isoformat())
-        current_date += datetime.timedelta(days=1)
-    
-    # Получаем даты, для которых есть данные
-    cursor.execute('''
-    SELECT date FROM weather_data 
-    WHERE city = ? AND date BETWEEN ? AND ?
-    ''', (city, start_date.isoformat(), end_date.isoformat()))
+@metrics.db_timed("get_coverage")
+def get_coverage(
+    city: str,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """
+    Диапазоны дат, за которые есть данные о погоде города.
     
-    result = cursor.fetchall()
-    conn.close()
+    Args:
+        city: Город
+        start_date: Начало периода (если None - без ограничения)
+        end_date: Конец периода (если None - без ограничения)
+        
+    Returns:
+        Отсортированные непересекающиеся диапазоны (начало, конец) включительно,
+        обрезанные по границам периода
+    """
+    low = start_date or datetime.date.min
+    high = end_date or datetime.date.max
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT start_date, end_date FROM weather_coverage
+        WHERE city = ? AND start_date <= ? AND end_date >= ?
+        ORDER BY start_date
+        ''', (city, high.isoformat(), low.isoformat()))
+        rows = cursor.fetchall()
     
-    existing_dates = [row['date'] for row in result]
+    return [
+        (max(datetime.date.fromisoformat(row['start_date']), low),
+         min(datetime.date.fromisoformat(row['end_date']), high))
+        for row in rows
+    ]
+
+@metrics.db_timed("get_missing_ranges")
+def get_missing_ranges(
+    city: str,
+    start_date: datetime.date,
+    end_date: datetime.date
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """Диапазоны дат периода, за которые данных нет (начало, конец включительно)."""
+    missing = []
+    next_date = start_date
+    for present_start, present_end in get_coverage(city, start_date, end_date):
+        if present_start > next_date:
+            missing.append((next_date, present_start - datetime.timedelta(days=1)))
+        next_date = present_end + datetime.timedelta(days=1)
+    if next_date <= end_date:
+        missing.append((next_date, end_date))
+    return missing
+
+@metrics.db_timed("get_missing_dates")
+def get_missing_dates(city: str, start_date: datetime.date, end_date: datetime.date) -> List[datetime.date]:
+    """Получение списка дат, для которых отсутствуют данные в указанном промежутке (по возрастанию)."""
+    return [
+        start + datetime.timedelta(days=offset)
+        for start, end in get_missing_ranges(city, start_date, end_date)
+        for offset in range((end - start).days + 1)
+    ]
+
+@metrics.db_timed("get_geocodes")
+def get_geocodes(city_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Получение сохранённых координат городов по нормализованным ключам."""
+    if not city_keys:
+        return {}
     
-    # Находим отсутствующие даты
-    missing_dates = set(all_dates) - set(existing_dates)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        placeholders = ", ".join("?" for _ in city_keys)
+        cursor.execute(f'''
+        SELECT city_key, city, lat, lon, found, checked_at FROM geocode_cache
+        WHERE city_key IN ({placeholders})
+        ''', list(city_keys))
+        result = cursor.fetchall()
     
-    # Преобразуем строки дат обратно в объекты datetime.date
-    return [datetime.date.fromisoformat(date_str) for date_str in missing_dates]
\ No newline at end of file
+    return {row['city_key']: row for row in result}
+
+@metrics.db_timed("save_geocode")
+def save_geocode(
+    city_key: str,
+    city: str,
+    lat: Optional[float],
+    lon: Optional[float],
+    checked_at: float
+) -> None:
+    """Сохранение координат города (lat/lon = None - город не найден)."""
+    with db_connection() as conn:
+        conn.execute('''
+        INSERT INTO geocode_cache (city_key, city, lat, lon, found, checked_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(city_key) DO UPDATE SET
+            city = excluded.city,
+            lat = excluded.lat,
+            lon = excluded.lon,
+            found = excluded.found,
+            checked_at = excluded.checked_at
+        ''', (city_key, city, lat, lon, int(lat is not None), checked_at))
+        conn.commit()
@@ -0,0 +1,165 @@
+"""
+Пулы для блокирующей работы обработчиков API.
+
+Обработчики FastAPI объявлены как async def и выполняются в цикле событий,
+поэтому синхронные вызовы (sqlite3, requests, NumPy и scikit-learn) из них
+выносятся в пулы потоков с ограниченным числом исполнителей и очереди:
+
+- io_pool - запросы к БД и файлам, синхронные HTTP-запросы;
+- cpu_pool - вычисления над данными процесса (генерация и проверка данных,
+  сериализация ответов, прогноз по загруженной модели).
+
+Обучение моделей выполняется в пуле процессов jobs.JobManager. Задачи cpu_pool
+читают состояние процесса (загруженные модели, хранилище признаков, кэш ответов,
+профиль запроса) и передаются замыканиями, поэтому это пул потоков: в пуле
+процессов модели загружались бы в каждом процессе заново. Запросы пула
+ввода-вывода при этом ждут только GIL, а не очереди вычислений.
+
+Если очередь пула заполнена, новая задача отклоняется с PoolBusyError, а не
+копится в памяти.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from . import profiling
+
+T = TypeVar("T")
+
+# Потоки и максимум ожидающих задач пула ввода-вывода
+IO_WORKERS = int(os.environ.get("WEATHER_IO_WORKERS", "8"))
+IO_QUEUE_SIZE = int(os.environ.get("WEATHER_IO_QUEUE_SIZE", "256"))
+
+# Потоки и максимум ожидающих задач пула вычислений
+CPU_WORKERS = int(os.environ.get("WEATHER_CPU_WORKERS", str(os.cpu_count() or 1)))
+CPU_QUEUE_SIZE = int(os.environ.get("WEATHER_CPU_QUEUE_SIZE", "64"))
+
+class PoolBusyError(Exception):
+    """Очередь пула заполнена."""
+
+class BoundedExecutor:
+    """
+    Пул потоков с ограниченной очередью и статистикой ожидания.
+
+    Потоки создаются при первой задаче; после shutdown пул можно
+    использовать снова (например, при повторном запуске приложения в тестах).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        if max_workers < 1 or max_queue < 0:
+            raise ValueError("Число потоков должно быть положительным, размер очереди - неотрицательным")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0}
+        self._max_queued = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Вызывается под блокировкой
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=f"weather-{self.name}"
+            )
+        return self._executor
+
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """
+        Постановка вызова в очередь пула.
+
+        Raises:
+            PoolBusyError: если в очереди уже max_queue задач
+        """
+        enqueued_at = time.perf_counter()
+        # Работа профилируемого запроса профилируется и в потоке пула
+        profile = profiling.current_profile.get()
+
+        def call():
+            waited = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            try:
+                if profile is None:
+                    result = func(*args, **kwargs)
+                else:
+                    result = profile.call(func, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._stats["failed"] += 1
+                raise
+            else:
+                with self._lock:
+                    self._stats["completed"] += 1
+            finally:
+                with self._lock:
+                    self._running -= 1
+            return result
+
+        with self._lock:
+            # Заняты все потоки и очередь
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise PoolBusyError(f"Очередь пула {self.name} заполнена ({self.max_queue} задач)")
+            future = self._get_executor().submit(call)
+            self._queued += 1
+            self._stats["submitted"] += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        # Задача, отменённая до начала выполнения, так и не покинула очередь
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._stats["cancelled"] += 1
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Выполнение вызова в пуле без блокировки цикла событий."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики задач, текущая глубина очереди и время ожидания в ней."""
+        with self._lock:
+            started = self._stats["submitted"] - self._queued - self._stats["cancelled"]
+            return {
+                **self._stats,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._queued,
+                "max_queued": self._max_queued,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "wait_time_max": round(self._wait_time_max, 6),
+                "wait_time_avg": round(self._wait_time_total / started, 6) if started else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Остановка потоков; задачи, не начавшие выполнение, отменяются."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+io_pool = BoundedExecutor("io", IO_WORKERS, IO_QUEUE_SIZE)
+cpu_pool = BoundedExecutor("cpu", CPU_WORKERS, CPU_QUEUE_SIZE)
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика всех пулов по именам."""
+    return {pool.name: pool.stats() for pool in (io_pool, cpu_pool)}
+
+def shutdown_pools(wait: bool = True) -> None:
+    """Остановка всех пулов (вызывается при остановке приложения)."""
+    for pool in (io_pool, cpu_pool):
+        pool.shutdown(wait=wait)
@@ -0,0 +1,41 @@
+"""
+Потоковая выгрузка данных о погоде в NDJSON и CSV.
+
+Пакеты строк из database.iter_weather_data кодируются по одному, поэтому
+ответ отдаётся частями и память не растёт с размером выгрузки.
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from . import database
+
+Batch = List[Tuple[Any, ...]]
+
+def ndjson_chunks(batches: Iterable[Batch], columns: Sequence[str] = database.EXPORT_COLUMNS) -> Iterator[bytes]:
+    """Строки в формате NDJSON: по одному JSON-объекту на строку."""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch
+        ).encode("utf-8")
+
+def csv_chunks(batches: Iterable[Batch], columns: Sequence[str] = database.EXPORT_COLUMNS) -> Iterator[bytes]:
+    """Строки в формате CSV с заголовком."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Заголовок отдаётся и для пустой выборки
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+# Формат выгрузки: функция кодирования и тип содержимого
+EXPORT_FORMATS: Dict[str, Tuple[Callable[..., Iterator[bytes]], str]] = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+}
@@ -0,0 +1,252 @@
+"""
+Лаговые и скользящие признаки и хранилище последних наблюдений городов.
+
+Для каждого наблюдения строятся признаки по предыдущим дням: значения с лагом
+1..k и скользящие среднее и дисперсия за 3, 7 и 30 наблюдений по каждой
+величине. Рекурсивному прогнозу нужны только последние context_size(lags)
+наблюдений города: хранилище держит их в памяти и перечитывает из БД после
+записи новых данных города.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+# Величины, по которым строятся признаки (порядок столбцов матрицы значений)
+VALUE_COLUMNS = ("temperature", "humidity", "pressure", "wind_speed", "precipitation")
+
+# Число лагов по умолчанию
+DEFAULT_LAGS = 7
+
+# Окна скользящих статистик (в наблюдениях)
+ROLLING_WINDOWS = (3, 7, 30)
+
+# Максимум хвостов рядов (город, число лагов) в памяти
+FEATURE_STORE_SIZE = int(os.environ.get("WEATHER_FEATURE_STORE_SIZE", "1024"))
+
+def feature_names(lags: int = DEFAULT_LAGS) -> List[str]:
+    """Названия столбцов матрицы признаков."""
+    names = []
+    for column in VALUE_COLUMNS:
+        names += [f"{column}_lag{lag}" for lag in range(1, lags + 1)]
+        for window in ROLLING_WINDOWS:
+            names += [f"{column}_mean{window}", f"{column}_var{window}"]
+    return names
+
+def context_size(lags: int = DEFAULT_LAGS) -> int:
+    """Сколько предыдущих наблюдений нужно для признаков одного дня."""
+    return max(lags, *ROLLING_WINDOWS)
+
+def build_features(values: np.ndarray, lags: int = DEFAULT_LAGS) -> np.ndarray:
+    """
+    Векторное построение признаков по ряду наблюдений.
+
+    Args:
+        values: Матрица (n, len(VALUE_COLUMNS)) в порядке возрастания дат
+        lags: Число лагов
+
+    Returns:
+        Матрица (n + 1, len(feature_names(lags))): строка i описывает
+        наблюдения 0..i-1 и служит входом для прогноза i-го дня, последняя
+        строка - для следующего после ряда дня. Строка 0 заполнена NaN.
+        Пока истории меньше лага или окна, берутся самое раннее значение
+        и статистики по имеющимся наблюдениям.
+    """
+    values = np.asarray(values, dtype=float)
+    n, n_columns = values.shape
+    result = np.full((n + 1, n_columns * (lags + 2 * len(ROLLING_WINDOWS))), np.nan)
+    if n == 0:
+        return result
+
+    # Суммы считаются по отклонениям от среднего, чтобы не терять точность
+    # на величинах вроде давления (~1000 гПа)
+    centered = values - values.mean(axis=0)
+    cumsum = np.vstack([np.zeros(n_columns), np.cumsum(centered, axis=0)])
+    cumsq = np.vstack([np.zeros(n_columns), np.cumsum(centered ** 2, axis=0)])
+    offset = values.mean(axis=0)
+
+    rows = np.arange(1, n + 1)
+    position = 0
+    block = lags + 2 * len(ROLLING_WINDOWS)
+    for lag in range(1, lags + 1):
+        source = np.maximum(rows - lag, 0)
+        result[1:, position + lag - 1::block] = values[source]
+    position += lags
+    for window in ROLLING_WINDOWS:
+        start = np.maximum(rows - window, 0)
+        count = (rows - start)[:, None]
+        total = cumsum[rows] - cumsum[start]
+        mean = total / count
+        variance = np.maximum((cumsq[rows] - cumsq[start]) / count - mean ** 2, 0.0)
+        result[1:, position::block] = mean + offset
+        result[1:, position + 1::block] = variance
+        position += 2
+    return result
+
+def training_matrix(dates: np.ndarray, values: np.ndarray, lags: int = DEFAULT_LAGS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Даты, признаки и значения наблюдений, для которых есть история (без первого дня).
+
+    Строки ряда упорядочиваются по дате, признаки строятся по всему ряду.
+    """
+    order = np.argsort(dates, kind="stable")
+    dates = np.asarray(dates, dtype="datetime64[D]")[order]
+    values = np.asarray(values, dtype=float)[order]
+    return dates[1:], build_features(values, lags)[1:-1], values[1:]
+
+class CityHistory(NamedTuple):
+    """Последние наблюдения города по возрастанию дат."""
+    dates: np.ndarray
+    values: np.ndarray
+
+def latest_history(dates: np.ndarray, values: np.ndarray, lags: int = DEFAULT_LAGS) -> CityHistory:
+    """Последние context_size(lags) наблюдений ряда - всё, что нужно для прогноза."""
+    order = np.argsort(dates, kind="stable")[-context_size(lags):]
+    return CityHistory(
+        np.asarray(dates, dtype="datetime64[D]")[order],
+        np.asarray(values, dtype=float)[order],
+    )
+
+def rollout(
+    last_date: np.datetime64,
+    history: np.ndarray,
+    steps: int,
+    predict: Callable[[np.datetime64, np.ndarray], Sequence[float]],
+    lags: int = DEFAULT_LAGS,
+    targets: Sequence[str] = ("temperature", "humidity", "precipitation"),
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Рекурсивный многошаговый прогноз.
+
+    На каждом шаге признаки строятся по последним наблюдениям вместе с уже
+    спрогнозированными днями; непрогнозируемые величины (давление, ветер)
+    переносятся с последнего дня.
+
+    Args:
+        last_date: Дата последнего наблюдения
+        history: Последние наблюдения (m, len(VALUE_COLUMNS)), по возрастанию дат
+        steps: Горизонт прогноза в днях
+        predict: Функция (дата, признаки) -> значения targets
+        lags: Число лагов
+        targets: Прогнозируемые величины
+
+    Returns:
+        Даты прогноза и матрица (steps, len(targets)) прогнозов
+    """
+    context = context_size(lags)
+    target_columns = [VALUE_COLUMNS.index(name) for name in targets]
+    buffer = np.empty((context + steps, len(VALUE_COLUMNS)))
+    history = np.asarray(history, dtype=float)[-context:]
+    filled = len(history)
+    buffer[:filled] = history
+
+    dates = np.datetime64(last_date, "D") + np.arange(1, steps + 1)
+    predictions = np.empty((steps, len(targets)))
+    for step in range(steps):
+        window = buffer[max(0, filled - context):filled]
+        features = build_features(window, lags)[-1]
+        predictions[step] = predict(dates[step], features)
+
+        buffer[filled] = buffer[filled - 1]
+        buffer[filled, target_columns] = predictions[step]
+        filled += 1
+    return dates, predictions
+
+class FeatureStore:
+    """
+    Хвосты рядов наблюдений по городам в памяти процесса (LRU).
+
+    Для каждого города и числа лагов хранится не больше context_size(lags)
+    последних наблюдений. Запись данных города только увеличивает его
+    поколение, а хвост перечитывается из БД при следующем обращении.
+    """
+
+    def __init__(self, max_entries: int = FEATURE_STORE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, CityHistory]]" = OrderedDict()
+        # Поколения данных городов: хвост, прочитанный до записи, не сохраняется
+        self._generations: Dict[str, int] = {}
+        self._database_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "evictions": 0}
+        self._build_time = 0.0
+
+    def _check_database(self) -> None:
+        # Данные другой БД (например, в тестах) недействительны (вызывается под блокировкой)
+        if self._database_path != database.DATABASE_PATH:
+            self._entries.clear()
+            self._generations.clear()
+            self._database_path = database.DATABASE_PATH
+
+    def get(self, city: str, lags: int = DEFAULT_LAGS) -> CityHistory:
+        """Последние наблюдения города для модели с lags лагами (при необходимости читаются из БД)."""
+        key = (city, lags)
+        with self._lock:
+            self._check_database()
+            generation = self._generations.get(city, 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+
+        while True:
+            started = time.perf_counter()
+            columns = database.get_weather_columns(city, 0, limit=context_size(lags))
+            values = np.column_stack([columns[name] for name in VALUE_COLUMNS]) if len(columns) else \
+                np.empty((0, len(VALUE_COLUMNS)))
+            history = latest_history(columns["date"], values, lags)
+
+            with self._lock:
+                self._build_time += time.perf_counter() - started
+                self._stats["builds"] += 1
+                self._check_database()
+                current = self._generations.get(city, 0)
+                # Пока шло чтение, данные города изменились: хвост читается заново
+                if current != generation:
+                    generation = current
+                    continue
+                self._entries[key] = (generation, history)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+                return history
+
+    def on_write(self, cities: Set[str]) -> None:
+        """Обработчик записи в weather_data (регистрируется в database): новое поколение городов."""
+        with self._lock:
+            self._check_database()
+            for city in cities:
+                self._generations[city] = self._generations.get(city, 0) + 1
+
+    def invalidate(self, city: Optional[str] = None) -> None:
+        """Удаление хвостов города (или всех городов) из памяти."""
+        with self._lock:
+            if city is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == city]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики обращений и чтений из БД, размер хранилища."""
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "rows": sum(len(history.dates) for _, history in self._entries.values()),
+                "build_time_total": round(self._build_time, 6),
+            }
+
+feature_store = FeatureStore()
+database.add_write_listener(feature_store.on_write)
@@ -0,0 +1,224 @@
+"""
+Асинхронный движок HTTP-запросов для скрапера.
+
+Ограничивает число одновременных запросов семафором, темп запросов к каждому
+хосту - token bucket, повторяет неудачные запросы с экспоненциальной задержкой
+со случайным разбросом и ограничивает время каждого запроса.
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+T = TypeVar("T")
+
+# Параметры движка по умолчанию
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE_PER_HOST = 20.0  # запросов в секунду
+DEFAULT_BURST = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.25  # секунды
+DEFAULT_BACKOFF_MAX = 5.0
+DEFAULT_TIMEOUT = 10.0
+
+# HTTP-статусы, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class FetchError(Exception):
+    """Запрос не удался после всех повторных попыток."""
+
+    def __init__(self, url: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int, retry_after: float = 0.0):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Значение заголовка Retry-After в секундах (поддерживается только числовая форма)."""
+    try:
+        return max(0.0, float(value)) if value else 0.0
+    except ValueError:
+        return 0.0
+
+class TokenBucket:
+    """Ограничитель темпа запросов: ``rate`` токенов в секунду, не более ``capacity`` в запасе."""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("Темп и ёмкость должны быть положительными")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Ожидание свободного токена."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_MAX) -> float:
+    """Задержка перед повтором: экспоненциальный рост с полным случайным разбросом."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AsyncFetcher:
+    """
+    Асинхронный HTTP-клиент с ограничением параллельности и темпа запросов.
+
+    Используется как асинхронный контекстный менеджер:
+
+        async with AsyncFetcher(concurrency=4) as fetcher:
+            data = await fetcher.get_json(url, params)
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_per_host: float = DEFAULT_RATE_PER_HOST,
+        burst: int = DEFAULT_BURST,
+        retries: int = DEFAULT_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        if concurrency < 1:
+            raise ValueError("Параллельность должна быть не меньше 1")
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return bucket
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET-запрос с разбором JSON-ответа.
+
+        Raises:
+            FetchError: если запрос не удался после всех повторных попыток
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncFetcher нужно использовать внутри 'async with'")
+
+        bucket = self._bucket(url)
+        for attempt in range(self.retries + 1):
+            await bucket.acquire()
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    async with self._session.get(url, params=params) as response:
+                        if response.status in RETRY_STATUSES:
+                            raise _RetryableStatus(
+                                response.status,
+                                _parse_retry_after(response.headers.get("Retry-After"))
+                            )
+                        if response.status >= 400:
+                            self.stats["errors"] += 1
+                            raise FetchError(url, f"HTTP {response.status}", response.status)
+                        return await response.json(content_type=None)
+            except (_RetryableStatus, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    self.stats["errors"] += 1
+                    status = e.status if isinstance(e, _RetryableStatus) else None
+                    raise FetchError(url, str(e) or type(e).__name__, status) from e
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if isinstance(e, _RetryableStatus):
+                    delay = max(delay, e.retry_after)
+
+            # Пауза перед повтором выполняется вне семафора, чтобы не занимать слот
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def get_json_many(
+        self,
+        requests: Iterable[Tuple[str, Optional[Dict[str, Any]]]]
+    ) -> List[Any]:
+        """Параллельное выполнение набора GET-запросов; ошибки возвращаются на месте результатов."""
+        return await asyncio.gather(
+            *(self.get_json(url, params) for url, params in requests),
+            return_exceptions=True
+        )
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Выполнение корутины из синхронного кода.
+
+    Если в текущем потоке уже работает цикл событий, корутина выполняется
+    в отдельном потоке со своим циклом.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    outcome: Dict[str, Any] = {}
+
+    def runner():
+        try:
+            outcome["result"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=runner, name="fetcher-run-sync")
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def fetch_json_many(
+    requests: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+    **options
+) -> List[Any]:
+    """Синхронная точка входа: параллельное выполнение GET-запросов через AsyncFetcher."""
+    requests = list(requests)
+
+    async def fetch():
+        async with AsyncFetcher(**options) as fetcher:
+            return await fetcher.get_json_many(requests)
+
+    return run_sync(fetch())
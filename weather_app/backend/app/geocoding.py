@@ -0,0 +1,175 @@
+"""
+Кэш геокодирования: координаты городов для OpenWeatherMap API.
+
+Координаты хранятся в таблице geocode_cache, перед ней - LRU в памяти процесса.
+Ответ "город не найден" тоже кэшируется, но только на NEGATIVE_TTL секунд.
+Ошибки запроса к API не кэшируются.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+Coordinates = Tuple[float, float]
+
+# Количество городов в памяти процесса
+GEOCODE_LRU_SIZE = 1024
+
+# Время жизни записи "город не найден", секунды
+NEGATIVE_TTL = 24 * 60 * 60
+
+def normalize_city(city: str) -> str:
+    """Нормализация названия города для ключа кэша."""
+    return " ".join(city.split()).casefold().replace("ё", "е")
+
+class GeocodeCache:
+    """Двухуровневый кэш координат: LRU в памяти и таблица в SQLite."""
+
+    def __init__(self, max_size: int = GEOCODE_LRU_SIZE, negative_ttl: float = NEGATIVE_TTL):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        # ключ -> (координаты или None, момент истечения или None)
+        self._entries: "OrderedDict[str, Tuple[Optional[Coordinates], Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "negative_hits": 0, "misses": 0}
+
+    def _remember(self, key: str, coords: Optional[Coordinates], checked_at: float) -> None:
+        expires_at = None if coords is not None else checked_at + self.negative_ttl
+        with self._lock:
+            self._entries[key] = (coords, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _from_memory(self, key: str) -> Tuple[bool, Optional[Coordinates]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            coords, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            if coords is None:
+                self._stats["negative_hits"] += 1
+            return True, coords
+
+    def _from_database(self, keys: List[str]) -> Dict[str, Optional[Coordinates]]:
+        """Чтение ещё действующих записей из БД с переносом их в память."""
+        try:
+            rows = database.get_geocodes(keys)
+        except sqlite3.Error as e:
+            logger.warning(f"Кэш геокодирования в БД недоступен: {str(e)}")
+            return {}
+
+        now = time.time()
+        found = {}
+        for key, row in rows.items():
+            if not row['found'] and row['checked_at'] + self.negative_ttl <= now:
+                continue
+            coords = (row['lat'], row['lon']) if row['found'] else None
+            self._remember(key, coords, row['checked_at'])
+            found[key] = coords
+            with self._lock:
+                self._stats["db_hits"] += 1
+                if coords is None:
+                    self._stats["negative_hits"] += 1
+        return found
+
+    def lookup(self, city: str) -> Tuple[bool, Optional[Coordinates]]:
+        """
+        Поиск города в кэше без обращения к API.
+
+        Returns:
+            (есть ли запись в кэше, координаты или None для ненайденного города)
+        """
+        key = normalize_city(city)
+        cached, coords = self._from_memory(key)
+        if cached:
+            return True, coords
+        found = self._from_database([key])
+        if key in found:
+            return True, found[key]
+        return False, None
+
+    def store(self, city: str, coords: Optional[Coordinates]) -> None:
+        """Сохранение результата геокодирования в память и БД."""
+        key = normalize_city(city)
+        checked_at = time.time()
+        self._remember(key, coords, checked_at)
+        try:
+            database.save_geocode(
+                key, city,
+                coords[0] if coords else None,
+                coords[1] if coords else None,
+                checked_at
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось сохранить координаты города {city}: {str(e)}")
+
+    def resolve(self, city: str, fetch: Callable[[str], Optional[Coordinates]]) -> Optional[Coordinates]:
+        """Координаты города из кэша или через fetch (результат кэшируется)."""
+        cached, coords = self.lookup(city)
+        if cached:
+            return coords
+        with self._lock:
+            self._stats["misses"] += 1
+        coords = fetch(city)
+        self.store(city, coords)
+        return coords
+
+    async def resolve_async(
+        self,
+        city: str,
+        fetch: Callable[[str], Awaitable[Optional[Coordinates]]]
+    ) -> Optional[Coordinates]:
+        """Асинхронный вариант resolve."""
+        cached, coords = self.lookup(city)
+        if cached:
+            return coords
+        with self._lock:
+            self._stats["misses"] += 1
+        coords = await fetch(city)
+        self.store(city, coords)
+        return coords
+
+    def missing(self, cities: Iterable[str]) -> List[str]:
+        """
+        Города, которых нет ни в памяти, ни в БД.
+
+        Найденные в БД записи одним запросом загружаются в память.
+        """
+        pending: Dict[str, str] = {}
+        for city in cities:
+            key = normalize_city(city)
+            if key not in pending and not self._from_memory(key)[0]:
+                pending[key] = city
+        found = self._from_database(list(pending))
+        return [city for key, city in pending.items() if key not in found]
+
+    def clear(self) -> None:
+        """Очистка кэша в памяти и сброс статистики (записи в БД сохраняются)."""
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика обращений к кэшу."""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["db_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,117 @@
+"""
+Общий HTTP-клиент для синхронных запросов к внешним API.
+
+Один requests.Session на процесс: соединения переиспользуются (keep-alive),
+размер пула, таймауты и повторные попытки настраиваются при создании клиента.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Параметры клиента по умолчанию
+HTTP_POOL_SIZE = 10
+HTTP_CONNECT_TIMEOUT = 3.05  # секунды
+HTTP_READ_TIMEOUT = 10.0
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+
+# HTTP-статусы, при которых запрос повторяется
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class HttpClient:
+    """Обёртка над requests.Session с пулом соединений, таймаутами и повторами."""
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+        })
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._compressed_responses = 0
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        """GET-запрос через общий пул соединений (таймаут по умолчанию - из настроек клиента)."""
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.get(url, params=params, **kwargs)
+
+        # requests распаковывает gzip/deflate сам, здесь только учитываем сжатые ответы
+        compressed = response.headers.get("Content-Encoding", "") in ("gzip", "deflate")
+        with self._lock:
+            self._requests += 1
+            if compressed:
+                self._compressed_responses += 1
+        return response
+
+    def close(self) -> None:
+        """Закрытие всех соединений пула."""
+        self.session.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Количество запросов и открытых соединений (по данным пулов urllib3)."""
+        connections = 0
+        for key in self._adapter.poolmanager.pools.keys():
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "connections_opened": connections,
+                "compressed_responses": self._compressed_responses,
+            }
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Общий клиент процесса (создаётся при первом обращении)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+def set_http_client(client: Optional[HttpClient]) -> Optional[HttpClient]:
+    """
+    Замена общего клиента (например, на клиент с другими настройками в тестах).
+
+    Returns:
+        Предыдущий клиент; закрывать его - задача вызывающего кода
+    """
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
+
+def close_http_client() -> None:
+    """Закрытие общего клиента (вызывается при остановке приложения)."""
+    previous = set_http_client(None)
+    if previous is not None:
+        previous.close()
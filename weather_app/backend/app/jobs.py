@@ -0,0 +1,280 @@
+"""
+Фоновые задачи обучения моделей.
+
+Обучение выполняется в отдельном процессе (ProcessPoolExecutor), поэтому
+обработчики API не блокируют цикл событий. Для каждого города одновременно
+существует не более одной активной задачи, число ожидающих задач ограничено.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from . import database, features, metrics, ml_model
+
+logger = logging.getLogger(__name__)
+
+# Число процессов обучения
+TRAINING_WORKERS = int(os.environ.get("WEATHER_TRAINING_WORKERS", "1"))
+
+# Максимум задач в очереди и в работе одновременно
+TRAINING_QUEUE_SIZE = int(os.environ.get("WEATHER_TRAINING_QUEUE_SIZE", "16"))
+
+# Сколько завершённых задач хранить для GET /jobs/{id}
+JOB_HISTORY_SIZE = 200
+
+# На скольких последних днях обучается модель
+TRAINING_DAYS = 30
+
+# Сколько дней читать для обучения: дням обучения нужна полная история
+# скользящих окон, как у прогноза по хранилищу признаков
+TRAINING_HISTORY_DAYS = TRAINING_DAYS + features.context_size(ml_model.DEFAULT_MODEL_CONFIG.lags)
+
+# Статусы задачи
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Время выполнения задач по итоговому статусу
+_JOB_DURATION = {status: metrics.TRAINING_JOB_DURATION.labels(status) for status in (SUCCEEDED, FAILED)}
+
+class QueueFullError(Exception):
+    """Очередь задач обучения заполнена."""
+
+def train_city_model(database_path: str, model_dir: str, city: str, n_jobs: Optional[int] = -1) -> Dict[str, Any]:
+    """
+    Обучение модели города (выполняется в процессе обучения).
+
+    Пути передаются явно: процесс запускается через spawn и не видит
+    значений, изменённых в родительском процессе. n_jobs - потоки обучения
+    этого процесса (доля ядер при нескольких процессах обучения).
+    """
+    started = time.time()
+    database.DATABASE_PATH = database_path
+    ml_model.MODEL_DIR = model_dir
+
+    data = database.get_weather_columns(city, TRAINING_HISTORY_DAYS)
+    config = ml_model.DEFAULT_MODEL_CONFIG.model_copy(update={"n_jobs": n_jobs})
+    model_metrics = ml_model.train_model(data, config)
+    return {"metrics": model_metrics, "started_at": started}
+
+class TrainingJob:
+    """Состояние одной задачи обучения."""
+
+    def __init__(self, city: str):
+        self.id = uuid.uuid4().hex
+        self.city = city
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.metrics: Optional[Dict[str, float]] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def refresh(self) -> None:
+        """Перевод задачи в RUNNING, когда исполнитель взял её в работу."""
+        if self.status == QUEUED and self.future is not None and self.future.running():
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "id": self.id,
+            "city": self.city,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": duration,
+            "metrics": self.metrics,
+            "error": self.error,
+        }
+
+class JobManager:
+    """Очередь задач обучения с дедупликацией по городу."""
+
+    def __init__(
+        self,
+        max_workers: int = TRAINING_WORKERS,
+        max_queue: int = TRAINING_QUEUE_SIZE,
+        executor: Optional[Executor] = None,
+        history_size: int = JOB_HISTORY_SIZE,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.history_size = history_size
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._active_by_city: Dict[str, TrainingJob] = {}
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    @property
+    def threads_per_worker(self) -> int:
+        """Потоки обучения одного процесса: ядра делятся между процессами пула."""
+        return max(1, (os.cpu_count() or 1) // self.max_workers)
+
+    def _get_executor(self) -> Executor:
+        # Процессы создаются при первой задаче; spawn не наследует потоки
+        # и соединения с БД родительского процесса
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, city: str) -> TrainingJob:
+        """
+        Постановка задачи обучения модели города.
+
+        Если для города уже есть задача в очереди или в работе, возвращается она.
+
+        Raises:
+            QueueFullError: если активных задач уже max_queue
+        """
+        with self._lock:
+            job = self._active_by_city.get(city)
+            if job is not None:
+                self._stats["deduplicated"] += 1
+                return job
+            if len(self._active_by_city) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueFullError(f"Очередь обучения заполнена ({self.max_queue} задач)")
+
+            job = TrainingJob(city)
+            self._jobs[job.id] = job
+            self._active_by_city[city] = job
+            self._stats["submitted"] += 1
+            self._trim_history()
+
+        try:
+            future = self._get_executor().submit(
+                train_city_model, database.DATABASE_PATH, ml_model.MODEL_DIR, city, self.threads_per_worker
+            )
+        except Exception as e:
+            self._finish(job, error=str(e))
+            raise
+        with self._lock:
+            if job.active:
+                job.future = future
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        return job
+
+    def _on_done(self, job: TrainingJob, future: Future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.warning(f"Обучение модели для города {job.city} завершилось ошибкой: {str(e)}")
+            self._finish(job, error=str(e) or type(e).__name__)
+        else:
+            self._finish(job, model_metrics=result["metrics"], started_at=result["started_at"])
+            # Модель обучена в другом процессе: оповещаем обработчики этого процесса
+            ml_model.notify_model_updated(job.city)
+
+    def _finish(
+        self,
+        job: TrainingJob,
+        model_metrics: Optional[Dict[str, float]] = None,
+        error: Optional[str] = None,
+        started_at: Optional[float] = None,
+    ) -> None:
+        with self._lock:
+            job.finished_at = time.time()
+            job.started_at = started_at or job.started_at or job.finished_at
+            if error is None:
+                job.status = SUCCEEDED
+                job.metrics = model_metrics
+                self._stats["succeeded"] += 1
+            else:
+                job.status = FAILED
+                job.error = error
+                self._stats["failed"] += 1
+            job.future = None
+            _JOB_DURATION[job.status].observe(job.finished_at - job.started_at)
+            if self._active_by_city.get(job.city) is job:
+                del self._active_by_city[job.city]
+
+    def _trim_history(self) -> None:
+        """Удаление самых старых завершённых задач (вызывается под блокировкой)."""
+        excess = len(self._jobs) - self.history_size
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if not job.active][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Состояние задачи или None, если задача неизвестна."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.refresh()
+            return job.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики задач и текущая глубина очереди."""
+        with self._lock:
+            for job in self._active_by_city.values():
+                job.refresh()
+            running = sum(job.status == RUNNING for job in self._active_by_city.values())
+            return {
+                **self._stats,
+                "active": len(self._active_by_city),
+                "running": running,
+                "queued": len(self._active_by_city) - running,
+                "max_queue": self.max_queue,
+                "max_workers": self.max_workers,
+                "tracked": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Остановка процессов обучения (вызывается при остановке приложения)."""
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    """Общий менеджер задач процесса (создаётся при первом обращении)."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+def set_job_manager(manager: Optional[JobManager]) -> Optional[JobManager]:
+    """
+    Замена общего менеджера (например, на менеджер с пулом потоков в тестах).
+
+    Returns:
+        Предыдущий менеджер; останавливать его - задача вызывающего кода
+    """
+    global _manager
+    with _manager_lock:
+        previous, _manager = _manager, manager
+    return previous
+
+def close_job_manager() -> None:
+    """Остановка общего менеджера."""
+    previous = set_job_manager(None)
+    if previous is not None:
+        previous.shutdown(wait=False)
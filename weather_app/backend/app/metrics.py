@@ -0,0 +1,342 @@
+"""
+Метрики бэкенда в текстовом формате Prometheus (GET /metrics).
+
+Счётчики и гистограммы хранятся в памяти процесса. Дочерние метрики с
+конкретными значениями меток создаются один раз (labels) и привязываются
+заранее - при объявлении инструментируемой функции или при первом запросе
+к маршруту, поэтому на горячем пути остаются только поиск корзины и
+увеличение счётчиков под блокировкой. Значения, которые уже есть в
+статистике модулей (очереди пулов, соединения с БД), добавляются сборщиками
+только в момент выдачи метрик.
+
+Все метрики объявлены в этом модуле: модули, загружаемые повторно под другим
+именем (как scraper в тестах), не регистрируют их второй раз.
+"""
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Границы корзин гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Границы корзин для обучения модели, секунды
+TRAINING_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Образец сборщика: (имя, тип, описание, [(метки, значение)])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = 0.0
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class _HistogramChild:
+    __slots__ = ("_upper_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._upper_bounds = upper_bounds
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._sum = 0.0
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Накопленные по границам счётчики и сумма наблюдений."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        for index in range(1, len(counts)):
+            counts[index] += counts[index - 1]
+        return counts, total
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Дочерняя метрика для значений меток (создаётся при первом обращении).
+
+        Результат стоит сохранить и использовать на горячем пути напрямую.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def clear(self) -> None:
+        """Обнуление значений (привязанные дочерние метрики остаются действительными)."""
+        for _, child in self.children():
+            child.reset()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self.children():
+            lines += self._render_child(list(zip(self.labelnames, values)), child)
+        return lines
+
+    def _render_child(self, labels: List[Tuple[str, str]], child: Any) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def _render_child(self, labels: List[Tuple[str, str]], child: _CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+class Histogram(_Metric):
+    """Гистограмма наблюдений с фиксированными границами корзин."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _render_child(self, labels: List[Tuple[str, str]], child: _HistogramChild) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            bucket_labels = _format_labels(labels + [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {counts[-1]}")
+        return lines
+
+class Registry:
+    """Набор метрик и сборщиков, выдаваемых по /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Добавление функции, возвращающей значения метрик в момент выдачи."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        """Обнуление всех метрик (например, между тестами)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        with self._lock:
+            registered, collectors = list(self._metrics.values()), list(self._collectors)
+        lines = []
+        for metric in registered:
+            lines += metric.render()
+        for collector in collectors:
+            for name, type_name, documentation, samples in collector():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {type_name}"]
+                lines += [
+                    f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}"
+                    for labels, value in samples
+                ]
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def timed(histogram_child: _HistogramChild, errors: Optional[_CounterChild] = None) -> Callable:
+    """
+    Декоратор: длительность вызова в histogram_child, исключения - в счётчик errors.
+
+    Дочерние метрики привязываются при объявлении функции. Поддерживаются
+    обычные функции и корутины; генераторы не поддерживаются (измерялось бы
+    только создание генератора).
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+            raise TypeError(f"{func.__name__}: генераторы не поддерживаются")
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc()
+                    raise
+                finally:
+                    histogram_child.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc()
+                raise
+            finally:
+                histogram_child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+# Метрики приложения
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "weather_http_request_duration_seconds",
+    "Время обработки HTTP-запросов по маршрутам",
+    ("method", "route"),
+))
+HTTP_RESPONSES = REGISTRY.register(Counter(
+    "weather_http_responses_total",
+    "Ответы HTTP по маршрутам и классам статуса",
+    ("method", "route", "status"),
+))
+
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "weather_db_query_duration_seconds",
+    "Время выполнения функций работы с БД",
+    ("function",),
+))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "weather_db_query_errors_total",
+    "Ошибки функций работы с БД",
+    ("function",),
+))
+DB_POOL_WAIT = REGISTRY.register(Histogram(
+    "weather_db_pool_wait_seconds",
+    "Время ожидания соединения, когда все соединения пула БД заняты",
+))
+
+UPSTREAM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "weather_upstream_request_duration_seconds",
+    "Время запросов к OpenWeatherMap",
+    ("endpoint",),
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "weather_upstream_errors_total",
+    "Неудачные запросы к OpenWeatherMap (после всех повторов)",
+    ("endpoint",),
+))
+
+MODEL_FIT_DURATION = REGISTRY.register(Histogram(
+    "weather_model_fit_duration_seconds",
+    "Время обучения модели города в этом процессе",
+    buckets=TRAINING_BUCKETS,
+))
+# Обучение через очередь идёт в процессах пула: его время учитывается по задачам
+TRAINING_JOB_DURATION = REGISTRY.register(Histogram(
+    "weather_training_job_duration_seconds",
+    "Время выполнения задач обучения по статусу",
+    ("status",),
+    buckets=TRAINING_BUCKETS,
+))
+MODEL_PREDICT_DURATION = REGISTRY.register(Histogram(
+    "weather_model_predict_duration_seconds",
+    "Время построения прогноза",
+))
+
+def db_timed(function: str) -> Callable:
+    """Декоратор функции database: время и ошибки с меткой function."""
+    return timed(DB_QUERY_DURATION.labels(function), DB_QUERY_ERRORS.labels(function))
+
+def upstream_timed(endpoint: str) -> Callable:
+    """Декоратор запроса к OpenWeatherMap: время и ошибки с меткой endpoint."""
+    return timed(UPSTREAM_REQUEST_DURATION.labels(endpoint), UPSTREAM_ERRORS.labels(endpoint))
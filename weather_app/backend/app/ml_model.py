@@ -2,21 +2,167 @@ import numpy as np
 import datetime
 import joblib
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from backend.app import models
+import re
+from concurrent.futures import ThreadPoolExecutor
+from backend.app import models, registry, database, features, metrics
 
-# Путь для сохранения обученной модели
-MODEL_PATH = "/app/database/weather_model.joblib"
-SCALER_PATH = "/app/database/weather_scaler.joblib"
-ENCODER_PATH = "/app/database/weather_encoder.joblib"
+# Каталог с моделями городов: <MODEL_DIR>/<город>/v<версия>.joblib
+MODEL_DIR = "/app/database/models"
 
-def prepare_data(data: List[models.WeatherData]):
-    """Подготовка данных для обучения модели."""
+# Сколько моделей городов держать в памяти одновременно
+MAX_RESIDENT_MODELS = 8
+
+# Сколько последних версий модели города хранить на диске
+MODEL_VERSIONS_TO_KEEP = 3
+
+# Целевые переменные модели в порядке столбцов матрицы Y
+TARGETS = ('temperature', 'humidity', 'precipitation')
+
+# Параметры обучения по умолчанию
+DEFAULT_MODEL_CONFIG = models.ModelConfig()
+
+# Минимум дней для обучения модели
+MIN_TRAINING_ROWS = 5
+
+# Загруженные модели городов (с диска читаются только при смене версии)
+model_registry = registry.ModelRegistry(max_entries=MAX_RESIDENT_MODELS)
+
+# Обработчики, вызываемые после публикации новой версии модели города
+_model_listeners: List[Callable[[str], None]] = []
+
+def add_model_listener(callback: Callable[[str], None]) -> None:
+    """Регистрация обработчика обновления модели (получает название города)."""
+    if callback not in _model_listeners:
+        _model_listeners.append(callback)
+
+def notify_model_updated(city: str) -> None:
+    """
+    Оповещение об обновлении модели города.
+    
+    Вызывается из train_model, а для обучения в другом процессе - из
+    процесса API после завершения задачи.
+    """
+    for callback in list(_model_listeners):
+        try:
+            callback(city)
+        except Exception as e:
+            print(f"Ошибка обработчика обновления модели: {str(e)}")
+
+class ModelNotFoundError(Exception):
+    """Для города нет обученной модели."""
+
+def city_slug(city: str) -> str:
+    """Имя каталога с моделями города."""
+    return re.sub(r"[^\w-]+", "_", city.strip().casefold()) or "_"
+
+def model_path(city: str, version: int) -> str:
+    """Путь к файлу модели города указанной версии."""
+    return os.path.join(MODEL_DIR, city_slug(city), f"v{version}.joblib")
+
+def _dump_atomic(value: Any, path: str) -> None:
+    """Запись артефакта во временный файл с последующим переименованием."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(value, temp_path)
+    os.replace(temp_path, path)
+
+def _remove_old_versions(city: str, current_version: int) -> None:
+    """Удаление файлов версий старше MODEL_VERSIONS_TO_KEEP последних."""
+    city_dir = os.path.dirname(model_path(city, current_version))
+    for name in os.listdir(city_dir):
+        match = re.fullmatch(r"v(\d+)\.joblib", name)
+        if match and int(match.group(1)) <= current_version - MODEL_VERSIONS_TO_KEEP:
+            os.remove(os.path.join(city_dir, name))
+
+def load_model(city: str) -> Dict[str, Any]:
+    """
+    Загрузка текущей модели города через реестр.
+    
+    Returns:
+        Словарь с моделями целевых переменных, scaler и encoder
+    
+    Raises:
+        ModelNotFoundError: если модель для города ещё не обучена
+    """
+    record = database.get_model_record(city)
+    # Записи без версии остались от общей модели для всех городов
+    if record is None or not record['version']:
+        raise ModelNotFoundError(f"Модель для города {city} не обучена")
+    
+    try:
+        return model_registry.get(record['file_path'], version=record['version'])
+    except FileNotFoundError:
+        raise ModelNotFoundError(f"Файл модели для города {city} не найден: {record['file_path']}")
+
+# Данные города для обучения и прогноза: список WeatherData или массив database.get_weather_columns
+TrainingData = Union[List[models.WeatherData], np.ndarray]
+
+def _city(data: TrainingData) -> str:
+    return str(data['city'][0]) if isinstance(data, np.ndarray) else data[0].city
+
+def date_features(dates: np.ndarray) -> np.ndarray:
+    """Признаки даты (день года, день недели, месяц) для массива datetime64[D]."""
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(int) + 1
+    # 1970-01-01 - четверг, weekday() которого равен 3
+    day_of_week = (dates.astype(int) + 3) % 7
+    month = dates.astype('datetime64[M]').astype(int) % 12 + 1
+    return np.column_stack([day_of_year, day_of_week, month])
+
+def _prepare_columns(data: np.ndarray):
+    """Подготовка данных, прочитанных по столбцам, без перебора строк в Python."""
+    dates = data['date']
+    X = np.column_stack([
+        date_features(dates),
+        data['temperature'], data['humidity'], data['pressure'],
+        data['wind_speed'], data['precipitation']
+    ]).astype(float)
+    return X, data['weather_condition'], dates
+
+def _training_targets(data: TrainingData) -> np.ndarray:
+    """Значения целевых переменных, столбцы в порядке TARGETS."""
+    if isinstance(data, np.ndarray):
+        return np.column_stack([data[name] for name in TARGETS])
+    return np.array([[item.temperature, item.humidity, item.precipitation] for item in data])
+
+def _series(data: TrainingData) -> Tuple[np.ndarray, np.ndarray]:
+    """Даты и матрица значений features.VALUE_COLUMNS в исходном порядке строк."""
+    if isinstance(data, np.ndarray):
+        return data['date'], np.column_stack([data[name] for name in features.VALUE_COLUMNS])
+    dates = np.array([item.date for item in data], dtype='datetime64[D]')
+    values = np.array([[getattr(item, name) for name in features.VALUE_COLUMNS] for item in data], dtype=float)
+    return dates, values
+
+def prepare_autoregressive(data: TrainingData, lags: int = features.DEFAULT_LAGS):
+    """
+    Подготовка данных с лаговыми и скользящими признаками.
+    
+    Строка для дня t содержит признаки его даты и признаки по предыдущим
+    наблюдениям; первый день ряда (без истории) в обучение не попадает.
+    
+    Returns:
+        Матрица признаков, значения целевых переменных (столбцы в порядке TARGETS), даты
+    """
+    train_dates, lag_features, train_values = features.training_matrix(*_series(data), lags)
+    X = np.column_stack([date_features(train_dates), lag_features])
+    target_columns = [features.VALUE_COLUMNS.index(name) for name in TARGETS]
+    return X, train_values[:, target_columns], train_dates
+
+def prepare_data(data: TrainingData):
+    """
+    Подготовка данных для обучения модели.
+    
+    Принимает список WeatherData или структурированный массив из
+    database.get_weather_columns (тогда conditions и dates - массивы NumPy).
+    """
+    if isinstance(data, np.ndarray):
+        return _prepare_columns(data)
+    
     # Преобразуем данные в формат, подходящий для модели
     dates = []
     temps = []
@@ -47,56 +193,124 @@ def prepare_data(data: List[models.WeatherData]):
     
     return X, conditions, dates
 
-def train_model(data: List[models.WeatherData]) -> Dict[str, float]:
-    """Обучение модели прогнозирования погоды."""
-    if len(data) < 5:
-        raise ValueError("Недостаточно данных для обучения модели")
+def thread_budget(n_jobs: Optional[int]) -> int:
+    """Число потоков, которое означает n_jobs в смысле joblib (None - один, -1 - все ядра)."""
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+def _build_regressor(config: models.ModelConfig) -> RandomForestRegressor:
+    return RandomForestRegressor(
+        n_estimators=config.n_estimators,
+        random_state=config.random_state,
+        max_depth=config.max_depth,
+        min_samples_split=config.min_samples_split,
+        min_samples_leaf=config.min_samples_leaf,
+        n_jobs=config.n_jobs
+    )
+
+def fit_targets(X_scaled: np.ndarray, Y: np.ndarray, config: models.ModelConfig = DEFAULT_MODEL_CONFIG) -> Dict[str, Any]:
+    """
+    Обучение моделей целевых переменных на общей матрице признаков.
     
-    # Подготовка данных
-    X, conditions, dates = prepare_data(data)
+    Args:
+        X_scaled: Масштабированные признаки
+        Y: Значения целевых переменных, столбцы в порядке TARGETS
+        config: Параметры моделей и способ обучения
     
-    # Создаем признаки для прогнозирования
-    y_temp = np.array([item.temperature for item in data])
-    y_humidity = np.array([item.humidity for item in data])
-    y_precip = np.array([item.precipitation for item in data])
+    Returns:
+        Модель для каждой целевой переменной или одна модель под ключом 'multi_output'
+    """
+    if config.strategy == "multi_output":
+        # Одно дерево предсказывает все три величины: признаки перебираются один раз,
+        # но разбиения выбираются по суммарной ошибке, поэтому прогнозы отличаются
+        model = _build_regressor(config)
+        model.fit(X_scaled, Y)
+        return {'multi_output': model}
     
-    # Масштабирование признаков
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    if config.strategy == "parallel":
+        # Модели строятся одновременно, поэтому потоки n_jobs делятся между ними:
+        # иначе каждая из трёх моделей заняла бы все ядра
+        per_model = max(1, thread_budget(config.n_jobs) // len(TARGETS))
+        config = config.model_copy(update={"n_jobs": per_model})
     
-    # Кодирование категориальных признаков - исправление предупреждения
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-    encoded_conditions = encoder.fit_transform(np.array(conditions).reshape(-1, 1))
+    def fit(column: int) -> RandomForestRegressor:
+        return _build_regressor(config).fit(X_scaled, Y[:, column])
     
-    # Сохраняем scaler и encoder для последующего использования
-    joblib.dump(scaler, SCALER_PATH)
-    joblib.dump(encoder, ENCODER_PATH)
+    if config.strategy == "parallel":
+        # Построение деревьев в sklearn отпускает GIL, поэтому потоков достаточно
+        with ThreadPoolExecutor(max_workers=len(TARGETS)) as executor:
+            fitted = list(executor.map(fit, range(len(TARGETS))))
+    else:
+        fitted = [fit(column) for column in range(len(TARGETS))]
+    return dict(zip(TARGETS, fitted))
+
+def predict_targets(models_dict: Dict[str, Any], X_scaled: np.ndarray) -> np.ndarray:
+    """Прогноз целевых переменных: матрица со столбцами в порядке TARGETS."""
+    if 'multi_output' in models_dict:
+        return models_dict['multi_output'].predict(X_scaled)
+    return np.column_stack([models_dict[name].predict(X_scaled) for name in TARGETS])
+
+def _predict_row(model: Any, X: np.ndarray) -> np.ndarray:
+    """
+    Прогноз для одной строки признаков.
     
-    # Обучение моделей для разных целевых переменных
-    model_temp = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=None)
-    model_humidity = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=None)
-    model_precip = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=None)
+    Для случайного леса деревья опрашиваются напрямую: RandomForestRegressor.predict
+    на каждом вызове запускает joblib, и для одной строки это дороже самих деревьев.
+    """
+    if not isinstance(model, RandomForestRegressor):
+        return model.predict(X)
+    X = np.asarray(X, dtype=np.float32)
+    return np.mean([tree.predict(X, check_input=False) for tree in model.estimators_], axis=0)
+
+@metrics.timed(metrics.MODEL_FIT_DURATION.labels())
+def train_model(data: TrainingData, config: models.ModelConfig = DEFAULT_MODEL_CONFIG) -> Dict[str, float]:
+    """
+    Обучение модели прогнозирования погоды для города и сохранение её новой версии.
     
-    model_temp.fit(X_scaled, y_temp)
-    model_humidity.fit(X_scaled, y_humidity)
-    model_precip.fit(X_scaled, y_precip)
+    Args:
+        data: Список WeatherData или массив из database.get_weather_columns;
+            для модели с лагами - с историей на features.context_size(lags)
+            дней больше, чем дней обучения
+        config: Параметры моделей и способ обучения
+    """
+    if len(data) < MIN_TRAINING_ROWS:
+        raise ValueError("Недостаточно данных для обучения модели")
     
-    # Объединяем модели в один словарь и сохраняем
-    models_dict = {
-        'temperature': model_temp,
-        'humidity': model_humidity,
-        'precipitation': model_precip,
-        'conditions_encoder': encoder
-    }
+    encoder = None
+    if config.lags:
+        # Признаки по предыдущим дням вместо значений текущего дня
+        X, Y, dates = prepare_autoregressive(data, config.lags)
+        # Прогноз строится по последним features.context_size(lags) наблюдениям
+        # города, где скользящие окна заполнены; дни с неполными окнами остаются
+        # в обучении, только если без них данных не хватает
+        warmup = features.context_size(config.lags) - 1
+        if len(Y) - warmup >= MIN_TRAINING_ROWS:
+            X, Y, dates = X[warmup:], Y[warmup:], dates[warmup:]
+    else:
+        # Подготовка данных и значения целевых переменных
+        X, conditions, dates = prepare_data(data)
+        Y = _training_targets(data)
+        
+        # Кодирование категориальных признаков - исправление предупреждения
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+        encoder.fit(np.array(conditions).reshape(-1, 1))
+    y_temp, y_humidity, y_precip = Y[:, 0], Y[:, 1], Y[:, 2]
     
-    joblib.dump(models_dict, MODEL_PATH)
+    # Масштабирование признаков
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    # Обучение моделей для разных целевых переменных
+    target_models = fit_targets(X_scaled, Y, config)
     
     # Оценка качества модели
-    y_temp_pred = model_temp.predict(X_scaled)
-    y_humidity_pred = model_humidity.predict(X_scaled)
-    y_precip_pred = model_precip.predict(X_scaled)
+    predictions = predict_targets(target_models, X_scaled)
+    y_temp_pred, y_humidity_pred, y_precip_pred = predictions[:, 0], predictions[:, 1], predictions[:, 2]
     
-    metrics = {
+    model_metrics = {
         'temp_rmse': float(np.sqrt(mean_squared_error(y_temp, y_temp_pred))),
         'temp_mae': float(mean_absolute_error(y_temp, y_temp_pred)),
         'temp_r2': float(r2_score(y_temp, y_temp_pred)),  # Добавляем R²
@@ -108,77 +322,142 @@ def train_model(data: List[models.WeatherData]) -> Dict[str, float]:
         'precip_r2': float(r2_score(y_precip, y_precip_pred))  # Добавляем R²
     }
     
-    return metrics
+    # Объединяем модели и преобразователи в один файл новой версии модели города
+    city = _city(data)
+    record = database.get_model_record(city)
+    version = (record['version'] if record else 0) + 1
+    path = model_path(city, version)
+    
+    models_dict = {
+        **target_models,
+        # Кодировщик состояний погоды есть только у модели без лагов
+        'conditions_encoder': encoder,
+        'scaler': scaler,
+        'lags': config.lags,
+        'city': city,
+        'version': version
+    }
+    
+    _dump_atomic(models_dict, path)
+    database.save_model_metrics(city, model_metrics, path, version)
+    
+    # Новая версия сразу доступна прогнозам без чтения с диска
+    model_registry.publish({path: models_dict}, versions={path: version})
+    _remove_old_versions(city, version)
+    notify_model_updated(city)
+    
+    return model_metrics
 
-def make_forecast(data: List[models.WeatherData], days: int = 5) -> List[models.WeatherForecast]:
-    """Создание прогноза погоды на основе исторических данных."""
-    # Проверяем, существует ли модель
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH) or not os.path.exists(ENCODER_PATH):
-        # Если модели нет, обучаем новую
-        train_model(data)
+def forecast_features(last_item: Union[models.WeatherData, np.ndarray], last_date: datetime.date, days: int):
+    """
+    Матрица признаков для дней last_date + 1 ... last_date + days.
     
-    # Загружаем сохраненные модели и преобразователи
-    models_dict = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    encoder = joblib.load(ENCODER_PATH)
+    Args:
+        last_item: Последнее наблюдение - WeatherData или строка значений
+            features.VALUE_COLUMNS
     
-    model_temp = models_dict['temperature']
-    model_humidity = models_dict['humidity']
-    model_precip = models_dict['precipitation']
+    Returns:
+        Список дат прогноза и матрица признаков в порядке prepare_data
+    """
+    dates = np.datetime64(last_date, 'D') + np.arange(1, days + 1)
     
-    # Создаем прогноз на указанное количество дней
-    forecasts = []
-    city = data[0].city
-    last_date = max(item.date for item in data)
+    if isinstance(last_item, models.WeatherData):
+        last_item = [getattr(last_item, name) for name in features.VALUE_COLUMNS]
+    last_values = np.asarray(last_item, dtype=float)
+    X = np.column_stack([
+        date_features(dates),
+        np.broadcast_to(last_values, (days, last_values.size))
+    ]).astype(float)
+    return dates.tolist(), X
+
+def derive_conditions(temperature: np.ndarray, humidity: np.ndarray, precipitation: np.ndarray) -> np.ndarray:
+    """Состояние погоды по прогнозируемым значениям (правила проверяются по порядку)."""
+    return np.select(
+        [
+            (precipitation > 5) & (temperature > 15),
+            precipitation > 5,
+            precipitation > 1,
+            humidity > 80,
+            humidity > 60,
+        ],
+        ["Гроза", "Дождь", "Пасмурно", "Туман", "Облачно"],
+        default="Ясно"
+    )
+
+def _rollout_forecast(
+    models_dict: Dict[str, Any],
+    data: TrainingData,
+    days: int,
+    feature_store: Optional[features.FeatureStore]
+):
+    """Рекурсивный прогноз по лаговым признакам: каждый день опирается на предыдущие прогнозы."""
+    lags = models_dict['lags']
+    scaler = models_dict['scaler']
+    history = feature_store.get(models_dict['city'], lags) if feature_store is not None else None
+    if history is None or len(history.dates) == 0:
+        history = features.latest_history(*_series(data), lags)
     
-    for i in range(1, days + 1):
-        forecast_date = last_date + datetime.timedelta(days=i)
-        
-        # Создаем признаки для прогноза
-        day_of_year = forecast_date.timetuple().tm_yday
-        day_of_week = forecast_date.weekday()
-        month = forecast_date.month
-        
+    def predict(date: np.datetime64, lag_features: np.ndarray) -> np.ndarray:
+        X = scaler.transform(np.concatenate([date_features(np.array([date]))[0], lag_features]).reshape(1, -1))
+        if 'multi_output' in models_dict:
+            return _predict_row(models_dict['multi_output'], X)[0]
+        return np.array([_predict_row(models_dict[name], X)[0] for name in TARGETS])
+    
+    dates, predictions = features.rollout(history.dates[-1], history.values, days, predict, lags, TARGETS)
+    return dates.tolist(), predictions
+
+@metrics.timed(metrics.MODEL_PREDICT_DURATION.labels())
+def make_forecast(
+    data: TrainingData,
+    days: int = 5,
+    feature_store: Optional[features.FeatureStore] = None
+) -> List[models.WeatherForecast]:
+    """
+    Создание прогноза погоды на основе исторических данных.
+    
+    Args:
+        data: Последние наблюдения города (список WeatherData или массив
+            database.get_weather_columns, новые даты первыми)
+        days: Горизонт прогноза
+        feature_store: Хранилище последних наблюдений городов; если не
+            передано, история для модели с лагами берётся из data
+    
+    Raises:
+        ModelNotFoundError: если модель для города ещё не обучена
+    """
+    city = _city(data)
+    
+    # Загружаем модель города (из памяти, если версия не менялась);
+    # обучение выполняется только через train_model, не во время прогноза
+    models_dict = load_model(city)
+    scaler = models_dict['scaler']
+    
+    if models_dict.get('lags'):
+        forecast_dates, predictions = _rollout_forecast(models_dict, data, days, feature_store)
+    else:
+        # Модель без лагов: признаки всего горизонта строятся одной матрицей
+        dates, values = _series(data)
+        last_date = dates.max().item()
         # Используем последние известные значения для создания начальных признаков
-        last_item = data[0]  # Берем самую последнюю запись
-        
-        X = np.array([
-            day_of_year, day_of_week, month,
-            last_item.temperature, last_item.humidity, 
-            last_item.pressure, last_item.wind_speed,
-            last_item.precipitation
-        ]).reshape(1, -1)
+        last_item = values[0]  # Берем самую последнюю запись
+        forecast_dates, X = forecast_features(last_item, last_date, days)
         
-        # Масштабируем признаки
+        # Масштабируем признаки и прогнозируем все дни одним вызовом
         X_scaled = scaler.transform(X)
-        
-        # Прогнозируем значения
-        temp_pred = model_temp.predict(X_scaled)[0]
-        humidity_pred = model_humidity.predict(X_scaled)[0]
-        precip_pred = model_precip.predict(X_scaled)[0]
-        
-        # Определяем состояние погоды на основе прогнозируемых значений
-        if precip_pred > 5:
-            if temp_pred > 15:
-                condition = "Гроза"
-            else:
-                condition = "Дождь"
-        elif precip_pred > 1:
-            condition = "Пасмурно"
-        elif humidity_pred > 80:
-            condition = "Туман"
-        elif humidity_pred > 60:
-            condition = "Облачно"
-        else:
-            condition = "Ясно"
-        
-        forecasts.append(models.WeatherForecast(
+        predictions = predict_targets(models_dict, X_scaled)
+    
+    conditions = derive_conditions(predictions[:, 0], predictions[:, 1], predictions[:, 2])
+    predictions = np.round(predictions, 1)
+    
+    return [
+        models.WeatherForecast(
             city=city,
             date=forecast_date,
-            temperature=round(float(temp_pred), 1),
-            humidity=round(float(humidity_pred), 1),
-            precipitation=round(float(precip_pred), 1),
+            temperature=temp_pred,
+            humidity=humidity_pred,
+            precipitation=precip_pred,
             weather_condition=condition
-        ))
-    
-    return forecasts
\ No newline at end of file
+        )
+        for forecast_date, (temp_pred, humidity_pred, precip_pred), condition
+        in zip(forecast_dates, predictions.tolist(), conditions.tolist())
+    ]
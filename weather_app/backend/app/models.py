@@ -1,6 +1,48 @@
 from pydantic import BaseModel, validator
 from typing import List, Dict, Optional
 import datetime
+import functools
+
+# Допустимые погодные условия
+WEATHER_CONDITIONS = (
+    "Ясно", "Облачно", "Пасмурно", "Туман",
+    "Дождь", "Гроза", "Снег", "Неизвестно"
+)
+
+# Допустимые значения величин: поле -> (минимум, максимум, сообщение об ошибке)
+WEATHER_VALUE_RANGES = {
+    "temperature": (-100.0, 100.0, 'Температура должна быть в диапазоне от -100 до 100°C'),
+    "humidity": (0.0, 100.0, 'Влажность должна быть в диапазоне от 0 до 100%'),
+    "pressure": (800.0, 1200.0, 'Давление должно быть в диапазоне от 800 до 1200 гПа'),
+    "wind_speed": (0.0, float("inf"), 'Скорость ветра не может быть отрицательной'),
+    "precipitation": (0.0, float("inf"), 'Количество осадков не может быть отрицательным'),
+}
+
+# Условия в нижнем регистре для поиска подстроки (в порядке WEATHER_CONDITIONS)
+_LOWER_CONDITIONS = tuple((condition.lower(), condition) for condition in WEATHER_CONDITIONS)
+
+@functools.lru_cache(maxsize=1024)
+def normalize_weather_condition(value: str) -> str:
+    """
+    Приведение описания погоды к одному из WEATHER_CONDITIONS.
+    
+    Описание, содержащее допустимое условие, заменяется этим условием,
+    остальные - на "Неизвестно". Результат кэшируется по значению.
+    """
+    if value in WEATHER_CONDITIONS:
+        return value
+    lowered = value.lower()
+    for lower_condition, condition in _LOWER_CONDITIONS:
+        if lower_condition in lowered:
+            return condition
+    return "Неизвестно"
+
+def check_range(field: str, value: float) -> float:
+    """Проверка значения по WEATHER_VALUE_RANGES и округление до десятых."""
+    low, high, message = WEATHER_VALUE_RANGES[field]
+    if value < low or value > high:
+        raise ValueError(message)
+    return round(value, 1)
 
 class WeatherData(BaseModel):
     id: Optional[int] = None
@@ -17,47 +59,28 @@ class WeatherData(BaseModel):
     # Добавляем валидаторы для проверки данных
     @validator('temperature')
     def temperature_range(cls, v):
-        if v < -100 or v > 100:
-            raise ValueError('Температура должна быть в диапазоне от -100 до 100°C')
-        return round(v, 1)
+        return check_range('temperature', v)
     
     @validator('humidity')
     def humidity_range(cls, v):
-        if v < 0 or v > 100:
-            raise ValueError('Влажность должна быть в диапазоне от 0 до 100%')
-        return round(v, 1)
+        return check_range('humidity', v)
     
     @validator('pressure')
     def pressure_range(cls, v):
-        if v < 800 or v > 1200:
-            raise ValueError('Давление должно быть в диапазоне от 800 до 1200 гПа')
-        return round(v, 1)
+        return check_range('pressure', v)
     
     @validator('wind_speed')
     def wind_speed_positive(cls, v):
-        if v < 0:
-            raise ValueError('Скорость ветра не может быть отрицательной')
-        return round(v, 1)
+        return check_range('wind_speed', v)
     
     @validator('precipitation')
     def precipitation_positive(cls, v):
-        if v < 0:
-            raise ValueError('Количество осадков не может быть отрицательным')
-        return round(v, 1)
+        return check_range('precipitation', v)
     
     @validator('weather_condition')
     def weather_condition_valid(cls, v):
-        valid_conditions = [
-            "Ясно", "Облачно", "Пасмурно", "Туман", 
-            "Дождь", "Гроза", "Снег", "Неизвестно"
-        ]
-        if v not in valid_conditions:
-            # Нормализуем условие погоды, если оно не входит в список допустимых
-            for condition in valid_conditions:
-                if condition.lower() in v.lower():
-                    return condition
-            return "Неизвестно"
-        return v
+        # Нормализуем условие погоды, если оно не входит в список допустимых
+        return normalize_weather_condition(v)
 
 class WeatherForecast(BaseModel):
     city: str
@@ -70,37 +93,71 @@ class WeatherForecast(BaseModel):
     # Добавляем валидаторы и для прогноза
     @validator('temperature')
     def temperature_range(cls, v):
-        if v < -100 or v > 100:
-            raise ValueError('Температура должна быть в диапазоне от -100 до 100°C')
-        return round(v, 1)
+        return check_range('temperature', v)
     
     @validator('humidity')
     def humidity_range(cls, v):
-        if v < 0 or v > 100:
-            raise ValueError('Влажность должна быть в диапазоне от 0 до 100%')
-        return round(v, 1)
+        return check_range('humidity', v)
     
     @validator('precipitation')
     def precipitation_positive(cls, v):
-        if v < 0:
-            raise ValueError('Количество осадков не может быть отрицательным')
-        return round(v, 1)
+        return check_range('precipitation', v)
 
 class ScrapingResponse(BaseModel):
     success: bool
     city: str
     data_points: int
     weather_id: int
+    fetched: int = 0
+    skipped: int = 0
+    updated: int = 0
 
 class TrainingResponse(BaseModel):
     success: bool
     city: str
     metrics: Dict[str, float]
 
+class TrainingJobStatus(BaseModel):
+    id: str
+    city: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    duration: Optional[float] = None
+    metrics: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+# Способы обучения моделей целевых переменных
+TRAINING_STRATEGIES = ("sequential", "parallel", "multi_output")
+
 class ModelConfig(BaseModel):
     """Модель для настройки параметров модели прогнозирования"""
-    n_estimators: int = 50
+    n_estimators: int = 100
     random_state: int = 42
     max_depth: Optional[int] = None
     min_samples_split: int = 2
-    min_samples_leaf: int = 1
\ No newline at end of file
+    min_samples_leaf: int = 1
+    # Число потоков построения деревьев (-1 - все ядра, None - один поток).
+    # При strategy="parallel" это общее число потоков обучения: оно делится
+    # между тремя одновременно строящимися моделями. Процессы очереди обучения
+    # (jobs) делят ядра между собой так же
+    n_jobs: Optional[int] = -1
+    # sequential - модели по очереди, parallel - три модели одновременно,
+    # multi_output - одна модель для всех целевых переменных
+    strategy: str = "parallel"
+    # Число лаговых признаков (features.DEFAULT_LAGS); 0 - прежние признаки
+    # только по текущему дню, без лагов и скользящих статистик
+    lags: int = 7
+    
+    @validator('lags')
+    def lags_non_negative(cls, v):
+        if v < 0:
+            raise ValueError('Число лагов не может быть отрицательным')
+        return v
+    
+    @validator('strategy')
+    def strategy_known(cls, v):
+        if v not in TRAINING_STRATEGIES:
+            raise ValueError(f'Способ обучения должен быть одним из: {", ".join(TRAINING_STRATEGIES)}')
+        return v
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Профилирование отдельных запросов API по требованию.
+
+Запрос профилируется, если профилирование включено и в запросе есть
+заголовок X-Profile либо запрос попал в случайную выборку (sample_rate).
+Для профилируемого запроса собираются:
+
+- cProfile в потоке цикла событий и в потоках пулов executors, выполняющих
+  работу этого запроса (профиль передаётся в пулы через current_profile);
+- статистическая выборка стеков этих потоков (collapsed stacks для flamegraph).
+
+Одновременно профилируется не больше одного запроса: cProfile цикла событий
+видит и работу других запросов, поэтому профиль лучше снимать в спокойный
+момент. Последние PROFILING_KEEP профилей хранятся в памяти и выдаются
+в форматах .pstats и collapsed stacks. Когда профилирование выключено,
+middleware проверяет один флаг, а пулы - одну контекстную переменную.
+"""
+import contextvars
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Профилирование включено при запуске
+PROFILING_ENABLED = os.environ.get("WEATHER_PROFILING", "0") == "1"
+
+# Доля запросов, профилируемых без заголовка (0 - только по заголовку)
+PROFILING_SAMPLE_RATE = float(os.environ.get("WEATHER_PROFILING_SAMPLE_RATE", "0"))
+
+# Сколько последних профилей хранить
+PROFILING_KEEP = int(os.environ.get("WEATHER_PROFILING_KEEP", "20"))
+
+# Интервал выборки стеков, секунды
+PROFILING_INTERVAL = float(os.environ.get("WEATHER_PROFILING_INTERVAL", "0.005"))
+
+# Заголовок запроса, включающий профилирование, и заголовок ответа с идентификатором профиля
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+_PROFILE_HEADER_BYTES = PROFILE_HEADER.encode("latin-1")
+
+# Профиль текущего запроса (None - запрос не профилируется)
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    label = f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+    # Пробел отделяет стек от счётчика, точка с запятой - кадры
+    return label.replace(" ", "_").replace(";", "_")
+
+class RequestProfile:
+    """Профиль одного запроса: cProfile по потокам и выборка стеков."""
+
+    def __init__(self, method: str, path: str, interval: float = PROFILING_INTERVAL):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        # Потоки, выполняющие работу запроса: идентификатор -> имя
+        self._threads: Dict[int, str] = {}
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name="weather-profiler", daemon=True)
+        self._loop_profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        """Начало профилирования в текущем потоке (потоке цикла событий)."""
+        self._attach()
+        self._loop_profile = cProfile.Profile()
+        self._loop_profile.enable()
+        self._sampler.start()
+
+    def finish(self, status: Optional[int]) -> None:
+        """Завершение профилирования (в том же потоке, что и start)."""
+        if self._loop_profile is not None:
+            self._loop_profile.disable()
+            with self._lock:
+                self._profiles.append(self._loop_profile)
+        self._detach()
+        self._stopped.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+        self.status = status
+
+    def call(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Выполнение работы запроса в потоке пула под отдельным cProfile."""
+        profile = cProfile.Profile()
+        self._attach()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._detach()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def _attach(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] = threading.current_thread().name
+
+    def _detach(self) -> None:
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+
+    def _sample_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                threads = dict(self._threads)
+            frames = sys._current_frames()
+            for ident, name in threads.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(name)
+                    with self._lock:
+                        self._stacks[";".join(reversed(stack))] += 1
+                        self._samples += 1
+
+    def collapsed(self) -> str:
+        """Выборка стеков в формате collapsed stacks (вход flamegraph.pl, speedscope)."""
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> pstats.Stats:
+        """Объединённая статистика cProfile всех потоков запроса."""
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def pstats_bytes(self) -> bytes:
+        """Статистика в формате файла .pstats (как pstats.Stats.dump_stats)."""
+        return marshal.dumps(self.stats().stats)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            threads, samples = len(self._profiles), self._samples
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "threads": threads,
+            "samples": samples,
+        }
+
+class Profiler:
+    """Настройки профилирования и хранилище последних профилей."""
+
+    def __init__(
+        self,
+        enabled: bool = PROFILING_ENABLED,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        keep: int = PROFILING_KEEP,
+        interval: float = PROFILING_INTERVAL,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.interval = interval
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._active: Optional[RequestProfile] = None
+        self._lock = threading.Lock()
+        self._stats = {"captured": 0, "skipped_busy": 0}
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None) -> None:
+        """Изменение настроек во время работы."""
+        if sample_rate is not None and not 0 <= sample_rate <= 1:
+            raise ValueError("Доля запросов должна быть от 0 до 1")
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def wants(self, headers: List[Any]) -> bool:
+        """Нужно ли профилировать запрос (по заголовку или случайной выборке)."""
+        if any(name == _PROFILE_HEADER_BYTES and value not in (b"", b"0") for name, value in headers):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, method: str, path: str) -> Optional[RequestProfile]:
+        """Начало профиля запроса или None, если уже профилируется другой запрос."""
+        with self._lock:
+            if self._active is not None:
+                self._stats["skipped_busy"] += 1
+                return None
+            profile = self._active = RequestProfile(method, path, self.interval)
+        profile.start()
+        return profile
+
+    def finish(self, profile: RequestProfile, status: Optional[int]) -> None:
+        """Завершение профиля и сохранение его среди последних keep профилей."""
+        profile.finish(status)
+        with self._lock:
+            self._active = None
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+            self._stats["captured"] += 1
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Сводки сохранённых профилей, новые первыми."""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [profile.summary() for profile in reversed(profiles)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+    def settings(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "keep": self.keep,
+                "interval": self.interval,
+                "stored": len(self._profiles),
+                **self._stats,
+            }
+
+profiler = Profiler()
@@ -0,0 +1,172 @@
+"""
+Реестр артефактов модели в памяти процесса.
+
+Каждый файл загружается через joblib один раз и хранится в памяти. Запись
+считается устаревшей, если изменились время модификации или размер файла,
+либо (если передан) номер версии. После обучения новые объекты публикуются
+в реестр сразу, без повторного чтения с диска. Если задан max_entries,
+давно не использованные артефакты вытесняются из памяти (LRU).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import joblib
+
+_MISSING = object()
+
+class _Entry:
+    __slots__ = ("value", "stamp", "loaded_at", "load_time", "hits")
+
+    def __init__(self, value: Any, stamp: Hashable, load_time: float):
+        self.value = value
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        self.load_time = load_time
+        self.hits = 0
+
+class _PathLock:
+    """Блокировка загрузки одного файла и число потоков, которые её держат или ждут."""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+def file_stamp(path: str) -> Hashable:
+    """Отметка состояния файла: время модификации и размер."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ModelRegistry:
+    """Потокобезопасный кэш загруженных артефактов модели."""
+
+    def __init__(self, loader: Optional[Callable[[str], Any]] = None, max_entries: Optional[int] = None):
+        self._loader = loader
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Блокировки идущих загрузок: запись удаляется, когда её отпускает последний поток
+        self._loading: Dict[str, _PathLock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+        self._load_time = 0.0
+
+    def _store(self, path: str, entry: _Entry) -> None:
+        """Сохранение записи с вытеснением давно не использованных (вызывается под блокировкой)."""
+        self._entries[path] = entry
+        self._entries.move_to_end(path)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _load(self, path: str) -> Any:
+        loader = self._loader or joblib.load
+        return loader(path)
+
+    def get(self, path: str, version: Optional[Hashable] = None) -> Any:
+        """
+        Артефакт из памяти или с диска, если запись устарела.
+
+        Args:
+            path: Путь к файлу артефакта
+            version: Номер версии; если передан, файл не проверяется через stat
+
+        Raises:
+            FileNotFoundError: если файла нет
+        """
+        stamp = ("version", version) if version is not None else file_stamp(path)
+
+        with self._lock:
+            cached = self._cached(path, stamp)
+            if cached is not _MISSING:
+                return cached
+            path_lock = self._loading.get(path)
+            if path_lock is None:
+                path_lock = self._loading[path] = _PathLock()
+            path_lock.users += 1
+
+        # Загрузка идёт вне общей блокировки: чтение одной модели не задерживает
+        # обращения к остальным, а повторная загрузка того же файла исключена
+        try:
+            with path_lock.lock:
+                with self._lock:
+                    cached = self._cached(path, stamp)
+                    if cached is not _MISSING:
+                        return cached
+
+                started = time.perf_counter()
+                value = self._load(path)
+                load_time = time.perf_counter() - started
+
+                with self._lock:
+                    self._store(path, _Entry(value, stamp, load_time))
+                    self._loads += 1
+                    self._load_time += load_time
+                return value
+        finally:
+            with self._lock:
+                path_lock.users -= 1
+                if not path_lock.users:
+                    del self._loading[path]
+
+    def _cached(self, path: str, stamp: Hashable) -> Any:
+        """Актуальное значение из памяти или _MISSING (вызывается под блокировкой)."""
+        entry = self._entries.get(path)
+        if entry is None or entry.stamp != stamp:
+            return _MISSING
+        entry.hits += 1
+        self._hits += 1
+        self._entries.move_to_end(path)
+        return entry.value
+
+    def publish(self, artifacts: Dict[str, Any], versions: Optional[Dict[str, Hashable]] = None) -> None:
+        """
+        Атомарная замена набора артефактов в памяти (файлы уже должны быть записаны).
+
+        Args:
+            artifacts: Путь к файлу -> загруженный объект
+            versions: Путь -> номер версии (для артефактов, проверяемых по версии)
+        """
+        versions = versions or {}
+        entries = {}
+        for path, value in artifacts.items():
+            stamp = ("version", versions[path]) if path in versions else file_stamp(path)
+            entries[path] = _Entry(value, stamp, 0.0)
+
+        with self._lock:
+            for path, entry in entries.items():
+                self._store(path, entry)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Удаление записи (или всех записей) из памяти."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики обращений и время загрузки по каждому артефакту."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "resident": len(self._entries),
+                "loading": len(self._loading),
+                "max_entries": self.max_entries,
+                "load_time_total": round(self._load_time, 6),
+                "artifacts": {
+                    path: {
+                        "hits": entry.hits,
+                        "load_time": round(entry.load_time, 6),
+                        "loaded_at": entry.loaded_at,
+                    }
+                    for path, entry in self._entries.items()
+                },
+            }
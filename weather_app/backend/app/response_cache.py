@@ -0,0 +1,167 @@
+"""
+Кэш ответов API в памяти процесса.
+
+Ответы GET /weather, /forecast и /cities хранятся уже сериализованными вместе
+с ETag. Записи вытесняются по LRU и устаревают через RESPONSE_CACHE_TTL секунд,
+а при записи данных о погоде или обучении модели города удаляются сразу.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from . import database, ml_model
+
+# Максимум ответов в кэше
+RESPONSE_CACHE_SIZE = int(os.environ.get("WEATHER_RESPONSE_CACHE_SIZE", "512"))
+
+# Время жизни ответа, секунды
+RESPONSE_CACHE_TTL = float(os.environ.get("WEATHER_RESPONSE_CACHE_TTL", "300"))
+
+class CachedResponse:
+    """Сериализованный ответ и его ETag."""
+
+    __slots__ = ("body", "etag", "city", "expires_at", "headers")
+
+    def __init__(
+        self,
+        body: bytes,
+        city: Optional[str],
+        expires_at: float,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.city = city
+        self.expires_at = expires_at
+        # Дополнительные заголовки ответа (например, курсор следующей страницы)
+        self.headers = headers or {}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match (слабые ETag сравниваются как сильные)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+class ResponseCache:
+    """LRU-кэш ответов со сроком жизни и сбросом по городу."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        # Поколения данных: ответ, вычисленный до сброса, в кэш не попадает
+        self._generations: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "not_modified": 0,
+            "invalidations": 0, "evictions": 0, "expirations": 0,
+        }
+
+    def generation(self, city: Optional[str]) -> Tuple[int, int]:
+        """Текущее поколение данных города и общих ответов."""
+        with self._lock:
+            return self._generations.get(None, 0), self._generations.get(city, 0)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """Действующий ответ или None (промах учитывается в статистике)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(
+        self,
+        key: Hashable,
+        body: bytes,
+        city: Optional[str],
+        generation: Optional[Tuple[int, int]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> CachedResponse:
+        """
+        Сохранение ответа.
+
+        Если после вычисления ответа данные города успели измениться
+        (generation устарело), ответ возвращается, но не кэшируется.
+        """
+        entry = CachedResponse(body, city, time.monotonic() + self.ttl, headers)
+        with self._lock:
+            current = (self._generations.get(None, 0), self._generations.get(city, 0))
+            if generation is not None and generation != current:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def invalidate_city(self, city: str, include_global: bool = True) -> int:
+        """
+        Сброс ответов города и (если include_global) ответов по всем городам.
+
+        Returns:
+            Число удалённых записей
+        """
+        with self._lock:
+            self._generations[city] = self._generations.get(city, 0) + 1
+            if include_global:
+                self._generations[None] = self._generations.get(None, 0) + 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry.city == city or (include_global and entry.city is None)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+            return len(stale)
+
+    def clear(self) -> None:
+        """Очистка кэша и статистики."""
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий, промахов и сбросов."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+response_cache = ResponseCache()
+
+def _on_weather_write(cities: Set[str]) -> None:
+    for city in cities:
+        response_cache.invalidate_city(city)
+
+def _on_model_update(city: str) -> None:
+    # Новая модель меняет только прогнозы города, списки городов и данные не меняются
+    response_cache.invalidate_city(city, include_global=False)
+
+database.add_write_listener(_on_weather_write)
+ml_model.add_model_listener(_on_model_update)
@@ -1,12 +1,121 @@
-import requests
+import asyncio
 import datetime
-import time
+import os
 import random
-from typing import List, Dict, Any, Optional
-from backend.app import models
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from backend.app import models, fetcher, geocoding, http_client, database, validation, metrics
 
 # API ключ для OpenWeatherMap (нужно будет заменить на ваш собственный)
-OPENWEATHER_API_KEY = "ваш_api_ключ"  # Замените на свой ключ
+API_KEY_PLACEHOLDER = "ваш_api_ключ"
+OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", API_KEY_PLACEHOLDER)  # Замените на свой ключ
+
+# Базовый адрес OpenWeatherMap API (для нагрузочных тестов - адрес локальной замены,
+# см. benchmarks/fake_openweather.py)
+OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+
+def _api_urls(base_url: str) -> Tuple[str, str]:
+    """Адреса геокодирования и текущей погоды для базового адреса API."""
+    base_url = base_url.rstrip("/")
+    return f"{base_url}/geo/1.0/direct", f"{base_url}/data/2.5/weather"
+
+# Адреса OpenWeatherMap API
+GEO_URL, WEATHER_URL = _api_urls(OPENWEATHER_BASE_URL)
+
+# Количество одновременных запросов при сборе данных за период
+SCRAPE_CONCURRENCY = 8
+
+# Кэш координат городов (память процесса + таблица geocode_cache)
+geocode_cache = geocoding.GeocodeCache()
+
+@metrics.upstream_timed("geo")
+def fetch_coordinates(city: str) -> Optional[geocoding.Coordinates]:
+    """
+    Запрос координат города через /geo/1.0/direct.
+    
+    Returns:
+        Пара (широта, долгота) или None, если город не найден
+    """
+    geo_response = http_client.get_http_client().get(GEO_URL, params={
+        "q": city,
+        "limit": 1,
+        "appid": OPENWEATHER_API_KEY
+    })
+    geo_response.raise_for_status()
+    
+    locations = geo_response.json()
+    if not locations:
+        return None
+    return locations[0]["lat"], locations[0]["lon"]
+
+@metrics.upstream_timed("geo")
+async def fetch_coordinates_async(client: fetcher.AsyncFetcher, city: str) -> Optional[geocoding.Coordinates]:
+    """Асинхронный вариант fetch_coordinates."""
+    locations = await client.get_json(GEO_URL, {
+        "q": city,
+        "limit": 1,
+        "appid": OPENWEATHER_API_KEY
+    })
+    if not locations:
+        return None
+    return locations[0]["lat"], locations[0]["lon"]
+
+@metrics.upstream_timed("weather")
+def fetch_current_weather(coords: geocoding.Coordinates) -> Dict[str, Any]:
+    """Запрос текущей погоды по координатам через /data/2.5/weather."""
+    weather_response = http_client.get_http_client().get(WEATHER_URL, params={
+        "lat": coords[0],
+        "lon": coords[1],
+        "units": "metric",  # Для получения температуры в Цельсиях
+        "appid": OPENWEATHER_API_KEY
+    })
+    weather_response.raise_for_status()
+    return weather_response.json()
+
+@metrics.upstream_timed("weather")
+async def fetch_current_weather_async(client: fetcher.AsyncFetcher, coords: geocoding.Coordinates) -> Dict[str, Any]:
+    """Асинхронный вариант fetch_current_weather."""
+    return await client.get_json(WEATHER_URL, {
+        "lat": coords[0],
+        "lon": coords[1],
+        "units": "metric",
+        "appid": OPENWEATHER_API_KEY
+    })
+
+def warm_up_geocode_cache(cities: List[str], concurrency: int = SCRAPE_CONCURRENCY) -> Dict[str, int]:
+    """
+    Предварительное заполнение кэша координат для списка городов.
+    
+    Города, уже сохранённые в БД, загружаются в память одним запросом,
+    остальные запрашиваются у API параллельно (только если задан ключ API).
+    
+    Returns:
+        Количество городов: запрошено, уже в кэше, получено из API, не удалось получить
+    """
+    missing = geocode_cache.missing(cities)
+    requested = len({geocoding.normalize_city(city) for city in cities})
+    fetched = 0
+    
+    if missing and is_api_configured():
+        async def fetch_all():
+            async with fetcher.AsyncFetcher(concurrency=concurrency) as client:
+                return await asyncio.gather(
+                    *(fetch_coordinates_async(client, city) for city in missing),
+                    return_exceptions=True
+                )
+        
+        for city, coords in zip(missing, fetcher.run_sync(fetch_all())):
+            if isinstance(coords, Exception):
+                print(f"Не удалось получить координаты города {city}: {str(coords)}")
+                continue
+            geocode_cache.store(city, coords)
+            fetched += 1
+    
+    return {
+        "requested": requested,
+        "cached": requested - len(missing),
+        "fetched": fetched,
+        "failed": len(missing) - fetched
+    }
 
 def get_weather_from_api(city: str, date: Optional[datetime.date] = None) -> Optional[Dict[str, Any]]:
     """
@@ -24,51 +133,18 @@ def get_weather_from_api(city: str, date: Optional[datetime.date] = None) -> Opt
         if not date:
             date = datetime.date.today()
         
-        # Первым шагом получаем координаты города
-        geo_url = "http://api.openweathermap.org/geo/1.0/direct"
-        geo_params = {
-            "q": city,
-            "limit": 1,
-            "appid": OPENWEATHER_API_KEY
-        }
-        
-        geo_response = requests.get(geo_url, params=geo_params)
-        geo_response.raise_for_status()
-        
-        locations = geo_response.json()
-        if not locations:
+        # Первым шагом получаем координаты города (из кэша или через API)
+        coords = geocode_cache.resolve(city, fetch_coordinates)
+        if coords is None:
             print(f"Город {city} не найден в API")
             return None
-            
-        # Получаем координаты
-        lat = locations[0]["lat"]
-        lon = locations[0]["lon"]
         
         # Запрашиваем текущую погоду, если дата - сегодня
         if date == datetime.date.today():
-            weather_url = "https://api.openweathermap.org/data/2.5/weather"
-            weather_params = {
-                "lat": lat,
-                "lon": lon,
-                "units": "metric",  # Для получения температуры в Цельсиях
-                "appid": OPENWEATHER_API_KEY
-            }
-            
-            weather_response = requests.get(weather_url, params=weather_params)
-            weather_response.raise_for_status()
-            weather_data = weather_response.json()
+            weather_data = fetch_current_weather(coords)
             
             # Формируем данные в нужном формате
-            result = {
-                "temperature": weather_data["main"]["temp"],
-                "humidity": weather_data["main"]["humidity"],
-                "pressure": weather_data["main"]["pressure"],
-                "wind_speed": weather_data["wind"]["speed"],
-                "precipitation": weather_data.get("rain", {}).get("1h", 0) if "rain" in weather_data else 0,
-                "weather_condition": get_weather_condition(weather_data["weather"][0]["id"])
-            }
-            
-            return result
+            return parse_current_weather(weather_data)
             
         else:
             # Для получения исторических данных используем OpenWeatherMap History API
@@ -190,71 +266,243 @@ def generate_weather_data(city: str, date: datetime.date) -> Dict[str, Any]:
         "weather_condition": condition
     }
 
-def scrape_weather_data(
+def configure_api(base_url: Optional[str] = None, api_key: Optional[str] = None) -> None:
+    """
+    Смена адреса и ключа OpenWeatherMap API во время работы.
+    
+    Args:
+        base_url: Базовый адрес API (например, адрес локальной замены)
+        api_key: Ключ API
+    """
+    global OPENWEATHER_BASE_URL, OPENWEATHER_API_KEY, GEO_URL, WEATHER_URL
+    if base_url is not None:
+        OPENWEATHER_BASE_URL = base_url
+        GEO_URL, WEATHER_URL = _api_urls(base_url)
+    if api_key is not None:
+        OPENWEATHER_API_KEY = api_key
+
+def is_api_configured() -> bool:
+    """Проверка, задан ли ключ OpenWeatherMap API."""
+    return bool(OPENWEATHER_API_KEY) and OPENWEATHER_API_KEY != API_KEY_PLACEHOLDER
+
+def parse_current_weather(weather_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Преобразование ответа /data/2.5/weather в формат приложения."""
+    return {
+        "temperature": weather_data["main"]["temp"],
+        "humidity": weather_data["main"]["humidity"],
+        "pressure": weather_data["main"]["pressure"],
+        "wind_speed": weather_data["wind"]["speed"],
+        "precipitation": weather_data.get("rain", {}).get("1h", 0) if "rain" in weather_data else 0,
+        "weather_condition": get_weather_condition(weather_data["weather"][0]["id"])
+    }
+
+async def fetch_weather_async(
+    client: fetcher.AsyncFetcher,
+    city: str,
+    date: datetime.date
+) -> Optional[Dict[str, Any]]:
+    """
+    Асинхронный аналог get_weather_from_api.
+    
+    Текущая погода запрашивается через OpenWeatherMap API (если задан ключ),
+    исторические данные генерируются, как и в get_weather_from_api.
+    
+    Returns:
+        Словарь с данными о погоде или None в случае ошибки
+    """
+    if date != datetime.date.today() or not is_api_configured():
+        return generate_weather_data(city, date)
+    
+    try:
+        coords = await geocode_cache.resolve_async(
+            city, lambda name: fetch_coordinates_async(client, name)
+        )
+        if coords is None:
+            print(f"Город {city} не найден в API")
+            return None
+        
+        weather_data = await fetch_current_weather_async(client, coords)
+        return parse_current_weather(weather_data)
+    except (fetcher.FetchError, KeyError, IndexError, TypeError) as e:
+        print(f"Ошибка при получении данных о погоде через API: {str(e)}")
+        return None
+
+def resolve_period(
+    start_date: Optional[datetime.date],
+    end_date: Optional[datetime.date]
+) -> Tuple[datetime.date, datetime.date]:
+    """Значения дат по умолчанию и проверка корректности периода."""
+    if not end_date:
+        end_date = datetime.date.today()
+    if not start_date:
+        start_date = end_date - datetime.timedelta(days=9)  # По умолчанию 10 дней
+    
+    if start_date > end_date:
+        raise ValueError("Начальная дата не может быть позже конечной")
+    
+    return start_date, end_date
+
+class ScrapePlan(NamedTuple):
+    """Диапазоны дат для сбора и число дней периода, данные за которые уже есть."""
+    ranges: List[Tuple[datetime.date, datetime.date]]
+    skipped: int
+
+def plan_incremental_scrape(
+    city: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    refresh_days: int = 0
+) -> ScrapePlan:
+    """
+    Диапазоны дат периода, которые нужно собрать в инкрементном режиме.
+    
+    Собираются только даты без данных в БД, а также (если refresh_days > 0)
+    последние refresh_days дней периода, даже если данные за них уже есть.
+    
+    Returns:
+        Непересекающиеся диапазоны (начало, конец включительно) по возрастанию
+        и число пропущенных дней периода: покрытых данными и не попавших
+        в диапазоны. Дни, которые не удалось собрать, к пропущенным не относятся.
+    """
+    ranges = database.get_missing_ranges(city, start_date, end_date)
+    if refresh_days > 0:
+        refresh_start = max(start_date, end_date - datetime.timedelta(days=refresh_days - 1))
+        ranges = [
+            (start, min(end, refresh_start - datetime.timedelta(days=1)))
+            for start, end in ranges if start < refresh_start
+        ]
+        ranges.append((refresh_start, end_date))
+    
+    planned = sum((end - start).days + 1 for start, end in ranges)
+    return ScrapePlan(ranges, (end_date - start_date).days + 1 - planned)
+
+async def scrape_weather_records_async(
+    city: str,
+    ranges: List[Tuple[datetime.date, datetime.date]],
+    concurrency: int = SCRAPE_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Асинхронный сбор данных о погоде за несколько диапазонов дат.
+    
+    Даты всех диапазонов обрабатываются параллельно через AsyncFetcher: число
+    одновременных запросов ограничено concurrency, темп запросов к API -
+    ограничителем движка.
+    
+    Args:
+        city: Название города
+        ranges: Диапазоны дат (начало, конец включительно)
+        concurrency: Максимальное число одновременных запросов
+    
+    Returns:
+        Проверенные записи с полями WeatherData (без создания объектов),
+        пригодные для database.upsert_weather_data
+    """
+    dates = [
+        start + datetime.timedelta(days=offset)
+        for start, end in ranges
+        for offset in range((end - start).days + 1)
+    ]
+    if not dates:
+        return []
+    
+    async with fetcher.AsyncFetcher(concurrency=concurrency) as client:
+        results = await asyncio.gather(*(fetch_weather_async(client, city, date) for date in dates))
+    
+    rows = []
+    for date, data in zip(dates, results):
+        # Если API недоступно, используем сгенерированные данные, как для исторических дат
+        if data is None:
+            data = generate_weather_data(city, date)
+        rows.append({**data, "city": city, "date": date})
+    
+    # Строки с некорректными значениями пропускаются, остальные сохраняются
+    batch = validation.validate_weather_batch(rows)
+    for error in batch.errors:
+        print(f"Некорректные данные о погоде для города {city} за {dates[error['index']]}: {error['errors']}")
+    return batch.records
+
+async def scrape_weather_ranges_async(
+    city: str,
+    ranges: List[Tuple[datetime.date, datetime.date]],
+    concurrency: int = SCRAPE_CONCURRENCY
+) -> List[models.WeatherData]:
+    """Сбор данных о погоде за несколько диапазонов дат в виде объектов WeatherData."""
+    return validation.to_models(await scrape_weather_records_async(city, ranges, concurrency))
+
+async def scrape_weather_data_async(
     city: str,
     start_date: Optional[datetime.date] = None,
     end_date: Optional[datetime.date] = None,
-    disable_limit: bool = True  # По умолчанию лимит отключен
+    disable_limit: bool = True,
+    concurrency: int = SCRAPE_CONCURRENCY
 ) -> List[models.WeatherData]:
     """
-    Получение данных о погоде для указанного города и периода.
+    Асинхронный сбор данных о погоде для указанного города и периода.
     
     Args:
         city: Название города
         start_date: Начальная дата периода (включительно)
         end_date: Конечная дата периода (включительно)
         disable_limit: Отключить ограничение на количество дней
+        concurrency: Максимальное число одновременных запросов
     
     Returns:
         Список объектов WeatherData с данными о погоде
     """
-    # Установка значений по умолчанию
-    if not end_date:
-        end_date = datetime.date.today()
-    if not start_date:
-        start_date = end_date - datetime.timedelta(days=9)  # По умолчанию 10 дней
-    
-    # Проверка корректности дат
-    if start_date > end_date:
-        raise ValueError("Начальная дата не может быть позже конечной")
-    
-    # Убираем проверку на максимальное количество дней
+    start_date, end_date = resolve_period(start_date, end_date)
     days_diff = (end_date - start_date).days + 1  # +1 чтобы включить конечную дату
     
     print(f"Сбор данных о погоде для города {city} за период с {start_date} по {end_date} ({days_diff} дней)")
     
-    # Собираем данные за указанный период
-    weather_data_list = []
-    
-    current_date = start_date
-    while current_date <= end_date:
-        # Генерируем данные для текущей даты
-        data = generate_weather_data(city, current_date)
-        
-        # Создаем объект WeatherData
-        weather_data = models.WeatherData(
-            city=city,
-            date=current_date,
-            temperature=data["temperature"],
-            humidity=data["humidity"],
-            pressure=data["pressure"],
-            wind_speed=data["wind_speed"],
-            precipitation=data["precipitation"],
-            weather_condition=data["weather_condition"]
-        )
-        
-        weather_data_list.append(weather_data)
-        
-        # Переходим к следующей дате
-        current_date += datetime.timedelta(days=1)
-        
-        # Небольшая задержка, чтобы не перегружать систему
-        # при очень больших периодах
-        if days_diff > 100 and (current_date - start_date).days % 50 == 0:
-            print(f"Обработано {(current_date - start_date).days} дней из {days_diff}...")
-            time.sleep(0.5)  # Пауза каждые 50 дней
-        else:
-            time.sleep(0.05)  # Небольшая пауза для остальных дней
+    weather_data_list = await scrape_weather_ranges_async(city, [(start_date, end_date)], concurrency)
     
     print(f"Завершен сбор данных о погоде для города {city}. Получено {len(weather_data_list)} записей.")
-    return weather_data_list
\ No newline at end of file
+    return weather_data_list
+
+def scrape_weather_data(
+    city: str,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    disable_limit: bool = True  # По умолчанию лимит отключен
+) -> List[models.WeatherData]:
+    """
+    Получение данных о погоде для указанного города и периода.
+    
+    Синхронная обёртка над scrape_weather_data_async.
+    
+    Args:
+        city: Название города
+        start_date: Начальная дата периода (включительно)
+        end_date: Конечная дата периода (включительно)
+        disable_limit: Отключить ограничение на количество дней
+    
+    Returns:
+        Список объектов WeatherData с данными о погоде
+    """
+    # Проверяем даты сразу, не запуская цикл событий
+    start_date, end_date = resolve_period(start_date, end_date)
+    return fetcher.run_sync(scrape_weather_data_async(city, start_date, end_date, disable_limit))
+
+def scrape_weather_ranges(
+    city: str,
+    ranges: List[Tuple[datetime.date, datetime.date]],
+    concurrency: int = SCRAPE_CONCURRENCY
+) -> List[models.WeatherData]:
+    """
+    Сбор данных о погоде за несколько диапазонов дат.
+    
+    Синхронная обёртка над scrape_weather_ranges_async.
+    """
+    return fetcher.run_sync(scrape_weather_ranges_async(city, ranges, concurrency))
+
+def scrape_weather_records(
+    city: str,
+    ranges: List[Tuple[datetime.date, datetime.date]],
+    concurrency: int = SCRAPE_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Сбор проверенных записей о погоде за несколько диапазонов дат.
+    
+    Синхронная обёртка над scrape_weather_records_async.
+    """
+    return fetcher.run_sync(scrape_weather_records_async(city, ranges, concurrency))
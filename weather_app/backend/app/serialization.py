@@ -0,0 +1,128 @@
+"""
+Кодирование ответов API: JSON (orjson), MessagePack и Apache Arrow IPC.
+
+Формат выбирается по заголовку Accept. JSON кодируется через orjson без
+обхода каждого поля jsonable_encoder; модели Pydantic преобразуются в словари
+через model_dump. Arrow IPC (поток) позволяет клиентам на pandas загружать
+таблицу по столбцам без разбора JSON; формат доступен, если установлен pyarrow.
+"""
+import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import msgpack
+import orjson
+from pydantic import BaseModel
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow не установлен или несовместим с установленным NumPy
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Синонимы типов содержимого, встречающиеся у клиентов
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+class NotAcceptableError(ValueError):
+    """Ни один из форматов, допустимых клиентом, не поддерживается."""
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Тип {type(obj).__name__} не поддерживается")
+
+def encode_json(content: Any) -> bytes:
+    """JSON в UTF-8 без пробелов (даты - в ISO 8601, как у JSONResponse)."""
+    return orjson.dumps(content, default=_default)
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Тип {type(obj).__name__} не поддерживается")
+
+def encode_msgpack(content: Any) -> bytes:
+    """MessagePack с теми же ключами и значениями, что и в JSON (даты - строки ISO)."""
+    return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+
+def _records(content: Sequence[Any]) -> List[Dict[str, Any]]:
+    return [item.model_dump() if isinstance(item, BaseModel) else item for item in content]
+
+def encode_arrow(content: Any) -> bytes:
+    """
+    Список записей в виде таблицы Arrow (формат IPC stream).
+
+    Столбец date с датами в ISO приводится к типу date32, чтобы клиент
+    получал даты, а не строки.
+    """
+    if not isinstance(content, list):
+        raise NotAcceptableError("Формат Arrow поддерживается только для списков записей")
+    table = pa.Table.from_pylist(_records(content))
+    if "date" in table.column_names and pa.types.is_string(table.schema.field("date").type):
+        index = table.column_names.index("date")
+        table = table.set_column(index, "date", table.column("date").cast(pa.date32()))
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+# Поддерживаемые форматы: тип содержимого -> функция кодирования
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {
+    JSON_MEDIA_TYPE: encode_json,
+    MSGPACK_MEDIA_TYPE: encode_msgpack,
+}
+if pa is not None:
+    ENCODERS[ARROW_MEDIA_TYPE] = encode_arrow
+
+def negotiate(accept: Optional[str], offered: Sequence[str] = (JSON_MEDIA_TYPE,)) -> str:
+    """
+    Выбор формата ответа по заголовку Accept.
+
+    Из предложенных форматов (без тех, для которых нет кодировщика) выбирается
+    формат с наибольшим q; при равных q - идущий раньше в offered. Без
+    заголовка Accept отдаётся первый формат.
+
+    Raises:
+        NotAcceptableError: если клиент не принимает ни один из форматов
+    """
+    offered = [media_type for media_type in offered if media_type in ENCODERS]
+    if not accept or not accept.strip():
+        return offered[0]
+
+    best, best_quality = None, 0.0
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        media_range = MEDIA_TYPE_ALIASES.get(media_range.lower(), media_range.lower())
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        for media_type in offered:
+            matches = (
+                media_range in ("*/*", media_type)
+                or (media_range.endswith("/*") and media_type.startswith(media_range[:-1]))
+            )
+            if matches and quality > 0 and (
+                quality > best_quality
+                or (quality == best_quality and offered.index(media_type) < offered.index(best))
+            ):
+                best, best_quality = media_type, quality
+
+    if best is None:
+        raise NotAcceptableError(f"Поддерживаемые форматы: {', '.join(offered)}")
+    return best
+
+def encode(media_type: str, content: Any) -> bytes:
+    """Кодирование данных ответа в заданном формате."""
+    return ENCODERS[media_type](content)
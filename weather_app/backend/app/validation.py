@@ -0,0 +1,137 @@
+"""
+Пакетная проверка данных о погоде.
+
+Вместо построения WeatherData с валидаторами для каждой строки величины
+проверяются по столбцам массивами NumPy, а описания погоды нормализуются
+через кэш models.normalize_weather_condition. Некорректные строки не
+прерывают обработку пакета: они попадают в отчёт об ошибках. Модель
+WeatherData по-прежнему проверяет отдельные записи на границе API.
+"""
+import datetime
+from typing import Any, Dict, List, Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from . import models
+
+class WeatherBatch(NamedTuple):
+    """Результат проверки пакета."""
+    # Корректные строки (поля WeatherData, значения нормализованы и округлены)
+    records: List[Dict[str, Any]]
+    # Ошибки по строкам: {"index": номер строки во входном пакете, "errors": {поле: сообщение}}
+    errors: List[Dict[str, Any]]
+
+    def to_models(self) -> List[models.WeatherData]:
+        """Корректные строки в виде WeatherData без повторной проверки."""
+        return to_models(self.records)
+
+def to_models(records: List[Dict[str, Any]]) -> List[models.WeatherData]:
+    """
+    Проверенные записи в виде WeatherData без повторной проверки.
+
+    Построение объектов дороже самой пакетной проверки, поэтому чтение,
+    сохранение и сериализация работают с записями, а объекты создаются
+    только для вызывающих, которым нужна модель.
+    """
+    construct = models.WeatherData.model_construct
+    return [construct(_fields_set=set(record), **record) for record in records]
+
+# Поля WeatherData в порядке объявления (порядок ключей проверенных строк)
+_FIELDS = tuple(models.WeatherData.model_fields)
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    """Столбец чисел; значения, которые нельзя привести к float, заменяются NaN."""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        column = np.empty(len(values))
+        for index, value in enumerate(values):
+            try:
+                column[index] = float(value)
+            except (TypeError, ValueError):
+                column[index] = np.nan
+        return column
+
+def _date_column(values: List[Any]) -> np.ndarray:
+    """Столбец дат (datetime64[D]); некорректные даты заменяются NaT."""
+    # Числа NumPy считал бы днями от 1970-01-01
+    values = [value if isinstance(value, (str, datetime.date)) else None for value in values]
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        for index, value in enumerate(values):
+            try:
+                column[index] = np.datetime64(value, "D")
+            except (TypeError, ValueError):
+                pass
+        return column
+
+def _round_tenths(values: np.ndarray) -> List[float]:
+    """Округление до десятых с тем же результатом, что и round(value, 1)."""
+    scaled = values * 10
+    rounded = np.rint(scaled) / 10
+    # Около половины десятой rint(value * 10) может разойтись с round из-за
+    # ошибки умножения - такие значения округляются по одному
+    near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, 1) for value in values[near_half].tolist()]
+    return rounded.tolist()
+
+def validate_weather_batch(rows: Sequence[Mapping[str, Any]]) -> WeatherBatch:
+    """
+    Проверка пакета строк с полями WeatherData.
+
+    Диапазоны величин и сообщения об ошибках те же, что у валидаторов
+    WeatherData; дополнительно отклоняются пропущенные значения и NaN.
+
+    Args:
+        rows: Строки-словари (например, из БД или от скрапера)
+
+    Returns:
+        Корректные строки и отчёт об ошибках по остальным
+    """
+    errors: Dict[int, Dict[str, str]] = {}
+
+    def reject(mask: np.ndarray, field: str, message: str) -> None:
+        for index in np.flatnonzero(mask):
+            errors.setdefault(int(index), {})[field] = message
+
+    columns: Dict[str, List[Any]] = {}
+    for field, (low, high, message) in models.WEATHER_VALUE_RANGES.items():
+        values = _float_column([row.get(field) for row in rows])
+        missing = np.isnan(values)
+        reject(missing, field, "Ожидается число")
+        reject(~missing & ((values < low) | (values > high)), field, message)
+        columns[field] = _round_tenths(values)
+
+    dates = _date_column([row.get("date") for row in rows])
+    reject(np.isnat(dates), "date", "Ожидается дата")
+    columns["date"] = dates.tolist()
+
+    cities = [row.get("city") for row in rows]
+    reject(np.array([not isinstance(city, str) for city in cities], dtype=bool), "city", "Ожидается строка")
+    columns["city"] = cities
+
+    conditions = [row.get("weather_condition") for row in rows]
+    is_text = np.array([isinstance(condition, str) for condition in conditions], dtype=bool)
+    reject(~is_text, "weather_condition", "Ожидается строка")
+    columns["weather_condition"] = [
+        models.normalize_weather_condition(condition) if text else condition
+        for condition, text in zip(conditions, is_text.tolist())
+    ]
+
+    columns["id"] = [row.get("id") for row in rows]
+    columns["created_at"] = [
+        datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
+        for value in (row.get("created_at") for row in rows)
+    ]
+
+    records = [dict(zip(_FIELDS, values)) for values in zip(*(columns[field] for field in _FIELDS))]
+    if errors:
+        records = [record for index, record in enumerate(records) if index not in errors]
+
+    return WeatherBatch(
+        records,
+        [{"index": index, "errors": errors[index]} for index in sorted(errors)],
+    )
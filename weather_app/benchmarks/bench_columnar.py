@@ -0,0 +1,52 @@
+"""
+Чтение данных для обучения: WeatherData по строкам против массива по столбцам.
+
+Замеряется путь от SQLite до матрицы признаков (чтение + prepare_data):
+время и пик памяти, выделенной Python (tracemalloc). Запуск из каталога weather_app:
+    python -m benchmarks.bench_columnar --rows 100000
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable
+
+from benchmarks.common import generate_weather_data, measure, temporary_database
+from backend.app import database, ml_model
+
+def rows_path():
+    return ml_model.prepare_data(database.get_weather_data(None, 0))
+
+def columns_path():
+    return ml_model.prepare_data(database.get_weather_columns(None, 0))
+
+def peak_allocated(func: Callable) -> float:
+    """Пик памяти (МБ), выделенной Python во время вызова."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} {'способ':>9} {'время, с':>9} {'пик, МБ':>8}")
+    for n_rows in args.rows:
+        with temporary_database():
+            database.upsert_weather_data(generate_weather_data(n_rows))
+            results = {}
+            for name, func in (("строки", rows_path), ("столбцы", columns_path)):
+                seconds, _ = measure(func, repeat=args.repeat)
+                peak = peak_allocated(func)
+                results[name] = seconds
+                print(f"{n_rows:>8} {name:>9} {seconds:>9.3f} {peak:>8.1f}")
+            print(f"{'':>8} ускорение: {results['строки'] / results['столбцы']:.1f}x")
+
+if __name__ == "__main__":
+    main()
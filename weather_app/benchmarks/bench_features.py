@@ -0,0 +1,40 @@
+"""
+Время построения лаговых признаков в зависимости от длины истории.
+
+Сравниваются построение признаков по всему ряду и по хвосту из
+context_size(lags) последних наблюдений (features.latest_history), которого
+достаточно для прогноза следующего дня. Запуск из каталога weather_app:
+    python -m benchmarks.bench_features --lengths 1000 10000 100000 1000000
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import measure
+from backend.app import features
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--lags", type=int, default=features.DEFAULT_LAGS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'дней':>9} {'полное, мс':>11} {'хвост, мс':>10}")
+    for length in args.lengths:
+        values = rng.normal(size=(length, len(features.VALUE_COLUMNS)))
+        dates = np.datetime64("1900-01-01") + np.arange(length)
+
+        full_time, _ = measure(features.build_features, values, args.lags, repeat=args.repeat)
+
+        def tail_features():
+            history = features.latest_history(dates, values, args.lags)
+            return features.build_features(history.values, args.lags)[-1]
+
+        tail_time, _ = measure(tail_features, repeat=args.repeat)
+        print(f"{length:>9} {full_time * 1000:>11.2f} {tail_time * 1000:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Задержка прогноза: прежний цикл по дням против векторного make_forecast.
+
+Запуск из каталога weather_app:
+    python -m benchmarks.bench_forecast --horizons 1 7 30 365
+"""
+import argparse
+import datetime
+import os
+from typing import List
+
+import numpy as np
+
+from benchmarks.common import generate_weather_data, measure, temporary_database
+from backend.app import ml_model, models
+
+def legacy_make_forecast(data: List[models.WeatherData], days: int) -> List[models.WeatherForecast]:
+    """Прежняя реализация make_forecast: transform и predict отдельно для каждого дня."""
+    city = data[0].city
+    models_dict = ml_model.load_model(city)
+    scaler = models_dict['scaler']
+    forecasts = []
+    last_date = max(item.date for item in data)
+    last_item = data[0]
+
+    for i in range(1, days + 1):
+        forecast_date = last_date + datetime.timedelta(days=i)
+        X = np.array([
+            forecast_date.timetuple().tm_yday, forecast_date.weekday(), forecast_date.month,
+            last_item.temperature, last_item.humidity,
+            last_item.pressure, last_item.wind_speed,
+            last_item.precipitation
+        ]).reshape(1, -1)
+        X_scaled = scaler.transform(X)
+        temp_pred = models_dict['temperature'].predict(X_scaled)[0]
+        humidity_pred = models_dict['humidity'].predict(X_scaled)[0]
+        precip_pred = models_dict['precipitation'].predict(X_scaled)[0]
+        condition = ml_model.derive_conditions(
+            np.array([temp_pred]), np.array([humidity_pred]), np.array([precip_pred])
+        )[0]
+        forecasts.append(models.WeatherForecast(
+            city=city,
+            date=forecast_date,
+            temperature=round(float(temp_pred), 1),
+            humidity=round(float(humidity_pred), 1),
+            precipitation=round(float(precip_pred), 1),
+            weather_condition=str(condition)
+        ))
+    return forecasts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 7, 30, 365])
+    parser.add_argument("--history", type=int, default=365, help="Дней истории для обучения")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = generate_weather_data(args.history, n_cities=1)
+    with temporary_database() as database_path:
+        original_model_dir = ml_model.MODEL_DIR
+        ml_model.MODEL_DIR = os.path.join(os.path.dirname(database_path), "models")
+        try:
+            # Сравнивается прогноз модели без лагов: у неё горизонт считается одной матрицей
+            ml_model.train_model(data, models.ModelConfig(strategy="sequential", lags=0))
+            # Первый вызов загружает модель в реестр
+            ml_model.make_forecast(data, 1)
+
+            print(f"{'дней':>6} {'цикл, мс':>10} {'вектор, мс':>11} {'ускорение':>10}")
+            for days in args.horizons:
+                legacy_time, legacy = measure(legacy_make_forecast, data, days, repeat=args.repeat)
+                vector_time, vector = measure(ml_model.make_forecast, data, days, repeat=args.repeat)
+                assert legacy == vector, "Прогнозы не совпадают"
+                print(
+                    f"{days:>6} {legacy_time * 1000:>10.1f} {vector_time * 1000:>11.1f} "
+                    f"{legacy_time / vector_time:>9.1f}x"
+                )
+        finally:
+            ml_model.MODEL_DIR = original_model_dir
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Стоимость страницы /weather в зависимости от её глубины.
+
+Сравниваются постраничное чтение по ключу (database.query_weather_data)
+и LIMIT/OFFSET с тем же порядком строк. Запуск из каталога weather_app:
+    python -m benchmarks.bench_pagination --rows 200000 --limit 100
+"""
+import argparse
+
+from benchmarks.common import generate_weather_data, measure, temporary_database
+from backend.app import database
+
+def offset_page(offset: int, limit: int):
+    with database.db_connection() as conn:
+        return conn.execute(
+            "SELECT * FROM weather_data ORDER BY city, date LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with temporary_database():
+        database.upsert_weather_data(generate_weather_data(args.rows))
+        with database.db_connection() as conn:
+            keys = conn.execute("SELECT city, date FROM weather_data ORDER BY city, date").fetchall()
+
+        print(f"{'смещение':>9} {'по ключу, мс':>13} {'OFFSET, мс':>11}")
+        for fraction in (0, 0.25, 0.5, 0.99):
+            offset = int(len(keys) * fraction)
+            after = (keys[offset - 1]["city"], keys[offset - 1]["date"]) if offset else None
+            keyset_time, _ = measure(database.query_weather_data, limit=args.limit, after=after, repeat=args.repeat)
+            offset_time, _ = measure(offset_page, offset, args.limit, repeat=args.repeat)
+            print(f"{offset:>9} {keyset_time * 1000:>13.2f} {offset_time * 1000:>11.2f}")
+
+if __name__ == "__main__":
+    main()
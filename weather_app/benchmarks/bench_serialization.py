@@ -0,0 +1,44 @@
+"""
+Кодирование ответа /weather: jsonable_encoder + json против orjson, MessagePack и Arrow.
+
+Кодируются списки WeatherData (ответ /weather за последние дни) и строки-словари
+(постраничная выборка query_weather_data). Запуск из каталога weather_app:
+    python -m benchmarks.bench_serialization --rows 10000 100000
+"""
+import argparse
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.common import generate_weather_data, measure
+from backend.app import serialization
+
+def default_json(content):
+    """Прежний путь: как JSONResponse."""
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    encoders = [("json", default_json), *serialization.ENCODERS.items()]
+    print(f"{'строк':>7} {'данные':>8} {'формат':>38} {'время, мс':>10} {'размер, КБ':>11} {'ускорение':>10}")
+    for n_rows in args.rows:
+        items = generate_weather_data(n_rows)
+        rows = [item.model_dump(mode="json") for item in items]
+        for data_name, content in (("модели", items), ("словари", rows)):
+            baseline = None
+            for name, encode in encoders:
+                seconds, body = measure(encode, content, repeat=args.repeat)
+                baseline = baseline or seconds
+                print(
+                    f"{n_rows:>7} {data_name:>8} {name:>38} {seconds * 1000:>10.1f} "
+                    f"{len(body) / 1024:>11.0f} {baseline / seconds:>9.1f}x"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Сравнение способов обучения моделей целевых переменных: время и пиковая память.
+
+Каждый замер выполняется в отдельном процессе, чтобы пиковый RSS одного способа
+не влиял на другой. Запуск из каталога weather_app:
+    python -m benchmarks.bench_training --sizes 1000 10000 100000
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from benchmarks.common import generate_weather_data
+from backend.app import ml_model
+from backend.app.models import ModelConfig, TRAINING_STRATEGIES
+
+def _peak_rss_mb() -> float:
+    # В Linux ru_maxrss измеряется в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_strategy(n_rows: int, strategy: str, n_estimators: int, n_jobs: Optional[int]) -> Dict[str, float]:
+    """Обучение одним способом (вызывается в отдельном процессе)."""
+    data = generate_weather_data(n_rows)
+    X, _, _ = ml_model.prepare_data(data)
+    Y = np.array([[d.temperature, d.humidity, d.precipitation] for d in data])
+    X_scaled = ml_model.StandardScaler().fit_transform(X)
+    del data
+
+    config = ModelConfig(strategy=strategy, n_estimators=n_estimators, n_jobs=n_jobs)
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    ml_model.fit_targets(X_scaled, Y, config)
+    return {
+        "seconds": time.perf_counter() - started,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--strategies", nargs="+", default=list(TRAINING_STRATEGIES), choices=TRAINING_STRATEGIES)
+    parser.add_argument("--n-estimators", type=int, default=ml_model.DEFAULT_MODEL_CONFIG.n_estimators)
+    parser.add_argument("--n-jobs", type=int, default=ml_model.DEFAULT_MODEL_CONFIG.n_jobs)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'строк':>8} {'способ':>13} {'время, с':>10} {'RSS до, МБ':>11} {'пик RSS, МБ':>12}")
+    for size in args.sizes:
+        for strategy in args.strategies:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_strategy, (size, strategy, args.n_estimators, args.n_jobs))
+            print(
+                f"{size:>8} {strategy:>13} {result['seconds']:>10.2f} "
+                f"{result['rss_before_mb']:>11.1f} {result['peak_rss_mb']:>12.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Сравнение построчного сохранения (INSERT OR REPLACE) с массовым upsert.
+
+Запуск из каталога weather_app:
+    python -m benchmarks.bench_upsert --sizes 1000 10000 100000
+"""
+import argparse
+from typing import List
+
+from benchmarks.common import generate_weather_data, measure, temporary_database
+from backend.app import database
+from backend.app.models import WeatherData
+
+def legacy_save_weather_data(data_list: List[WeatherData]) -> int:
+    """Прежняя реализация save_weather_data: один INSERT OR REPLACE на строку."""
+    last_id = 0
+    with database.db_connection() as conn:
+        cursor = conn.cursor()
+        for data in data_list:
+            try:
+                cursor.execute('''
+                INSERT OR REPLACE INTO weather_data
+                (city, date, temperature, humidity, pressure, wind_speed, precipitation, weather_condition)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data.city,
+                    data.date,
+                    data.temperature,
+                    data.humidity,
+                    data.pressure,
+                    data.wind_speed,
+                    data.precipitation,
+                    data.weather_condition
+                ))
+                last_id = cursor.lastrowid
+            except Exception:
+                pass
+        conn.commit()
+    return last_id
+
+def run(sizes: List[int], chunk_size: int, repeat: int) -> None:
+    print(f"{'строк':>8} | {'режим':<8} | {'построчно, с':>14} | {'upsert, с':>10} | {'ускорение':>9}")
+    print("-" * 62)
+    for size in sizes:
+        data = generate_weather_data(size)
+        
+        timings = {}
+        for name, save in (
+            ("legacy", legacy_save_weather_data),
+            ("upsert", lambda rows: database.upsert_weather_data(rows, chunk_size=chunk_size)),
+        ):
+            # Вставка возможна один раз на БД: лучшее время по нескольким новым БД
+            insert_time = update_time = float("inf")
+            for _ in range(repeat):
+                with temporary_database():
+                    insert_time = min(insert_time, measure(save, data)[0])
+                    # Повторное сохранение тех же ключей - путь обновления
+                    update_time = min(update_time, measure(save, data)[0])
+            timings[name] = (insert_time, update_time)
+        
+        for mode, index in (("вставка", 0), ("update", 1)):
+            legacy_time = timings["legacy"][index]
+            upsert_time = timings["upsert"][index]
+            print(
+                f"{size:>8} | {mode:<8} | {legacy_time:>14.3f} | {upsert_time:>10.3f} | "
+                f"{legacy_time / upsert_time:>8.1f}x"
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк сохранения данных о погоде")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--chunk-size", type=int, default=database.UPSERT_CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.chunk_size, args.repeat)
+
+if __name__ == "__main__":
+    main()
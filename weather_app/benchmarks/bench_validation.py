@@ -0,0 +1,78 @@
+"""
+Проверка строк данных о погоде: WeatherData по одной против пакетной проверки.
+
+Строки-словари (как от скрапера или из БД) проверяются построением WeatherData
+для каждой строки и через validation.validate_weather_batch; отдельно
+замеряется получение объектов WeatherData из проверенного пакета. Разница
+строк "пакет (записи)" и "пакет + WeatherData" - цена WeatherData.model_construct
+для каждой строки: там, где объекты не нужны, лучше работать с записями.
+
+Вторая таблица - путь целиком во временной БД: чтение строк и JSON-ответ
+/weather, проверка собранных строк и их сохранение. Прежний путь строил
+WeatherData для каждой строки, текущий передаёт проверенные записи.
+Запуск из каталога weather_app:
+    python -m benchmarks.bench_validation --rows 100000
+"""
+import argparse
+
+from benchmarks.common import generate_weather_data, measure, temporary_database
+from backend.app import database, serialization, validation
+from backend.app.models import WeatherData
+
+def per_row(rows):
+    return [WeatherData(**row) for row in rows]
+
+def batch_records(rows):
+    return validation.validate_weather_batch(rows)
+
+def batch_models(rows):
+    return validation.validate_weather_batch(rows).to_models()
+
+def read_per_row():
+    with database.db_connection() as conn:
+        rows = conn.execute("SELECT * FROM weather_data ORDER BY date DESC").fetchall()
+    return serialization.encode_json(per_row(rows))
+
+def read_records():
+    return serialization.encode_json(database.get_weather_records(None, 0))
+
+def save_per_row(rows):
+    return database.upsert_weather_data(per_row(rows))
+
+def save_records(rows):
+    return database.upsert_weather_data(validation.validate_weather_batch(rows).records)
+
+def print_table(n_rows, cases, repeat):
+    baseline = None
+    for name, func, args in cases:
+        seconds, _ = measure(func, *args, repeat=repeat)
+        baseline = baseline or seconds
+        print(f"{n_rows:>8} {name:>22} {seconds:>9.3f} {baseline / seconds:>9.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} {'способ':>22} {'время, с':>9} {'ускорение':>10}")
+    for n_rows in args.rows:
+        rows = [item.model_dump(exclude={"id", "created_at"}, mode="json") for item in generate_weather_data(n_rows)]
+        print_table(n_rows, (("WeatherData по одной", per_row, (rows,)),
+                             ("пакет (записи)", batch_records, (rows,)),
+                             ("пакет + WeatherData", batch_models, (rows,))), args.repeat)
+
+    print()
+    print(f"{'строк':>8} {'путь целиком':>22} {'время, с':>9} {'ускорение':>10}")
+    for n_rows in args.rows:
+        rows = [item.model_dump(exclude={"id", "created_at"}, mode="json") for item in generate_weather_data(n_rows)]
+        with temporary_database():
+            # Строки уже в БД: оба способа сохранения обновляют их на месте
+            database.upsert_weather_data(validation.validate_weather_batch(rows).records)
+            print_table(n_rows, (("чтение: WeatherData", read_per_row, ()),
+                                 ("чтение: записи", read_records, ())), args.repeat)
+            print_table(n_rows, (("запись: WeatherData", save_per_row, (rows,)),
+                                 ("запись: записи", save_records, (rows,))), args.repeat)
+
+if __name__ == "__main__":
+    main()
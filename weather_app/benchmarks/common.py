@@ -0,0 +1,78 @@
+"""Общие утилиты для бенчмарков: синтетические данные и временная БД."""
+import datetime
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database
+from backend.app.models import WeatherData
+
+# Информационные сообщения модулей приложения искажают замеры
+logging.getLogger("backend.app").setLevel(logging.WARNING)
+
+CITIES = [
+    "Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань",
+    "Тверь", "Владивосток", "Сочи", "Калининград", "Мурманск"
+]
+CONDITIONS = ["Ясно", "Облачно", "Пасмурно", "Туман", "Дождь", "Гроза", "Снег"]
+
+def generate_weather_data(
+    n_rows: int,
+    n_cities: int = 10,
+    seed: int = 42,
+    end_date: datetime.date = datetime.date(2024, 12, 31)
+) -> List[WeatherData]:
+    """
+    Генерация воспроизводимого набора данных о погоде.
+    
+    Строки распределяются по городам поровну, для каждого города даты идут
+    подряд в обратном порядке от end_date, поэтому пары (город, дата) уникальны.
+    """
+    rng = random.Random(seed)
+    cities = CITIES[:n_cities]
+    result = []
+    for i in range(n_rows):
+        city = cities[i % len(cities)]
+        day = i // len(cities)
+        date = end_date - datetime.timedelta(days=day)
+        result.append(WeatherData(
+            city=city,
+            date=date,
+            temperature=round(rng.uniform(-30.0, 35.0), 1),
+            humidity=round(rng.uniform(20.0, 100.0), 1),
+            pressure=round(rng.uniform(980.0, 1040.0), 1),
+            wind_speed=round(rng.uniform(0.0, 20.0), 1),
+            precipitation=round(rng.uniform(0.0, 15.0), 1),
+            weather_condition=rng.choice(CONDITIONS)
+        ))
+    return result
+
+@contextmanager
+def temporary_database() -> Iterator[str]:
+    """Временная БД: DATABASE_PATH подменяется на время блока ``with``."""
+    original_path = database.DATABASE_PATH
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database.DATABASE_PATH = os.path.join(temp_dir, "weather.db")
+        try:
+            database.init_db()
+            yield database.DATABASE_PATH
+        finally:
+            database.close_pool()
+            database.DATABASE_PATH = original_path
+
+def measure(func: Callable, *args, repeat: int = 1, **kwargs) -> Tuple[float, object]:
+    """Лучшее время выполнения функции (в секундах) и результат последнего вызова."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
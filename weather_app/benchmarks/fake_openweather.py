@@ -0,0 +1,298 @@
+"""
+Локальная замена OpenWeatherMap API для нагрузочных тестов без доступа к сети.
+
+Отвечает на /geo/1.0/direct и /data/2.5/weather в формате OpenWeatherMap.
+Задержка ответа, доля ошибок 500 и ответы 429 (случайная доля и/или
+ограничение числа запросов в секунду) настраиваются при создании и во время
+работы. Сервер встраивается в тесты и нагрузочный драйвер:
+
+    with FakeOpenWeather(latency=0.05, error_rate=0.1) as upstream:
+        scraper.configure_api(upstream.url, upstream.api_key)
+
+или запускается отдельно для бэкенда в другом процессе:
+
+    python -m benchmarks.fake_openweather --port 8081 --latency 0.05
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8081 OPENWEATHER_API_KEY=test-key uvicorn ...
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+GEO_PATH = "/geo/1.0/direct"
+WEATHER_PATH = "/data/2.5/weather"
+ENDPOINTS = {GEO_PATH: "geo", WEATHER_PATH: "weather"}
+
+DEFAULT_API_KEY = "test-key"
+
+# Коды погодных условий OpenWeatherMap, из которых выбирается ответ
+WEATHER_IDS = (200, 300, 500, 502, 600, 701, 800, 801, 803, 804)
+
+class _RateLimiter:
+    """Ограничение числа запросов в секунду (token bucket, запас - одна секунда)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+class FakeOpenWeather:
+    """
+    HTTP-сервер в фоновом потоке, имитирующий OpenWeatherMap.
+
+    Args:
+        host, port: Адрес сервера (port=0 - свободный порт)
+        latency: Задержка ответа, секунды
+        jitter: Случайная добавка к задержке от 0 до jitter, секунды
+        error_rate: Доля ответов 500
+        rate_limit_rate: Доля ответов 429
+        rate_limit_rps: Запросов в секунду, сверх которых отвечать 429 (0 - без ограничения)
+        retry_after: Значение заголовка Retry-After в ответах 429 (0 - без заголовка)
+        api_key: Ключ, без которого запрос получает 401
+        unknown_cities: Города, для которых геокодирование возвращает пустой список
+        seed: Зерно генератора случайных чисел
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rate_limit_rps: float = 0.0,
+        retry_after: float = 0.0,
+        api_key: str = DEFAULT_API_KEY,
+        unknown_cities: Iterable[str] = (),
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.unknown_cities = {city.lower() for city in unknown_cities}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.latency = self.jitter = self.error_rate = self.rate_limit_rate = self.retry_after = 0.0
+        self._limiter: Optional[_RateLimiter] = None
+        self.configure(
+            latency=latency, jitter=jitter, error_rate=error_rate, rate_limit_rate=rate_limit_rate,
+            rate_limit_rps=rate_limit_rps, retry_after=retry_after,
+        )
+
+    def configure(
+        self,
+        latency: Optional[float] = None,
+        jitter: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        rate_limit_rate: Optional[float] = None,
+        rate_limit_rps: Optional[float] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """Изменение поведения сервера (в том числе во время работы)."""
+        for name, value in (("error_rate", error_rate), ("rate_limit_rate", rate_limit_rate)):
+            if value is not None and not 0 <= value <= 1:
+                raise ValueError(f"{name} должна быть от 0 до 1")
+        if latency is not None:
+            self.latency = latency
+        if jitter is not None:
+            self.jitter = jitter
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if rate_limit_rate is not None:
+            self.rate_limit_rate = rate_limit_rate
+        if retry_after is not None:
+            self.retry_after = retry_after
+        if rate_limit_rps is not None:
+            self._limiter = _RateLimiter(rate_limit_rps) if rate_limit_rps > 0 else None
+
+    @property
+    def url(self) -> str:
+        """Базовый адрес для scraper.configure_api / OPENWEATHER_BASE_URL."""
+        if self._server is None:
+            raise RuntimeError("Сервер не запущен")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOpenWeather":
+        if self._server is not None:
+            return self
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+            name="fake-openweather", daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+    def __enter__(self) -> "FakeOpenWeather":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Число ответов по ключам вида "weather 200", "geo 429" и общее число запросов."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["requests"] = sum(stats.values())
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def handle(self, path: str, query: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        """Ответ на запрос: статус, дополнительные заголовки и тело."""
+        endpoint = ENDPOINTS.get(path)
+        status, headers, body = self._respond(endpoint, query)
+        with self._lock:
+            self._stats[f"{endpoint or 'unknown'} {status}"] += 1
+        return status, headers, body
+
+    def _respond(self, endpoint: Optional[str], query: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        if endpoint is None:
+            return 404, {}, {"cod": "404", "message": "Not found"}
+        if query.get("appid") != self.api_key:
+            return 401, {}, {"cod": 401, "message": "Invalid API key."}
+        # Ограничение темпа отвечает сразу, как и настоящий API
+        if (self._limiter is not None and not self._limiter.allow()) or self._chance(self.rate_limit_rate):
+            headers = {"Retry-After": f"{self.retry_after:g}"} if self.retry_after > 0 else {}
+            return 429, headers, {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation."}
+
+        delay = self.latency
+        if self.jitter > 0:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self._chance(self.error_rate):
+            return 500, {}, {"cod": "500", "message": "Internal server error"}
+
+        if endpoint == "geo":
+            return self._geo(query)
+        return self._weather(query)
+
+    def _geo(self, query: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        city = query.get("q", "").strip()
+        if not city:
+            return 400, {}, {"cod": "400", "message": "Nothing to geocode"}
+        if city.lower() in self.unknown_cities:
+            return 200, {}, []
+        # Координаты постоянны для города
+        checksum = zlib.crc32(city.lower().encode("utf-8"))
+        lat = round(-60 + (checksum % 13000) / 100, 4)
+        lon = round(-180 + (checksum // 13000 % 36000) / 100, 4)
+        return 200, {}, [{"name": city, "lat": lat, "lon": lon, "country": "RU"}]
+
+    def _weather(self, query: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return 400, {}, {"cod": "400", "message": "wrong latitude or longitude"}
+        with self._lock:
+            rng = random.Random(self._random.random())
+        body = {
+            "coord": {"lat": lat, "lon": lon},
+            "weather": [{"id": rng.choice(WEATHER_IDS), "main": "", "description": ""}],
+            "main": {
+                "temp": round(rng.uniform(-25.0, 30.0), 2),
+                "humidity": rng.randint(30, 100),
+                "pressure": rng.randint(990, 1035),
+            },
+            "wind": {"speed": round(rng.uniform(0.0, 15.0), 2)},
+            "dt": int(time.time()),
+            "cod": 200,
+        }
+        if rng.random() < 0.3:
+            body["rain"] = {"1h": round(rng.uniform(0.1, 5.0), 2)}
+        return 200, {}, body
+
+def _make_handler(upstream: FakeOpenWeather) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive: клиенты бэкенда переиспользуют соединения
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            parts = urlsplit(self.path)
+            query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+            status, headers, body = upstream.handle(parts.path, query)
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, секунды")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, секунды")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--rate-limit-rps", type=float, default=0.0, help="запросов в секунду до ответов 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="заголовок Retry-After ответов 429")
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY)
+    args = parser.parse_args()
+
+    upstream = FakeOpenWeather(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        rate_limit_rps=args.rate_limit_rps, retry_after=args.retry_after, api_key=args.api_key,
+    )
+    with upstream:
+        print(f"Замена OpenWeatherMap: {upstream.url} (ключ {upstream.api_key})")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(upstream.stats())
+
+if __name__ == "__main__":
+    main()
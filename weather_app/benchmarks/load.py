@@ -0,0 +1,261 @@
+"""
+Нагрузочный тест маршрутов /scrape и /forecast.
+
+Запросы отправляются по HTTP заданным числом параллельных клиентов; для каждого
+маршрута выводятся пропускная способность и задержки p50/p95/p99.
+
+По умолчанию бэкенд запускается в этом же процессе (uvicorn в фоновом потоке)
+с временной БД, историей и обученными моделями для городов нагрузки, а запросы
+к OpenWeatherMap идут в локальную замену (benchmarks/fake_openweather.py) с
+заданными задержкой, долей ошибок и ответами 429. Драйвер и бэкенд делят одно
+ядро интерпретатора, поэтому для точных цифр бэкенд лучше запустить отдельно
+(с OPENWEATHER_BASE_URL, указывающим на замену) и передать его адрес в
+--backend-url; /forecast тогда требует обученных моделей городов.
+
+Запуск из каталога weather_app:
+    python -m benchmarks.load --concurrency 16 --requests 400
+    python -m benchmarks.load --upstream-latency 0.1 --upstream-error-rate 0.05 --duration 30
+    python -m benchmarks.load --backend-url http://127.0.0.1:8000 --endpoints forecast --output load.json
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks.common import CITIES, generate_weather_data, temporary_database
+from benchmarks.fake_openweather import FakeOpenWeather
+from backend.app import database, jobs, ml_model, response_cache, scraper
+from backend.app.models import ModelConfig
+
+# Журнал каждого запроса искажает замеры
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+ENDPOINTS = ("scrape", "forecast")
+
+class Sample(NamedTuple):
+    endpoint: str
+    # 0 - запрос не выполнен (таймаут, обрыв соединения)
+    status: int
+    latency: float
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Процентиль q (0-100) отсортированной выборки с линейной интерполяцией."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """Сводка по маршрутам и по всем запросам: число, ошибки, статусы, темп и задержки в мс."""
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample.endpoint, []).append(sample)
+    groups["всего"] = samples
+
+    summary = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(sample.latency for sample in group)
+        statuses: Dict[str, int] = {}
+        for sample in group:
+            key = str(sample.status) if sample.status else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        summary[endpoint] = {
+            "requests": len(group),
+            "errors": sum(1 for sample in group if not 200 <= sample.status < 300),
+            "statuses": dict(sorted(statuses.items())),
+            "throughput": round(len(group) / elapsed, 2) if elapsed > 0 else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            **{f"p{q}_ms": round(percentile(latencies, q) * 1000, 2) for q in (50, 95, 99)},
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    return summary
+
+def plan_request(index: int, endpoints: Sequence[str], cities: Sequence[str], scrape_days: int,
+                 forecast_days: int) -> Tuple[str, str, str, Dict[str, Any]]:
+    """Запрос с номером index: маршруты чередуются, города перебираются по кругу."""
+    endpoint = endpoints[index % len(endpoints)]
+    city = cities[index // len(endpoints) % len(cities)]
+    if endpoint == "scrape":
+        # Период заканчивается сегодня: текущая погода запрашивается у OpenWeatherMap
+        today = datetime.date.today()
+        params = {"city": city, "start_date": (today - datetime.timedelta(days=scrape_days - 1)).isoformat(),
+                  "end_date": today.isoformat()}
+        return endpoint, "POST", "/scrape", params
+    return endpoint, "GET", "/forecast", {"city": city, "days": forecast_days}
+
+async def drive(
+    base_url: str,
+    endpoints: Sequence[str],
+    cities: Sequence[str],
+    concurrency: int,
+    requests: Optional[int],
+    duration: Optional[float],
+    scrape_days: int = 1,
+    forecast_days: int = 7,
+    timeout: float = 60.0,
+) -> Tuple[List[Sample], float]:
+    """
+    Отправка запросов concurrency клиентами: всего requests запросов или в течение duration секунд.
+
+    Returns:
+        Замеры запросов и общее время нагрузки, секунды
+    """
+    counter = itertools.count()
+    samples: List[Sample] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+
+        async def worker() -> None:
+            while True:
+                index = next(counter)
+                if requests is not None and index >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                endpoint, method, path, params = plan_request(index, endpoints, cities, scrape_days, forecast_days)
+                request_started = time.perf_counter()
+                try:
+                    status = (await client.request(method, path, params=params)).status_code
+                except httpx.HTTPError:
+                    status = 0
+                samples.append(Sample(endpoint, status, time.perf_counter() - request_started))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, time.perf_counter() - started
+
+@contextmanager
+def embedded_backend(cities: Sequence[str], upstream: FakeOpenWeather, history_days: int = 60) -> Iterator[str]:
+    """
+    Бэкенд во временной БД на свободном порту, запросы к API - в замену upstream.
+
+    Для каждого города сохраняется история до вчерашнего дня и обучается модель.
+    """
+    import uvicorn
+    from backend.app.api import app
+
+    original_api = (scraper.OPENWEATHER_BASE_URL, scraper.OPENWEATHER_API_KEY)
+    original_model_dir = ml_model.MODEL_DIR
+    with temporary_database() as database_path:
+        ml_model.MODEL_DIR = os.path.join(os.path.dirname(database_path), "models")
+        scraper.configure_api(upstream.url, upstream.api_key)
+        response_cache.response_cache.clear()
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        for index, city in enumerate(cities):
+            history = generate_weather_data(history_days, n_cities=1, seed=index, end_date=yesterday)
+            database.save_weather_data([row.model_copy(update={"city": city}) for row in history])
+            ml_model.train_model(database.get_weather_data(city, jobs.TRAINING_HISTORY_DAYS), ModelConfig())
+
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False))
+        thread = threading.Thread(target=server.run, name="weather-backend", daemon=True)
+        thread.start()
+        try:
+            while not server.started:
+                if not thread.is_alive():
+                    raise RuntimeError("Не удалось запустить бэкенд")
+                time.sleep(0.05)
+            host, port = server.servers[0].sockets[0].getsockname()[:2]
+            yield f"http://{host}:{port}"
+        finally:
+            server.should_exit = True
+            thread.join()
+            response_cache.response_cache.clear()
+            scraper.configure_api(*original_api)
+            ml_model.MODEL_DIR = original_model_dir
+
+def print_summary(summary: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'маршрут':<10} {'запросов':>9} {'ошибок':>7} {'запр/с':>8} {'сред, мс':>10} "
+          f"{'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+    for endpoint, row in summary.items():
+        print(f"{endpoint:<10} {row['requests']:>9} {row['errors']:>7} {row['throughput']:>8.1f} "
+              f"{row['mean_ms']:>10.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+    for endpoint, row in summary.items():
+        print(f"Статусы {endpoint}: {row['statuses']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend-url", help="адрес запущенного бэкенда (по умолчанию - встроенный)")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--cities", type=int, default=3, help="число городов нагрузки")
+    parser.add_argument("--concurrency", type=int, default=8, help="число параллельных клиентов")
+    parser.add_argument("--requests", type=int, default=200, help="всего запросов")
+    parser.add_argument("--duration", type=float, help="длительность нагрузки, секунды (вместо --requests)")
+    parser.add_argument("--scrape-days", type=int, default=1, help="длина периода /scrape, дней")
+    parser.add_argument("--forecast-days", type=int, default=7, help="горизонт /forecast, дней")
+    parser.add_argument("--timeout", type=float, default=60.0, help="таймаут запроса, секунды")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="задержка замены OpenWeatherMap, секунды")
+    parser.add_argument("--upstream-jitter", type=float, default=0.0, help="случайная добавка к задержке, секунды")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--upstream-rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--upstream-rps", type=float, default=0.0, help="запросов в секунду до ответов 429")
+    parser.add_argument("--output", help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.cities < 1 or args.scrape_days < 1:
+        parser.error("--concurrency, --cities и --scrape-days должны быть положительными")
+    cities = CITIES[:args.cities]
+    requests = None if args.duration else args.requests
+
+    def run(base_url: str) -> Tuple[List[Sample], float]:
+        print(f"Нагрузка {base_url}: {', '.join(args.endpoints)}, параллельно {args.concurrency}, "
+              f"{f'{args.duration:g} с' if args.duration else f'{requests} запросов'}")
+        # Сообщения скрапера встроенного бэкенда о ходе сбора не выводятся
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return asyncio.run(drive(
+                base_url, args.endpoints, cities, args.concurrency, requests, args.duration,
+                args.scrape_days, args.forecast_days, args.timeout,
+            ))
+
+    upstream_stats = None
+    if args.backend_url:
+        samples, elapsed = run(args.backend_url)
+    else:
+        upstream = FakeOpenWeather(
+            latency=args.upstream_latency, jitter=args.upstream_jitter, error_rate=args.upstream_error_rate,
+            rate_limit_rate=args.upstream_rate_limit_rate, rate_limit_rps=args.upstream_rps,
+        )
+        with upstream:
+            with embedded_backend(cities, upstream) as base_url:
+                samples, elapsed = run(base_url)
+            upstream_stats = upstream.stats()
+
+    summary = summarize(samples, elapsed)
+    print(f"Время нагрузки: {elapsed:.2f} с")
+    print_summary(summary)
+    if upstream_stats is not None:
+        print(f"Ответы замены OpenWeatherMap: {upstream_stats}")
+
+    if args.output:
+        result = {
+            "meta": {
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+                "elapsed": round(elapsed, 3),
+            },
+            "summary": summary,
+            "upstream": upstream_stats,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Набор бенчмарков горячих путей: БД, скрапер, модель и маршруты API.
+
+Каждый случай замеряется на нескольких масштабах данных (--scale: small -
+первый размер, medium - два, large - все три) на воспроизводимых данных
+(--seed). Результаты сохраняются в JSON; режим compare сравнивает медианы
+двух прогонов и завершается с кодом 1, если какой-либо случай замедлился
+больше чем на --threshold.
+
+Запуск из каталога weather_app:
+    python -m benchmarks.suite run --scale medium --output results.json
+    python -m benchmarks.suite run --filter db. api. --baseline baseline.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from benchmarks.common import generate_weather_data, temporary_database
+from backend.app import database, jobs, ml_model, response_cache, scraper
+from backend.app.models import ModelConfig
+
+# Журнал запросов TestClient искажает замеры маршрутов
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+SCALES = {"small": 1, "medium": 2, "large": 3}
+
+# Замер: функция, время выполнения которой измеряется, и подготовка перед каждым повтором
+Run = Tuple[Callable[[], Any], Optional[Callable[[], None]]]
+
+class Case(NamedTuple):
+    name: str
+    # Размеры данных для масштабов small, medium, large
+    sizes: Tuple[int, int, int]
+    # Подготовка данных размера size; контекст отдаёт замер
+    prepare: Callable[[int, int], Any]
+    unit: str = "строк"
+
+@contextmanager
+def model_dir(database_path: str) -> Iterator[str]:
+    """Каталог моделей рядом с временной БД."""
+    original = ml_model.MODEL_DIR
+    ml_model.MODEL_DIR = os.path.join(os.path.dirname(database_path), "models")
+    try:
+        yield ml_model.MODEL_DIR
+    finally:
+        ml_model.MODEL_DIR = original
+
+def city_history(days: int, seed: int):
+    """Непрерывная история одного города за days дней."""
+    return generate_weather_data(days, n_cities=1, seed=seed, end_date=datetime.date.today())
+
+# Случаи: БД
+
+@contextmanager
+def save_weather_data(size: int, seed: int) -> Iterator[Run]:
+    data = generate_weather_data(size, seed=seed)
+    with temporary_database():
+        def reset():
+            with database.db_connection() as conn:
+                conn.execute("DELETE FROM weather_data")
+                conn.execute("DELETE FROM weather_coverage")
+                conn.commit()
+        yield (lambda: database.save_weather_data(data)), reset
+
+@contextmanager
+def get_weather_data(size: int, seed: int) -> Iterator[Run]:
+    with temporary_database():
+        database.save_weather_data(generate_weather_data(size, seed=seed))
+        yield (lambda: database.get_weather_data("Москва", 0)), None
+
+@contextmanager
+def get_weather_records(size: int, seed: int) -> Iterator[Run]:
+    with temporary_database():
+        database.save_weather_data(generate_weather_data(size, seed=seed))
+        yield (lambda: database.get_weather_records("Москва", 0)), None
+
+@contextmanager
+def get_missing_dates(size: int, seed: int) -> Iterator[Run]:
+    # Каждый десятый день пропущен: покрытие состоит из size / 10 диапазонов
+    data = [item for index, item in enumerate(city_history(size, seed)) if index % 10]
+    start = min(item.date for item in data)
+    end = max(item.date for item in data)
+    with temporary_database():
+        database.save_weather_data(data)
+        yield (lambda: database.get_missing_dates("Москва", start, end)), None
+
+# Случаи: скрапер
+
+@contextmanager
+def scrape_weather_data(size: int, seed: int) -> Iterator[Run]:
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=size - 1)
+    with temporary_database():
+        yield (lambda: scraper.scrape_weather_data("Москва", start, end)), None
+
+# Случаи: модель
+
+@contextmanager
+def prepare_data(size: int, seed: int) -> Iterator[Run]:
+    data = city_history(size, seed)
+    yield (lambda: ml_model.prepare_data(data)), None
+
+@contextmanager
+def train_model(size: int, seed: int) -> Iterator[Run]:
+    data = city_history(size, seed)
+    with temporary_database() as database_path, model_dir(database_path):
+        yield (lambda: ml_model.train_model(data, ModelConfig())), None
+
+@contextmanager
+def make_forecast(size: int, seed: int) -> Iterator[Run]:
+    data = city_history(365, seed)
+    with temporary_database() as database_path, model_dir(database_path):
+        database.save_weather_data(data)
+        ml_model.train_model(data, ModelConfig())
+        recent = database.get_weather_data("Москва", 30)
+        yield (lambda: ml_model.make_forecast(recent, size)), None
+
+# Случаи: маршруты API (через TestClient, как в тестах)
+
+@contextmanager
+def api_client(size: int, seed: int, train: bool = False):
+    from fastapi.testclient import TestClient
+    from backend.app.api import app
+
+    with temporary_database() as database_path, model_dir(database_path):
+        if size:
+            database.save_weather_data(generate_weather_data(size, seed=seed, end_date=datetime.date.today()))
+        if train:
+            ml_model.train_model(database.get_weather_data("Москва", jobs.TRAINING_HISTORY_DAYS), ModelConfig())
+        response_cache.response_cache.clear()
+        try:
+            yield TestClient(app)
+        finally:
+            response_cache.response_cache.clear()
+
+def api_get(path: str, params: Optional[Dict[str, Any]] = None, cached: bool = False, train: bool = False):
+    @contextmanager
+    def prepare(size: int, seed: int) -> Iterator[Run]:
+        with api_client(size, seed, train) as client:
+            def request():
+                response = client.get(path, params=params)
+                assert response.status_code == 200, response.text
+            # Без кэша каждый повтор строит ответ заново
+            yield request, (None if cached else response_cache.response_cache.clear)
+    return prepare
+
+@contextmanager
+def api_scrape(size: int, seed: int) -> Iterator[Run]:
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    params = {"city": "Москва", "start_date": (end - datetime.timedelta(days=size - 1)).isoformat(),
+              "end_date": end.isoformat()}
+    with api_client(0, seed) as client:
+        def request():
+            response = client.post("/scrape", params=params)
+            assert response.status_code == 200, response.text
+        yield request, None
+
+@contextmanager
+def api_forecast(size: int, seed: int) -> Iterator[Run]:
+    # Размер - горизонт прогноза; в БД год истории для каждого из 10 городов
+    with api_get("/forecast", {"city": "Москва", "days": size}, train=True)(3650, seed) as measured:
+        yield measured
+
+CASES = [
+    Case("db.save_weather_data", (1000, 10000, 100000), save_weather_data),
+    Case("db.get_weather_data", (1000, 10000, 100000), get_weather_data),
+    Case("db.get_weather_records", (1000, 10000, 100000), get_weather_records),
+    Case("db.get_missing_dates", (365, 3650, 36500), get_missing_dates, "дней"),
+    Case("scraper.scrape_weather_data", (30, 365, 3650), scrape_weather_data, "дней"),
+    Case("ml.prepare_data", (365, 3650, 36500), prepare_data),
+    Case("ml.train_model", (90, 365, 1825), train_model),
+    Case("ml.make_forecast", (7, 30, 365), make_forecast, "дней"),
+    Case("api.cities", (1000, 10000, 100000), api_get("/cities")),
+    Case("api.weather", (1000, 10000, 100000), api_get("/weather", {"city": "Москва", "days": 0})),
+    Case("api.weather_cached", (1000, 10000, 100000), api_get("/weather", {"city": "Москва", "days": 0}, cached=True)),
+    Case("api.data_availability", (1000, 10000, 100000), api_get("/data_availability", {"city": "Москва"})),
+    Case("api.forecast", (7, 30, 365), api_forecast, "дней"),
+    Case("api.scrape", (30, 365, 3650), api_scrape, "дней"),
+]
+
+def run_case(case: Case, size: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """Замер одного случая: после подготовки и прогрева - repeat повторов."""
+    timings = []
+    # Сообщения скрапера о ходе сбора не выводятся
+    with contextlib.redirect_stdout(open(os.devnull, "w")), case.prepare(size, seed) as (func, reset):
+        for attempt in range(repeat + 1):
+            if reset is not None:
+                reset()
+            started = time.perf_counter()
+            func()
+            # Первый вызов - прогрев (загрузка модели, подготовка запросов SQLite)
+            if attempt:
+                timings.append(time.perf_counter() - started)
+    return {
+        "name": case.name,
+        "size": size,
+        "unit": case.unit,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+    }
+
+def run(scale: str, repeat: int, seed: int, filters: List[str]) -> Dict[str, Any]:
+    """Прогон выбранных случаев; результаты печатаются по мере готовности."""
+    results = []
+    print(f"{'случай':<30} {'размер':>14} {'медиана, мс':>12} {'мин, мс':>10}")
+    for case in CASES:
+        if filters and not any(case.name.startswith(prefix) for prefix in filters):
+            continue
+        for size in case.sizes[:SCALES[scale]]:
+            result = run_case(case, size, repeat, seed)
+            results.append(result)
+            print(
+                f"{case.name:<30} {f'{size} {case.unit}':>14} "
+                f"{result['median'] * 1000:>12.2f} {result['min'] * 1000:>10.2f}",
+                flush=True,
+            )
+    return {
+        "meta": {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": scale,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Сравнение медиан двух прогонов по случаям, присутствующим в обоих.
+
+    Returns:
+        Строки сравнения; regression=True, если медиана выросла больше чем в (1 + threshold) раз
+    """
+    previous = {(item["name"], item["size"]): item for item in baseline["results"]}
+    rows = []
+    for item in current["results"]:
+        base = previous.get((item["name"], item["size"]))
+        if base is None:
+            continue
+        ratio = item["median"] / base["median"] if base["median"] else float("inf")
+        rows.append({
+            "name": item["name"],
+            "size": item["size"],
+            "baseline": base["median"],
+            "current": item["median"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float) -> int:
+    """Таблица сравнения; возвращает число регрессий."""
+    print(f"{'случай':<30} {'размер':>8} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    for row in rows:
+        flag = "  РЕГРЕССИЯ" if row["regression"] else ""
+        print(
+            f"{row['name']:<30} {row['size']:>8} {row['baseline'] * 1000:>10.2f} "
+            f"{row['current'] * 1000:>10.2f} {(row['ratio'] - 1) * 100:>+9.1f}%{flag}"
+        )
+    regressions = sum(row["regression"] for row in rows)
+    print(f"Регрессий (порог {threshold:.0%}): {regressions} из {len(rows)}")
+    return regressions
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Прогон бенчмарков")
+    run_parser.add_argument("--scale", choices=list(SCALES), default="small")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--filter", nargs="*", default=[], help="Префиксы названий случаев (db., api. ...)")
+    run_parser.add_argument("--output", help="Файл для результатов в JSON")
+    run_parser.add_argument("--baseline", help="Результаты для сравнения")
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="Сравнение двух прогонов")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        current = run(args.scale, args.repeat, args.seed, args.filter)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+        baseline = load(args.baseline) if args.baseline else None
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+
+    if baseline is not None:
+        print()
+        if print_comparison(compare(baseline, current, args.threshold), args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
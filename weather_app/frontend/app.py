@@ -1,14 +1,21 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import datetime
+import os
+import time
 import json
+import pyarrow as pa
 from typing import List, Dict, Any, Optional
 
-# URL бэкенда
-BACKEND_URL = "http://backend:8000"
+from backend_client import BACKEND_URL, LONG_READ_TIMEOUT, BackendClient, BackendError
+
+# Тип содержимого Apache Arrow IPC (поток) в ответах бэкенда
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Время жизни кэша ответов бэкенда, секунды (после сбора данных и обучения модели кэш сбрасывается сразу)
+CACHE_TTL = int(os.environ.get("FRONTEND_CACHE_TTL", "60"))
 
 # Настройка страницы
 st.set_page_config(
@@ -22,7 +29,7 @@ st.set_page_config(
 
 def plot_temperature(data):
     """Создание графика температуры."""
-    if not data:
+    if data is None or len(data) == 0:
         return None
     
     df = pd.DataFrame(data)
@@ -42,7 +49,7 @@ def plot_temperature(data):
 
 def plot_humidity(data):
     """Создание графика влажности."""
-    if not data:
+    if data is None or len(data) == 0:
         return None
     
     df = pd.DataFrame(data)
@@ -62,7 +69,7 @@ def plot_humidity(data):
 
 def plot_precipitation(data):
     """Создание графика осадков."""
-    if not data:
+    if data is None or len(data) == 0:
         return None
     
     df = pd.DataFrame(data)
@@ -83,7 +90,7 @@ def plot_precipitation(data):
 
 def plot_weather_conditions(data):
     """Создание графика состояний погоды."""
-    if not data:
+    if data is None or len(data) == 0:
         return None
     
     df = pd.DataFrame(data)
@@ -163,37 +170,26 @@ def plot_model_metrics(metrics):
 def plot_data_availability(city, start_date, end_date):
     """Создание графика доступности данных."""
     try:
-        response = requests.get(
-            f"{BACKEND_URL}/data_availability",
-            params={
-                "city": city,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            }
-        )
-        
-        if response.status_code != 200:
+        try:
+            data = fetch_data_availability(city, start_date, end_date)
+        except BackendError:
             return None
-            
-        data = response.json()
         
-        if not data or not data.get("existing_dates"):
+        if not data or not data.get("existing_ranges"):
             return None
         
         # Получаем все даты в промежутке
-        all_dates = []
-        current_date = start_date
-        while current_date <= end_date:
-            all_dates.append(current_date)
-            current_date += datetime.timedelta(days=1)
+        all_dates = pd.date_range(start_date, end_date, freq="D")
         
-        # Получаем даты, для которых есть данные
-        existing_dates = [datetime.datetime.fromisoformat(d).date() for d in data.get("existing_dates", [])]
+        # Отмечаем даты, попадающие в диапазоны с данными
+        available = pd.Series(0, index=all_dates)
+        for period in data["existing_ranges"]:
+            available[period["start"]:period["end"]] = 1
         
         # Создаем DataFrame
         df = pd.DataFrame({
-            'date': all_dates,
-            'available': [1 if d in existing_dates else 0 for d in all_dates]
+            'date': all_dates.date,
+            'available': available.values
         })
         
         # Создаем график
@@ -223,26 +219,80 @@ def plot_data_availability(city, start_date, end_date):
 
 # Функции для взаимодействия с API
 
+@st.cache_resource
+def get_backend_client() -> BackendClient:
+    """Клиент бэкенда с пулом соединений, общий для всех сессий и перезапусков страницы."""
+    return BackendClient(BACKEND_URL)
+
+# Ответы бэкенда кэшируются на CACHE_TTL секунд: при перезапуске страницы
+# (любом действии с виджетами) данные не запрашиваются заново. Ошибки
+# (исключения) не кэшируются.
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_cities() -> List[str]:
+    return get_backend_client().get_json("/cities")
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_weather_data(city: Optional[str], days: int) -> pd.DataFrame:
+    params = {"days": days}
+    if city:
+        params["city"] = city
+    # Таблица Arrow загружается в DataFrame по столбцам
+    content = get_backend_client().get_content("/weather", params, accept=ARROW_MEDIA_TYPE)
+    return pa.ipc.open_stream(content).read_pandas()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_forecast(city: str, days: int) -> List[Dict[str, Any]]:
+    return get_backend_client().get_json("/forecast", {"city": city, "days": days})
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_scraping_logs(city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    params = {"limit": limit}
+    if city:
+        params["city"] = city
+    return get_backend_client().get_json("/scraping_logs", params)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_data_availability(
+    city: str,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None
+) -> Dict[str, Any]:
+    params = {"city": city}
+    if start_date:
+        params["start_date"] = start_date.isoformat()
+    if end_date:
+        params["end_date"] = end_date.isoformat()
+    return get_backend_client().get_json("/data_availability", params)
+
+def invalidate_after_scrape():
+    """Сброс кэша после сбора данных: меняются список городов, данные, прогнозы и журнал."""
+    for fetch in (fetch_cities, fetch_weather_data, fetch_forecast, fetch_scraping_logs, fetch_data_availability):
+        fetch.clear()
+
+def invalidate_after_training():
+    """Сброс кэша прогнозов после обучения модели."""
+    fetch_forecast.clear()
+
 def get_cities():
     """Получение списка городов из API."""
     try:
-        response = requests.get(f"{BACKEND_URL}/cities")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при получении городов: {response.text}")
-            return []
+        return fetch_cities()
+    except BackendError as e:
+        st.error(f"Ошибка при получении городов: {e.message}")
+        return []
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return []
 
-def scrape_weather_data(city, start_date=None, end_date=None):
-    """Запуск скрапинга данных о погоде."""
+def scrape_weather_data(city, start_date=None, end_date=None, incremental=True, refresh_days=0):
+    """Запуск скрапинга данных о погоде (по умолчанию собираются только недостающие даты)."""
     try:
-        url = f"{BACKEND_URL}/scrape"
         params = {
             "city": city,
-            "disable_limit": True
+            "disable_limit": True,
+            "incremental": incremental,
+            "refresh_days": refresh_days
         }
         
         if start_date:
@@ -250,43 +300,55 @@ def scrape_weather_data(city, start_date=None, end_date=None):
         if end_date:
             params["end_date"] = end_date.isoformat()
             
-        response = requests.post(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при скрапинге данных: {response.text}")
-            return None
+        return get_backend_client().post_json("/scrape", params, read_timeout=LONG_READ_TIMEOUT)
+    except BackendError as e:
+        st.error(f"Ошибка при скрапинге данных: {e.message}")
+        return None
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return None
+    finally:
+        # Журнал сбора меняется и при ошибке
+        invalidate_after_scrape()
 
-def get_weather_data(city: Optional[str] = None, days: int = 7):
+def get_weather_data(city: Optional[str] = None, days: int = 7) -> pd.DataFrame:
     """Получение данных о погоде из API."""
     try:
-        url = f"{BACKEND_URL}/weather"
-        params = {"days": days}
-        if city:
-            params["city"] = city
-        
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при получении данных о погоде: {response.text}")
-            return []
+        return fetch_weather_data(city, days)
+    except BackendError as e:
+        st.error(f"Ошибка при получении данных о погоде: {e.message}")
+        return pd.DataFrame()
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
-        return []
+        return pd.DataFrame()
 
-def train_model(city):
-    """Обучение модели для прогнозирования погоды."""
+def train_model(city, timeout=300, poll_interval=1.0):
+    """Обучение модели для прогнозирования погоды (ожидание фоновой задачи)."""
+    client = get_backend_client()
     try:
-        response = requests.post(f"{BACKEND_URL}/train_model?city={city}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при обучении модели: {response.text}")
+        try:
+            job = client.post_json("/train_model", {"city": city}, expected=(200, 202))
+        except BackendError as e:
+            st.error(f"Ошибка при обучении модели: {e.message}")
             return None
+        
+        deadline = time.time() + timeout
+        while job["status"] in ("queued", "running"):
+            if time.time() > deadline:
+                st.error("Обучение модели не завершилось за отведённое время")
+                return None
+            time.sleep(poll_interval)
+            try:
+                job = client.get_json(f"/jobs/{job['id']}")
+            except BackendError as e:
+                st.error(f"Ошибка при получении статуса обучения: {e.message}")
+                return None
+        
+        if job["status"] != "succeeded":
+            st.error(f"Ошибка при обучении модели: {job.get('error')}")
+            return None
+        invalidate_after_training()
+        return {"success": True, "city": job["city"], "metrics": job["metrics"]}
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return None
@@ -294,12 +356,10 @@ def train_model(city):
 def get_forecast(city, days=5):
     """Получение прогноза погоды."""
     try:
-        response = requests.get(f"{BACKEND_URL}/forecast?city={city}&days={days}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при получении прогноза: {response.text}")
-            return []
+        return fetch_forecast(city, days)
+    except BackendError as e:
+        st.error(f"Ошибка при получении прогноза: {e.message}")
+        return []
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return []
@@ -307,17 +367,10 @@ def get_forecast(city, days=5):
 def get_scraping_logs(city=None, limit=10):
     """Получение логов скрапинга."""
     try:
-        url = f"{BACKEND_URL}/scraping_logs"
-        params = {"limit": limit}
-        if city:
-            params["city"] = city
-            
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при получении логов скрапинга: {response.text}")
-            return []
+        return fetch_scraping_logs(city, limit)
+    except BackendError as e:
+        st.error(f"Ошибка при получении логов скрапинга: {e.message}")
+        return []
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return []
@@ -325,12 +378,10 @@ def get_scraping_logs(city=None, limit=10):
 def get_data_availability(city):
     """Получение информации о доступности данных."""
     try:
-        response = requests.get(f"{BACKEND_URL}/data_availability?city={city}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Ошибка при получении информации о доступности данных: {response.text}")
-            return {"available": False}
+        return fetch_data_availability(city)
+    except BackendError as e:
+        st.error(f"Ошибка при получении информации о доступности данных: {e.message}")
+        return {"available": False}
     except Exception as e:
         st.error(f"Ошибка соединения с сервером: {str(e)}")
         return {"available": False}
@@ -397,6 +448,12 @@ def main():
                 max_value=datetime.date.today()
             )
         
+        incremental = st.checkbox("Собирать только недостающие даты", value=True)
+        refresh_days = st.number_input(
+            "Обновить последние дни периода", min_value=0, max_value=30, value=1,
+            disabled=not incremental
+        )
+        
         scrape_button = st.button("Собрать данные о погоде")
         
         if scrape_button:
@@ -416,10 +473,13 @@ def main():
                         st.info("Для больших периодов данные собираются порциями. Пожалуйста, не закрывайте страницу до завершения процесса.")
                     
                     # Передаем параметр disable_limit=True на бэкенд
-                    result = scrape_weather_data(city_input, start_date, end_date)
+                    result = scrape_weather_data(city_input, start_date, end_date, incremental, int(refresh_days))
                     
                     if result and result.get("success"):
-                        st.success(f"Успешно собрано {result.get('data_points')} записей для города {result.get('city')}")
+                        st.success(
+                            f"Успешно собрано {result.get('data_points')} записей для города {result.get('city')} "
+                            f"(пропущено {result.get('skipped', 0)}, обновлено {result.get('updated', 0)})"
+                        )
                     elif result:
                         st.warning(f"Сбор данных завершен с предупреждениями: {result.get('message', 'Неизвестная ошибка')}")
                     else:
@@ -474,9 +534,9 @@ def main():
             # Получение данных
             weather_data = get_weather_data(selected_city, days_to_show)
             
-            if weather_data:
+            if not weather_data.empty:
                 # Создаем DataFrame для отображения в таблице
-                df = pd.DataFrame(weather_data)
+                df = weather_data.copy()
                 df['date'] = pd.to_datetime(df['date']).dt.date
                 df = df.sort_values('date', ascending=False)
                 
@@ -811,6 +871,13 @@ def main():
         - Scikit-learn для создания модели прогнозирования
         - Beautiful Soup для скрапинга данных о погоде
         """)
+    
+    # Обращения к бэкенду за всё время работы: при перезапуске страницы данные берутся из кэша
+    client_stats = get_backend_client().stats()
+    st.sidebar.caption(
+        f"Запросов к бэкенду: {client_stats['requests']} "
+        f"(без изменений, 304: {client_stats['not_modified']})"
+    )
 
 if __name__ == "__main__":
     main()
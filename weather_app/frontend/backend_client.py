@@ -0,0 +1,165 @@
+"""
+Клиент API бэкенда для фронтенда Streamlit.
+
+Один requests.Session с пулом соединений (в app.py создаётся через
+st.cache_resource и живёт между перезапусками страницы), у каждого запроса
+есть таймауты. GET-запросы при ответах 502-504 повторяются. Тела ответов с
+ETag запоминаются: повторный запрос уходит с If-None-Match, и при ответе 304
+бэкенд не строит и не передаёт тело заново.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# URL бэкенда
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://backend:8000")
+
+# Параметры клиента по умолчанию
+POOL_SIZE = 10
+CONNECT_TIMEOUT = 3.05  # секунды
+READ_TIMEOUT = 30.0
+# Сбор данных за большой период идёт в самом запросе
+LONG_READ_TIMEOUT = 600.0
+RETRIES = 2
+BACKOFF_FACTOR = 0.3
+
+# Сколько ответов с ETag хранить для условных запросов
+ETAG_CACHE_SIZE = 128
+
+class BackendError(Exception):
+    """Бэкенд ответил ошибкой."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class BackendClient:
+    """Пул соединений с бэкендом, таймауты и условные GET-запросы по ETag."""
+
+    def __init__(
+        self,
+        base_url: str = BACKEND_URL,
+        pool_size: int = POOL_SIZE,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        retries: int = RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        etag_cache_size: int = ETAG_CACHE_SIZE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # Повторяются только GET: POST запускает сбор данных или обучение
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.etag_cache_size = etag_cache_size
+        self._etags: "OrderedDict[Tuple, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "not_modified": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        read_timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """Запрос к бэкенду через общий пул соединений."""
+        self._count("requests")
+        timeout = self.timeout if read_timeout is None else (self.connect_timeout, read_timeout)
+        try:
+            return self.session.request(method, self.base_url + path, params=params, headers=headers, timeout=timeout)
+        except requests.RequestException:
+            self._count("errors")
+            raise
+
+    def _raise_for_status(self, response: requests.Response, expected: Tuple[int, ...] = (200,)) -> None:
+        if response.status_code not in expected:
+            self._count("errors")
+            raise BackendError(response.status_code, response.text)
+
+    def get_content(self, path: str, params: Optional[Dict[str, Any]] = None, accept: str = "application/json") -> bytes:
+        """
+        Тело ответа GET-запроса.
+
+        Если для запроса сохранён ETag, отправляется If-None-Match, и при
+        ответе 304 возвращается сохранённое тело.
+
+        Raises:
+            BackendError: если бэкенд ответил ошибкой
+        """
+        key = (path, tuple(sorted((params or {}).items())), accept)
+        headers = {"Accept": accept}
+        with self._lock:
+            cached = self._etags.get(key)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = self.request("GET", path, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self._count("not_modified")
+            with self._lock:
+                if key in self._etags:
+                    self._etags.move_to_end(key)
+            return cached[1]
+        self._raise_for_status(response)
+
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._lock:
+                self._etags[key] = (etag, response.content)
+                self._etags.move_to_end(key)
+                while len(self._etags) > self.etag_cache_size:
+                    self._etags.popitem(last=False)
+        return response.content
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Разобранный JSON-ответ GET-запроса (с условным запросом по ETag)."""
+        return json.loads(self.get_content(path, params))
+
+    def post_json(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        expected: Tuple[int, ...] = (200,),
+        read_timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        POST-запрос с разбором JSON-ответа.
+
+        Raises:
+            BackendError: если статус ответа не входит в expected
+        """
+        response = self.request("POST", path, params=params, read_timeout=read_timeout)
+        self._raise_for_status(response, expected)
+        return response.json()
+
+    def stats(self) -> Dict[str, int]:
+        """Число запросов к бэкенду, ответов 304 и ошибок с момента создания клиента."""
+        with self._lock:
+            return {**self._stats, "etags": len(self._etags)}
+
+    def close(self) -> None:
+        self.session.close()
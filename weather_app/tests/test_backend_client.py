@@ -0,0 +1,56 @@
+import unittest
+import datetime
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend')))
+
+from backend_client import BackendClient, BackendError
+from backend.app import database
+from backend.app.models import WeatherData
+from benchmarks import load
+from benchmarks.fake_openweather import FakeOpenWeather
+
+class TestBackendClient(unittest.TestCase):
+
+    def setUp(self):
+        """Бэкенд с временной БД на свободном порту и клиент фронтенда"""
+        self.stack = contextlib.ExitStack()
+        upstream = self.stack.enter_context(FakeOpenWeather())
+        base_url = self.stack.enter_context(load.embedded_backend([], upstream))
+        database.save_weather_data([
+            WeatherData(city="Москва", date=datetime.date.today(), temperature=15.0, humidity=60.0,
+                        pressure=1013.0, wind_speed=3.0, precipitation=0.0, weather_condition="Ясно")
+        ])
+        self.client = BackendClient(base_url, retries=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.stack.close()
+
+    def test_conditional_get(self):
+        """Тест повторного запроса с If-None-Match: ответ 304 и сохранённое тело"""
+        self.assertEqual(self.client.get_json("/cities"), ["Москва"])
+        self.assertEqual(self.client.get_json("/cities"), ["Москва"])
+        self.assertEqual(self.client.stats()["not_modified"], 1)
+
+        # После сбора данных ответ бэкенда меняется
+        result = self.client.post_json("/scrape", {"city": "Тверь"})
+        self.assertTrue(result["success"])
+        self.assertEqual(self.client.get_json("/cities"), ["Москва", "Тверь"])
+
+        stats = self.client.stats()
+        self.assertEqual((stats["requests"], stats["not_modified"], stats["errors"]), (4, 1, 0))
+
+    def test_errors(self):
+        """Тест ошибки бэкенда: исключение со статусом и текстом ответа"""
+        with self.assertRaises(BackendError) as context:
+            self.client.get_json("/forecast", {"city": "Тверь"})
+        self.assertEqual(context.exception.status, 400)
+        self.assertIn("Недостаточно данных", context.exception.message)
+        self.assertEqual(self.client.stats()["errors"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
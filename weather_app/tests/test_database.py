@@ -0,0 +1,320 @@
+import unittest
+import datetime
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, serialization, validation
+from backend.app.models import WeatherData
+
+class TestDatabase(unittest.TestCase):
+    
+    def setUp(self):
+        """Настройка временной БД для каждого теста"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        
+        self.test_city = "Москва"
+        self.today = datetime.date.today()
+        self.test_data = [
+            WeatherData(
+                city=self.test_city,
+                date=self.today - datetime.timedelta(days=i),
+                temperature=15.0 + i,
+                humidity=60.0,
+                pressure=1013.0,
+                wind_speed=3.0,
+                precipitation=0.0,
+                weather_condition="Ясно"
+            )
+            for i in range(5)
+        ]
+    
+    def tearDown(self):
+        """Закрытие пула и удаление временной БД"""
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+    
+    def test_save_and_get_weather_data(self):
+        """Тест сохранения и чтения данных через пул соединений"""
+        database.save_weather_data(self.test_data)
+        
+        result = database.get_weather_data(self.test_city, 30)
+        
+        self.assertEqual(len(result), 5)
+        self.assertEqual(result[0].date, self.today)
+        self.assertEqual(database.get_all_cities(), [self.test_city])
+    
+    def test_weather_records_match_models(self):
+        """Тест записей без WeatherData: сохраняются и сериализуются так же, как модели"""
+        records = validation.validate_weather_batch(
+            [item.model_dump() for item in self.test_data]
+        ).records
+        self.assertEqual(database.upsert_weather_data(records)["inserted"], 5)
+        
+        read = database.get_weather_records(self.test_city, 30)
+        self.assertIsInstance(read[0], dict)
+        self.assertEqual(serialization.encode_json(read),
+                         serialization.encode_json(database.get_weather_data(self.test_city, 30)))
+        self.assertEqual(read[0]["date"], self.today)
+    
+    def test_get_weather_columns(self):
+        """Тест чтения данных по столбцам в структурированный массив"""
+        database.save_weather_data(self.test_data)
+        
+        columns = database.get_weather_columns(self.test_city, 30)
+        rows = database.get_weather_data(self.test_city, 30)
+        
+        self.assertEqual(columns.dtype, database.WEATHER_COLUMNS_DTYPE)
+        self.assertEqual(len(columns), len(rows))
+        self.assertEqual(columns['date'].tolist(), [row.date for row in rows])
+        self.assertEqual(columns['temperature'].tolist(), [row.temperature for row in rows])
+        self.assertEqual(columns['weather_condition'].tolist(), [row.weather_condition for row in rows])
+        self.assertEqual(len(database.get_weather_columns("Неизвестный город", 30)), 0)
+    
+    def make_item(self, day, city=None):
+        return WeatherData(
+            city=city or self.test_city,
+            date=datetime.date(2024, 1, 1) + datetime.timedelta(days=day),
+            temperature=15.0,
+            humidity=60.0,
+            pressure=1013.0,
+            wind_speed=3.0,
+            precipitation=0.0,
+            weather_condition="Ясно"
+        )
+    
+    def test_coverage_ranges_maintained_on_insert(self):
+        """Тест объединения диапазонов покрытия при вставке"""
+        day = lambda offset: datetime.date(2024, 1, 1) + datetime.timedelta(days=offset)
+        database.save_weather_data([self.make_item(i) for i in (0, 1, 2, 5, 6, 10)])
+        self.assertEqual(database.get_coverage(self.test_city),
+                         [(day(0), day(2)), (day(5), day(6)), (day(10), day(10))])
+        
+        # Соседняя дата и заполнение разрыва объединяют диапазоны
+        database.save_weather_data([self.make_item(3), self.make_item(4), self.make_item(11)])
+        self.assertEqual(database.get_coverage(self.test_city), [(day(0), day(6)), (day(10), day(11))])
+        
+        # Обновление существующих дат покрытие не меняет, другой город не затрагивается
+        database.save_weather_data([self.make_item(0), self.make_item(0, city="Сочи")])
+        self.assertEqual(database.get_coverage(self.test_city), [(day(0), day(6)), (day(10), day(11))])
+        self.assertEqual(database.get_coverage("Сочи"), [(day(0), day(0))])
+        
+        self.assertEqual(database.get_missing_ranges(self.test_city, day(-2), day(12)),
+                         [(day(-2), day(-1)), (day(7), day(9)), (day(12), day(12))])
+        self.assertEqual(database.get_missing_dates(self.test_city, day(5), day(10)), [day(7), day(8), day(9)])
+        self.assertEqual(database.get_coverage(self.test_city, day(3), day(10)), [(day(3), day(6)), (day(10), day(10))])
+        
+        availability = database.get_data_availability(self.test_city)
+        self.assertEqual(availability["count"], 9)
+        self.assertEqual((availability["min_date"], availability["max_date"]), (day(0), day(11)))
+    
+    def test_coverage_merged_for_batch_overlapping_ranges(self):
+        """Тест покрытия при пакете из обновлённых и новых дат, перекрывающем несколько диапазонов"""
+        day = lambda offset: datetime.date(2024, 1, 1) + datetime.timedelta(days=offset)
+        database.save_weather_data([self.make_item(i) for i in (0, 1, 2, 5, 6, 10, 20)])
+
+        result = database.upsert_weather_data([self.make_item(i) for i in (1, 2, 3, 4, 5, 6, 7, 8, 9, 15)])
+
+        self.assertEqual((result["inserted"], result["updated"]), (6, 4))
+        self.assertEqual(database.get_coverage(self.test_city),
+                         [(day(0), day(10)), (day(15), day(15)), (day(20), day(20))])
+
+    def test_coverage_built_for_existing_data(self):
+        """Тест заполнения покрытия по уже собранным данным при инициализации"""
+        database.save_weather_data([self.make_item(i) for i in (0, 1, 3, 40)])
+        with database.db_connection() as conn:
+            conn.execute("DELETE FROM weather_coverage")
+            conn.commit()
+        
+        database.init_db()
+        
+        self.assertEqual(len(database.get_coverage(self.test_city)), 3)
+        self.assertEqual(database.get_data_availability(self.test_city)["count"], 4)
+    
+    def test_query_weather_data_keyset_pages(self):
+        """Тест выборки за период по нескольким городам постранично по ключу (город, дата)"""
+        database.save_weather_data([self.make_item(i, city) for city in ("Сочи", "Казань", "Тверь") for i in range(10)])
+        start, end = datetime.date(2024, 1, 3), datetime.date(2024, 1, 8)
+        
+        pages, after = [], None
+        while True:
+            rows, after = database.query_weather_data(["Тверь", "Казань"], start, end, ["date", "city"], 4, after)
+            pages.append(rows)
+            if after is None:
+                break
+        
+        self.assertEqual([len(page) for page in pages], [4, 4, 4])
+        rows = [row for page in pages for row in page]
+        self.assertEqual(list(rows[0]), ["date", "city"])
+        self.assertEqual([(row["city"], row["date"]) for row in rows],
+                         [(city, (start + datetime.timedelta(days=i)).isoformat()) for city in ("Казань", "Тверь") for i in range(6)])
+        
+        # Без фильтра по городам - все города, без limit - одна страница
+        rows, after = database.query_weather_data(start_date=datetime.date(2024, 1, 10))
+        self.assertEqual([row["city"] for row in rows], ["Казань", "Сочи", "Тверь"])
+        self.assertIsNone(after)
+        with self.assertRaises(ValueError):
+            database.query_weather_data(fields=["date", "unknown"])
+    
+    def test_query_weather_data_uses_index_range(self):
+        """Тест: страница читается поиском по индексу (city, date), а не просмотром таблицы"""
+        sql, params = database._weather_range_sql(["date"], datetime.date(2024, 1, 1), datetime.date(2024, 2, 1), "2024-01-15")
+        with database.db_connection() as conn:
+            plan = " ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", ["Москва", *params, 10]))
+        
+        self.assertIn("SEARCH weather_data USING", plan)
+        self.assertIn("(city=? AND date>? AND date<?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_upsert_weather_data_counts(self):
+        """Тест подсчёта добавленных и обновлённых записей при массовой вставке"""
+        result = database.upsert_weather_data(self.test_data, chunk_size=2)
+        
+        self.assertEqual(result["inserted"], 5)
+        self.assertEqual(result["updated"], 0)
+        
+        ids_before = {row.date: row.id for row in database.get_weather_data(self.test_city, 30)}
+        
+        # Повторная вставка тех же дат плюс одна новая
+        updated_data = [item.model_copy(update={"temperature": 30.0}) for item in self.test_data]
+        updated_data.append(self.test_data[0].model_copy(
+            update={"date": self.today - datetime.timedelta(days=10)}
+        ))
+        result = database.upsert_weather_data(updated_data, chunk_size=4)
+        
+        self.assertEqual(result["inserted"], 1)
+        self.assertEqual(result["updated"], 5)
+        
+        rows = database.get_weather_data(self.test_city, 30)
+        self.assertEqual(len(rows), 6)
+        
+        # Обновление выполняется на месте: id существующих строк не меняются
+        for row in rows:
+            if row.date in ids_before:
+                self.assertEqual(row.id, ids_before[row.date])
+                self.assertEqual(row.temperature, 30.0)
+    
+    def test_upsert_weather_data_duplicates_in_batch(self):
+        """Тест повторяющихся ключей внутри одного вызова"""
+        duplicated = self.test_data + [self.test_data[0].model_copy(update={"temperature": -5.0})]
+        
+        result = database.upsert_weather_data(duplicated)
+        
+        # Повтор ключа внутри пакета сохраняется один раз и не считается обновлением
+        self.assertEqual(result["inserted"], 5)
+        self.assertEqual(result["updated"], 0)
+        latest = database.get_weather_data(self.test_city, 30)[0]
+        self.assertEqual(latest.temperature, -5.0)
+        self.assertEqual(result["last_id"], latest.id)
+        
+        result = database.upsert_weather_data([self.test_data[0], self.test_data[0]])
+        self.assertEqual((result["inserted"], result["updated"]), (0, 1))
+    
+    def test_pool_reuses_connections(self):
+        """Тест повторного использования соединений из пула"""
+        database.save_weather_data(self.test_data)
+        database.get_weather_data(self.test_city, 30)
+        database.get_all_cities()
+        
+        stats = database.get_pool_stats()
+        
+        # Все вызовы выполнялись последовательно - хватает одного соединения
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertGreaterEqual(stats["hits"], 3)
+        self.assertEqual(stats["in_use"], 0)
+    
+    def test_pragmas_applied(self):
+        """Тест настройки WAL и других PRAGMA для соединений пула"""
+        with database.db_connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()["journal_mode"]
+            synchronous = conn.execute("PRAGMA synchronous").fetchone()["synchronous"]
+        
+        self.assertEqual(journal_mode.lower(), "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+    
+    def test_pool_waits_when_exhausted(self):
+        """Тест ожидания свободного соединения при исчерпании пула"""
+        pool = database.ConnectionPool(database.DATABASE_PATH, size=1, timeout=5)
+        conn = pool.acquire()
+        
+        def release_later():
+            time.sleep(0.1)
+            pool.release(conn)
+        
+        thread = threading.Thread(target=release_later)
+        thread.start()
+        with pool.connection() as same_conn:
+            self.assertIs(same_conn, conn)
+        thread.join()
+        
+        stats = pool.stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["wait_time_total"], 0.0)
+        pool.close()
+    
+    def test_pool_timeout(self):
+        """Тест ошибки при превышении времени ожидания соединения"""
+        pool = database.ConnectionPool(database.DATABASE_PATH, size=1, timeout=0.05)
+        conn = pool.acquire()
+        
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        pool.release(conn)
+        pool.close()
+    
+    def test_release_after_close_closes_connection(self):
+        """Тест: соединение, возвращаемое во время закрытия пула, закрывается, а не остаётся в очереди"""
+        class SlowQueue(queue.LifoQueue):
+            def put(self, item, *args, **kwargs):
+                # Возврат в очередь растянут, чтобы close() выполнялся посреди него
+                time.sleep(0.05)
+                super().put(item, *args, **kwargs)
+        
+        pool = database.ConnectionPool(database.DATABASE_PATH, size=1, timeout=1)
+        pool._idle = SlowQueue()
+        conn = pool.acquire()
+        
+        thread = threading.Thread(target=pool.release, args=(conn,))
+        thread.start()
+        time.sleep(0.01)
+        pool.close()
+        thread.join()
+        
+        self.assertEqual(pool.stats()["idle"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        
+        # Возврат после закрытия сразу закрывает соединение
+        other = database.ConnectionPool(database.DATABASE_PATH, size=1)
+        late = other.acquire()
+        other.close()
+        other.release(late)
+        self.assertEqual(other.stats()["idle"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            late.execute("SELECT 1")
+    
+    def test_uncommitted_transaction_rolled_back_on_release(self):
+        """Тест отката незавершённой транзакции при возврате соединения"""
+        with database.db_connection() as conn:
+            conn.execute(
+                "INSERT INTO scraping_logs (city, start_date, end_date, status) VALUES (?, ?, ?, ?)",
+                (self.test_city, self.today, self.today, "pending")
+            )
+        
+        self.assertEqual(database.get_scraping_logs(self.test_city), [])
+
+if __name__ == '__main__':
+    unittest.main()
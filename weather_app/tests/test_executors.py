@@ -0,0 +1,176 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+from backend.app import database, executors, response_cache, scraper
+from backend.app.api import app
+from backend.app.models import WeatherData
+
+class TestBoundedExecutor(unittest.TestCase):
+
+    def test_queue_limit_and_stats(self):
+        """Тест ограничения очереди пула и счётчиков глубины очереди"""
+        pool = executors.BoundedExecutor("test", max_workers=1, max_queue=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocked():
+            started.set()
+            release.wait(5)
+            return "готово"
+
+        try:
+            first = pool.submit(blocked)
+            started.wait(5)
+            second = pool.submit(lambda: 42)
+            with self.assertRaises(executors.PoolBusyError):
+                pool.submit(lambda: 0)
+
+            stats = pool.stats()
+            self.assertEqual((stats["running"], stats["queued"], stats["rejected"]), (1, 1, 1))
+
+            release.set()
+            self.assertEqual(first.result(5), "готово")
+            self.assertEqual(second.result(5), 42)
+            stats = pool.stats()
+            self.assertEqual((stats["running"], stats["queued"], stats["completed"]), (0, 0, 2))
+            self.assertGreater(stats["wait_time_max"], 0)
+        finally:
+            release.set()
+            pool.shutdown()
+
+    def test_run_failure_and_reuse_after_shutdown(self):
+        """Тест: ошибка вызова передаётся вызывающему, пул работает после shutdown"""
+        pool = executors.BoundedExecutor("test", max_workers=2, max_queue=4)
+
+        def fail():
+            raise ValueError("ошибка")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(pool.run(fail))
+        pool.shutdown()
+        self.assertEqual(asyncio.run(pool.run(sum, [1, 2, 3])), 6)
+        self.assertEqual((pool.stats()["failed"], pool.stats()["completed"]), (1, 1))
+        pool.shutdown()
+
+class TestEventLoopNotBlocked(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД и пустой кэш ответов"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        response_cache.response_cache.clear()
+
+    def tearDown(self):
+        response_cache.response_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def test_cities_latency_flat_during_scrape(self):
+        """Тест: задержка /cities не растёт, пока идёт сбор данных за 365 дней"""
+        generate = scraper.generate_weather_data
+
+        def slow_generate(city, date):
+            # Блокирующая работа на каждый день (как синхронный запрос к источнику)
+            time.sleep(0.004)
+            return generate(city, date)
+
+        async def timed(client):
+            started = time.perf_counter()
+            response = await client.get("/cities")
+            self.assertEqual(response.status_code, 200)
+            return time.perf_counter() - started
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                baseline = [await timed(client) for _ in range(5)]
+                end = datetime.date.today() - datetime.timedelta(days=1)
+                scrape = asyncio.create_task(client.post("/scrape", params={
+                    "city": "Москва",
+                    "start_date": (end - datetime.timedelta(days=364)).isoformat(),
+                    "end_date": end.isoformat(),
+                }, timeout=60))
+                during = []
+                while not scrape.done():
+                    during.append(await timed(client))
+                    await asyncio.sleep(0.01)
+                return baseline, during, await scrape
+
+        with patch("backend.app.scraper.generate_weather_data", side_effect=slow_generate):
+            baseline, during, response = asyncio.run(scenario())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data_points"], 365)
+        # Сбор длится больше секунды: за это время /cities отвечает много раз и быстро
+        self.assertGreaterEqual(len(during), 20)
+        self.assertLess(statistics.median(during), statistics.median(baseline) + 0.05)
+        self.assertLess(max(during), 0.5)
+        self.assertGreater(executors.io_pool.stats()["completed"], 0)
+
+    def test_cities_latency_flat_during_forecasts(self):
+        """Тест: задержка /cities не растёт, пока пул вычислений занят прогнозами"""
+        today = datetime.date.today()
+        database.save_weather_data([
+            WeatherData(city="Москва", date=today - datetime.timedelta(days=i), temperature=10.0,
+                        humidity=60.0, pressure=1013.0, wind_speed=3.0, precipitation=0.0,
+                        weather_condition="Ясно")
+            for i in range(10)
+        ])
+
+        def slow_forecast(data, days, feature_store=None):
+            # Чистый Python держит GIL, как и построение признаков и прогноз модели
+            deadline = time.perf_counter() + 0.03
+            while time.perf_counter() < deadline:
+                sum(range(1000))
+            return []
+
+        async def timed(client):
+            # Без кэша ответов /cities читает БД в пуле ввода-вывода
+            response_cache.response_cache.clear()
+            started = time.perf_counter()
+            response = await client.get("/cities")
+            self.assertEqual(response.status_code, 200)
+            return time.perf_counter() - started
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                baseline = [await timed(client) for _ in range(10)]
+                # Разные days - разные ключи кэша ответов: каждый прогноз считается заново
+                forecasts = asyncio.gather(*(
+                    client.get("/forecast", params={"city": "Москва", "days": days}, timeout=60)
+                    for days in range(1, 41)
+                ))
+                forecasts = asyncio.ensure_future(forecasts)
+                during = []
+                while not forecasts.done():
+                    during.append(await timed(client))
+                    await asyncio.sleep(0.01)
+                return baseline, during, await forecasts
+
+        with patch("backend.app.ml_model.make_forecast", side_effect=slow_forecast):
+            baseline, during, responses = asyncio.run(scenario())
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        # 40 прогнозов по 30 мс занимают пул вычислений больше секунды
+        self.assertGreaterEqual(len(during), 20)
+        self.assertLess(statistics.median(during), statistics.median(baseline) + 0.05)
+        self.assertLess(max(during), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
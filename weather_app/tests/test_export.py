@@ -0,0 +1,168 @@
+import unittest
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from backend.app import api, database
+from backend.app.api import app
+from backend.app.models import WeatherData
+
+# Синтетическая таблица: city_i, дни подряд от 2000-01-01
+_FILL_SQL = '''
+WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+INSERT INTO weather_data
+(city, date, temperature, humidity, pressure, wind_speed, precipitation, weather_condition)
+SELECT 'city_' || (i % 100), date('2000-01-01', '+' || (i / 100) || ' days'),
+       (i % 60) - 20.5, i % 100, 1000 + i % 40, i % 20, (i % 7) * 0.5, 'Ясно'
+FROM n
+'''
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД для каждого теста"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def fill(self, n_rows):
+        with database.db_connection() as conn:
+            conn.execute(_FILL_SQL, (n_rows,))
+            conn.commit()
+
+    def test_iter_weather_data_batches(self):
+        """Тест чтения пакетами по batch_size строк в порядке (город, дата)"""
+        self.fill(250)
+        batches = list(database.iter_weather_data(batch_size=100))
+
+        self.assertEqual([len(batch) for batch in batches], [100, 100, 50])
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row[1], row[2])))
+        self.assertEqual(len(list(database.iter_weather_data("city_7"))), 1)
+        # Соединение возвращается в пул и при досрочном закрытии генератора
+        database.iter_weather_data().__next__()
+        self.assertEqual(database.get_pool_stats()["in_use"], 0)
+
+    def test_export_endpoint(self):
+        """Тест выгрузки в NDJSON и CSV через API"""
+        today = datetime.date.today()
+        database.save_weather_data([
+            WeatherData(city=city, date=today - datetime.timedelta(days=i), temperature=10.0 + i,
+                        humidity=60.0, pressure=1013.0, wind_speed=3.0, precipitation=0.0,
+                        weather_condition="Ясно")
+            for city in ("Москва", "Сочи") for i in range(3)
+        ])
+
+        response = self.client.get("/export/weather", params={"city": "Москва"})
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["date"] for line in lines],
+                         [(today - datetime.timedelta(days=i)).isoformat() for i in (2, 1, 0)])
+        self.assertEqual(WeatherData(**lines[0]).temperature, 12.0)
+
+        response = self.client.get("/export/weather", params={"format": "csv", "days": 1})
+        self.assertTrue(response.headers["content-type"].startswith("text/csv"))
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        self.assertEqual([(row["city"], row["temperature"]) for row in rows],
+                         [("Москва", "11.0"), ("Москва", "10.0"), ("Сочи", "11.0"), ("Сочи", "10.0")])
+
+        empty = self.client.get("/export/weather", params={"city": "Тверь", "format": "csv"})
+        self.assertEqual(empty.text, ",".join(database.EXPORT_COLUMNS) + "\n")
+        self.assertEqual(self.client.get("/export/weather", params={"format": "xml"}).status_code, 422)
+
+    def test_export_released_when_client_disconnects(self):
+        """Тест: обрыв соединения клиентом посреди выгрузки закрывает соединение выгрузки"""
+        self.fill(5000)
+        chunks = []
+
+        async def run_export():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                # Клиент уходит после первого пакета строк
+                if message["type"] == "http.response.body" and message.get("body"):
+                    chunks.append(message["body"])
+                    disconnected.set()
+
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": "/export/weather", "raw_path": b"/export/weather",
+                "root_path": "", "query_string": b"", "headers": [],
+                "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+            }
+            await app(scope, receive, send)
+
+        asyncio.run(run_export())
+
+        self.assertLess(len(chunks), 5)
+        self.assertEqual(database.get_export_stats()["active"], 0)
+        self.assertEqual(database.get_pool_stats()["in_use"], 0)
+        # Место освободилось: новая выгрузка открывается сразу
+        self.assertEqual(sum(len(batch) for batch in database.iter_weather_data()), 5000)
+
+    def test_export_limit(self):
+        """Тест: выгрузок не больше EXPORT_MAX_STREAMS, лишняя получает 503"""
+        self.fill(10)
+        exports = [database.WeatherExport() for _ in range(database.EXPORT_MAX_STREAMS)]
+        try:
+            with self.assertRaises(TimeoutError):
+                database.WeatherExport(timeout=0.01)
+            with patch.object(api, "EXPORT_SLOT_TIMEOUT", 0.01):
+                self.assertEqual(self.client.get("/export/weather").status_code, 503)
+        finally:
+            for weather_export in exports:
+                weather_export.close()
+
+        self.assertEqual(database.get_export_stats()["active"], 0)
+        self.assertEqual(self.client.get("/export/weather").status_code, 200)
+
+    def test_export_memory_flat_on_million_rows(self):
+        """Тест: пиковая память процесса не растёт при выгрузке миллиона строк"""
+        self.fill(1_000_000)
+        database.close_pool()
+
+        # Выгрузка в отдельном процессе: ru_maxrss - пик памяти всего процесса (КБ)
+        code = (
+            "import resource, sys\n"
+            "from backend.app import database, export\n"
+            "database.DATABASE_PATH = sys.argv[1]\n"
+            "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            "total = sum(len(chunk) for chunk in export.csv_chunks(database.iter_weather_data()))\n"
+            "print(total, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code, database.DATABASE_PATH],
+            cwd=os.path.join(os.path.dirname(__file__), '..'),
+            capture_output=True, text=True, check=True
+        )
+        total_bytes, peak_growth_kb = map(int, result.stdout.split())
+
+        # Выгрузка - около 80 МБ, а в памяти одновременно только один пакет строк
+        # (для сравнения: весь результат в памяти занимает сотни мегабайт)
+        self.assertGreater(total_bytes, 75 * 1024 * 1024)
+        self.assertLess(peak_growth_kb, 32 * 1024)
+
+if __name__ == '__main__':
+    unittest.main()
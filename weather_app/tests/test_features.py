@@ -0,0 +1,165 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, features
+from backend.app.models import WeatherData
+
+class TestBuildFeatures(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.values = rng.uniform(0, 1, (60, 5)) * [30, 100, 1000, 10, 5] + [0, 0, 500, 0, 0]
+        self.names = features.feature_names(3)
+
+    def test_lags_and_rolling_statistics(self):
+        """Тест лагов и скользящих статистик по предыдущим наблюдениям"""
+        matrix = features.build_features(self.values, lags=3)
+        i = 45
+
+        self.assertEqual(matrix.shape, (61, len(self.names)))
+        self.assertTrue(np.all(np.isnan(matrix[0])))
+        self.assertAlmostEqual(matrix[i, self.names.index("pressure_lag2")], self.values[i - 2, 2])
+        self.assertAlmostEqual(matrix[i, self.names.index("humidity_mean7")], self.values[i - 7:i, 1].mean())
+        self.assertAlmostEqual(matrix[i, self.names.index("pressure_var30")], self.values[i - 30:i, 2].var(), places=6)
+        # Строка после ряда описывает последние наблюдения
+        self.assertAlmostEqual(matrix[60, self.names.index("temperature_lag1")], self.values[59, 0])
+
+    def test_short_history(self):
+        """Тест признаков при истории короче лага и окна"""
+        matrix = features.build_features(self.values, lags=3)
+
+        self.assertAlmostEqual(matrix[2, self.names.index("temperature_lag3")], self.values[0, 0])
+        self.assertAlmostEqual(matrix[2, self.names.index("wind_speed_mean30")], self.values[:2, 3].mean())
+
+    def test_training_matrix_sorts_series(self):
+        """Тест матрицы обучения по ряду в произвольном порядке дат"""
+        dates = np.datetime64("2024-01-01") + np.arange(50)
+        order = np.random.default_rng(1).permutation(50)
+
+        train_dates, matrix, values = features.training_matrix(dates[order], self.values[:50][order], lags=3)
+
+        np.testing.assert_array_equal(train_dates, dates[1:])
+        np.testing.assert_allclose(matrix, features.build_features(self.values[:50], 3)[1:-1])
+        np.testing.assert_allclose(values, self.values[1:50])
+
+    def test_latest_history(self):
+        """Тест хвоста ряда: последние context_size(lags) наблюдений по возрастанию дат"""
+        dates = np.datetime64("2024-01-01") + np.arange(50)
+
+        history = features.latest_history(dates[::-1], self.values[:50][::-1], lags=3)
+
+        self.assertEqual(len(history.dates), features.context_size(3))
+        np.testing.assert_array_equal(history.dates, dates[-30:])
+        np.testing.assert_allclose(history.values, self.values[20:50])
+        # Признаки следующего дня по хвосту те же, что по всему ряду
+        np.testing.assert_allclose(
+            features.build_features(history.values, 3)[-1], features.build_features(self.values[:50], 3)[-1]
+        )
+
+    def test_rollout_feeds_predictions_back(self):
+        """Тест рекурсивного прогноза: прогноз дня становится лагом следующего"""
+        seen = []
+
+        def predict(date, row):
+            seen.append(row[0])  # temperature_lag1
+            return [row[0] + 1.0, 50.0, 0.0]
+
+        dates, predictions = features.rollout(
+            np.datetime64("2024-01-31"), self.values[:40], 3, predict, lags=3
+        )
+
+        self.assertEqual(dates.tolist()[0], datetime.date(2024, 2, 1))
+        self.assertEqual(seen, [self.values[39, 0], self.values[39, 0] + 1, self.values[39, 0] + 2])
+        np.testing.assert_allclose(predictions[:, 0], self.values[39, 0] + np.arange(1, 4))
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД для каждого теста"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        self.store = features.FeatureStore()
+        database.add_write_listener(self.store.on_write)
+
+        self.start = datetime.date(2024, 1, 1)
+        database.save_weather_data([self.item(i) for i in range(40)])
+
+    def tearDown(self):
+        database.remove_write_listener(self.store.on_write)
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def item(self, day, city="Москва"):
+        return WeatherData(
+            city=city,
+            date=self.start + datetime.timedelta(days=day),
+            temperature=float(day % 11),
+            humidity=60.0 + day % 7,
+            pressure=1000.0 + day % 5,
+            wind_speed=3.0,
+            precipitation=float(day % 3),
+            weather_condition="Ясно"
+        )
+
+    def test_store_reads_tail_after_write(self):
+        """Тест: хранилище держит только хвост ряда и перечитывает его после записи города"""
+        history = self.store.get("Москва")
+        self.assertEqual(len(history.dates), features.context_size())
+        self.assertEqual(history.dates[-1], np.datetime64(self.start + datetime.timedelta(days=39)))
+        self.assertIs(self.store.get("Москва"), history)
+
+        # Запись другого города хвост Москвы не сбрасывает
+        database.save_weather_data([self.item(3, city="Сочи")])
+        self.assertIs(self.store.get("Москва"), history)
+
+        database.save_weather_data([self.item(40), self.item(41)])
+        updated = self.store.get("Москва")
+        self.assertEqual(updated.dates[-1], np.datetime64(self.start + datetime.timedelta(days=41)))
+        self.assertEqual(len(updated.dates), features.context_size())
+
+        # Хвост для другого числа лагов хранится отдельно
+        self.assertEqual(len(self.store.get("Москва", lags=40).dates), 40)
+
+        stats = self.store.stats()
+        self.assertEqual((stats["builds"], stats["hits"], stats["entries"]), (3, 2, 2))
+
+    def test_write_during_build_not_cached(self):
+        """Тест: хвост, прочитанный во время записи данных города, читается заново"""
+        read = database.get_weather_columns
+        calls = []
+
+        def read_with_write(*args, **kwargs):
+            columns = read(*args, **kwargs)
+            if not calls:
+                database.save_weather_data([self.item(40)])
+            calls.append(args)
+            return columns
+
+        with patch.object(database, "get_weather_columns", read_with_write):
+            history = self.store.get("Москва")
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(history.dates[-1], np.datetime64(self.start + datetime.timedelta(days=40)))
+        self.assertIs(self.store.get("Москва"), history)
+
+    def test_lru_limit(self):
+        """Тест вытеснения давно не запрашивавшихся хвостов"""
+        store = features.FeatureStore(max_entries=1)
+        store.get("Москва")
+        store.get("Сочи")
+
+        self.assertEqual((store.stats()["entries"], store.stats()["evictions"]), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
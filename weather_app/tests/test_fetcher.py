@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import fetcher
+
+class FakeUpstream:
+    """Локальный HTTP-сервер с настраиваемой задержкой и ошибками."""
+    
+    def __init__(self, delay=0.0, failures=0, failure_status=503):
+        self.delay = delay
+        self.failures = failures
+        self.failure_status = failure_status
+        self.requests = 0
+        self.lock = threading.Lock()
+        upstream = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream.lock:
+                    upstream.requests += 1
+                    fail = upstream.failures > 0
+                    if fail:
+                        upstream.failures -= 1
+                time.sleep(upstream.delay)
+                
+                status = upstream.failure_status if fail else 200
+                body = json.dumps({"path": self.path}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class TestAsyncFetcher(unittest.TestCase):
+    
+    def fetch(self, upstream, count, **options):
+        """Выполнение count запросов к серверу; возвращает результаты и время"""
+        options.setdefault("rate_per_host", 1000.0)
+        options.setdefault("burst", 1000)
+        requests = [(f"{upstream.url}/item/{i}", None) for i in range(count)]
+        started = time.perf_counter()
+        results = fetcher.fetch_json_many(requests, **options)
+        return results, time.perf_counter() - started
+    
+    def test_throughput_scales_with_concurrency(self):
+        """Тест роста пропускной способности с увеличением параллельности"""
+        with FakeUpstream(delay=0.1) as upstream:
+            serial_results, serial_time = self.fetch(upstream, 12, concurrency=1)
+            parallel_results, parallel_time = self.fetch(upstream, 12, concurrency=6)
+        
+        self.assertEqual(serial_results, parallel_results)
+        self.assertEqual(parallel_results[3], {"path": "/item/3"})
+        
+        # 12 запросов по 0.1 с: последовательно >= 1.2 с, по 6 одновременно ~0.2 с
+        self.assertGreaterEqual(serial_time, 1.2)
+        self.assertLess(parallel_time, serial_time / 3)
+    
+    def test_retries_with_backoff(self):
+        """Тест повторных попыток при временной ошибке сервера"""
+        with FakeUpstream(failures=2) as upstream:
+            results, _ = self.fetch(upstream, 1, retries=3, backoff_base=0.01)
+            self.assertEqual(upstream.requests, 3)
+        
+        self.assertEqual(results[0], {"path": "/item/0"})
+    
+    def test_retries_exhausted(self):
+        """Тест ошибки после исчерпания повторных попыток"""
+        with FakeUpstream(failures=10) as upstream:
+            results, _ = self.fetch(upstream, 1, retries=2, backoff_base=0.01)
+            self.assertEqual(upstream.requests, 3)
+        
+        self.assertIsInstance(results[0], fetcher.FetchError)
+        self.assertEqual(results[0].status, 503)
+    
+    def test_client_error_not_retried(self):
+        """Тест отсутствия повторов для ошибок клиента (4xx)"""
+        with FakeUpstream(failures=1, failure_status=404) as upstream:
+            results, _ = self.fetch(upstream, 1, retries=3, backoff_base=0.01)
+            self.assertEqual(upstream.requests, 1)
+        
+        self.assertIsInstance(results[0], fetcher.FetchError)
+        self.assertEqual(results[0].status, 404)
+    
+    def test_request_timeout(self):
+        """Тест ограничения времени запроса"""
+        with FakeUpstream(delay=1.0) as upstream:
+            results, elapsed = self.fetch(upstream, 1, timeout=0.1, retries=0)
+        
+        self.assertIsInstance(results[0], fetcher.FetchError)
+        self.assertLess(elapsed, 1.0)
+    
+    def test_token_bucket_limits_rate(self):
+        """Тест ограничения темпа запросов к одному хосту"""
+        with FakeUpstream() as upstream:
+            _, elapsed = self.fetch(upstream, 6, concurrency=6, rate_per_host=20.0, burst=1)
+        
+        # Первый запрос проходит сразу, остальные 5 - с интервалом 0.05 с
+        self.assertGreaterEqual(elapsed, 0.2)
+    
+    def test_run_sync_inside_event_loop(self):
+        """Тест запуска корутины из кода, работающего внутри цикла событий"""
+        async def inner():
+            return 42
+        
+        async def outer():
+            return fetcher.run_sync(inner())
+        
+        self.assertEqual(asyncio.run(outer()), 42)
+
+if __name__ == '__main__':
+    unittest.main()
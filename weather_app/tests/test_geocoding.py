@@ -0,0 +1,117 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, geocoding
+
+class TestGeocodeCache(unittest.TestCase):
+    
+    def setUp(self):
+        """Настройка временной БД для каждого теста"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        self.cache = geocoding.GeocodeCache(max_size=2, negative_ttl=60)
+        self.calls = []
+    
+    def tearDown(self):
+        """Закрытие пула и удаление временной БД"""
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+    
+    def fetch(self, city):
+        """Фиктивный запрос к API геокодирования"""
+        self.calls.append(city)
+        return None if city.startswith("Нет") else (55.75, 37.62)
+    
+    def test_normalize_city(self):
+        """Тест нормализации названия города"""
+        self.assertEqual(geocoding.normalize_city("  Нижний   Новгород "), "нижний новгород")
+        self.assertEqual(geocoding.normalize_city("Королёв"), geocoding.normalize_city("королев"))
+    
+    def test_resolve_caches_result(self):
+        """Тест кэширования координат в памяти"""
+        self.assertEqual(self.cache.resolve("Москва", self.fetch), (55.75, 37.62))
+        self.assertEqual(self.cache.resolve("МОСКВА", self.fetch), (55.75, 37.62))
+        
+        self.assertEqual(self.calls, ["Москва"])
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+    
+    def test_persistent_layer(self):
+        """Тест чтения координат из БД после очистки памяти"""
+        self.cache.resolve("Москва", self.fetch)
+        
+        other_cache = geocoding.GeocodeCache()
+        self.assertEqual(other_cache.resolve("москва", self.fetch), (55.75, 37.62))
+        
+        self.assertEqual(self.calls, ["Москва"])
+        self.assertEqual(other_cache.stats()["db_hits"], 1)
+    
+    def test_negative_cache_expires(self):
+        """Тест истечения записи 'город не найден'"""
+        with patch("backend.app.geocoding.time.time", return_value=1000.0):
+            self.assertIsNone(self.cache.resolve("НетТакого", self.fetch))
+            self.assertIsNone(self.cache.resolve("НетТакого", self.fetch))
+        self.assertEqual(len(self.calls), 1)
+        
+        # После истечения TTL город запрашивается снова (и из памяти, и из БД)
+        with patch("backend.app.geocoding.time.time", return_value=1061.0):
+            self.cache.resolve("НетТакого", self.fetch)
+        self.assertEqual(len(self.calls), 2)
+    
+    def test_fetch_errors_not_cached(self):
+        """Тест отсутствия кэширования ошибок запроса"""
+        def failing_fetch(city):
+            raise ConnectionError("API недоступно")
+        
+        with self.assertRaises(ConnectionError):
+            self.cache.resolve("Москва", failing_fetch)
+        
+        self.assertEqual(self.cache.lookup("Москва"), (False, None))
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения давно не использованных городов из памяти"""
+        for city in ["Москва", "Тверь", "Сочи"]:
+            self.cache.resolve(city, self.fetch)
+        
+        self.assertEqual(self.cache.stats()["size"], 2)
+        # Вытесненный город читается из БД без запроса к API
+        self.cache.resolve("Москва", self.fetch)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.cache.stats()["db_hits"], 1)
+    
+    def test_missing_for_warm_up(self):
+        """Тест поиска городов, которых нет в кэше"""
+        self.cache.resolve("Москва", self.fetch)
+        self.cache.clear()
+        
+        missing = self.cache.missing(["москва", "Тверь", "тверь "])
+        
+        self.assertEqual(missing, ["Тверь"])
+        self.assertEqual(self.cache.lookup("Москва"), (True, (55.75, 37.62)))
+    
+    def test_resolve_async(self):
+        """Тест асинхронного варианта resolve"""
+        async def fetch_async(city):
+            return self.fetch(city)
+        
+        async def run():
+            first = await self.cache.resolve_async("Москва", fetch_async)
+            second = await self.cache.resolve_async("Москва", fetch_async)
+            return first, second
+        
+        self.assertEqual(asyncio.run(run()), ((55.75, 37.62), (55.75, 37.62)))
+        self.assertEqual(self.calls, ["Москва"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import http_client
+
+class StubServer:
+    """Локальный HTTP/1.1-сервер с keep-alive, считающий установленные соединения."""
+    
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+            
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    fail = stub.failures > 0
+                    if fail:
+                        stub.failures -= 1
+                time.sleep(stub.delay)
+                
+                body = json.dumps({"path": self.path}).encode()
+                self.send_response(503 if fail else 200)
+                self.send_header("Content-Type", "application/json")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class TestHttpClient(unittest.TestCase):
+    
+    def setUp(self):
+        """Отдельный клиент для каждого теста"""
+        self.client = http_client.HttpClient(retries=2, backoff_factor=0.01)
+    
+    def tearDown(self):
+        self.client.close()
+    
+    def test_keep_alive_reduces_connection_setup(self):
+        """Тест переиспользования соединений по сравнению с отдельными requests.get"""
+        with StubServer() as stub:
+            for i in range(10):
+                requests.get(f"{stub.url}/bare/{i}").close()
+            bare_connections = stub.connections
+            
+            for i in range(10):
+                self.assertEqual(self.client.get(f"{stub.url}/pooled/{i}").json(), {"path": f"/pooled/{i}"})
+            pooled_connections = stub.connections - bare_connections
+        
+        self.assertEqual(bare_connections, 10)
+        self.assertEqual(pooled_connections, 1)
+        
+        stats = self.client.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["connections_opened"], 1)
+    
+    def test_gzip_response(self):
+        """Тест запроса сжатого ответа и его распаковки"""
+        with StubServer() as stub:
+            response = self.client.get(f"{stub.url}/compressed")
+        
+        self.assertEqual(response.json(), {"path": "/compressed"})
+        self.assertEqual(self.client.stats()["compressed_responses"], 1)
+    
+    def test_retry_on_server_error(self):
+        """Тест повторного запроса при временной ошибке сервера"""
+        with StubServer(failures=1) as stub:
+            response = self.client.get(f"{stub.url}/retry")
+            self.assertEqual(stub.requests, 2)
+        
+        self.assertEqual(response.status_code, 200)
+    
+    def test_read_timeout(self):
+        """Тест ограничения времени ожидания ответа"""
+        client = http_client.HttpClient(read_timeout=0.1, retries=0)
+        try:
+            with StubServer(delay=1.0) as stub:
+                with self.assertRaises(requests.exceptions.RequestException):
+                    client.get(f"{stub.url}/slow")
+        finally:
+            client.close()
+    
+    def test_injectable_module_client(self):
+        """Тест замены общего клиента модуля"""
+        previous = http_client.set_http_client(self.client)
+        try:
+            self.assertIs(http_client.get_http_client(), self.client)
+        finally:
+            http_client.set_http_client(previous)
+
+if __name__ == '__main__':
+    unittest.main()
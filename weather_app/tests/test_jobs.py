@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from backend.app import database, jobs, ml_model
+from backend.app.api import app
+from backend.app.models import WeatherData
+
+def wait_for(manager, job_id, timeout=120):
+    """Ожидание завершения задачи"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] not in (jobs.QUEUED, jobs.RUNNING):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Задача {job_id} не завершилась за {timeout} с")
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД и каталог моделей, данные для двух городов"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        self.original_model_dir = ml_model.MODEL_DIR
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        ml_model.MODEL_DIR = os.path.join(self.temp_dir.name, "models")
+        database.init_db()
+
+        today = datetime.date.today()
+        for city in ("Москва", "Сочи"):
+            database.save_weather_data([
+                WeatherData(
+                    city=city,
+                    date=today - datetime.timedelta(days=i),
+                    temperature=15.0 + i % 5,
+                    humidity=60.0 + i % 7,
+                    pressure=1013.0,
+                    wind_speed=3.0,
+                    precipitation=float(i % 3),
+                    weather_condition="Ясно" if i % 2 else "Облачно"
+                )
+                for i in range(10)
+            ])
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.manager = jobs.JobManager(max_queue=2, executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        ml_model.MODEL_DIR = self.original_model_dir
+        self.temp_dir.cleanup()
+
+    def test_job_succeeds(self):
+        """Тест выполнения задачи: статус, длительность и метрики"""
+        job = self.manager.submit("Москва")
+        result = wait_for(self.manager, job.id)
+
+        self.assertEqual(result["status"], jobs.SUCCEEDED)
+        self.assertIsNotNone(result["duration"])
+        self.assertIn("temp_rmse", result["metrics"])
+        self.assertEqual(database.get_model_record("Москва")["version"], 1)
+
+    def test_job_failure_reported(self):
+        """Тест отчёта об ошибке обучения"""
+        job = self.manager.submit("Неизвестный город")
+        result = wait_for(self.manager, job.id)
+
+        self.assertEqual(result["status"], jobs.FAILED)
+        self.assertIn("Недостаточно данных", result["error"])
+        self.assertEqual(self.manager.stats()["failed"], 1)
+
+    def test_deduplication_and_bounded_queue(self):
+        """Тест дедупликации задач одного города и ограничения очереди"""
+        release = threading.Event()
+
+        def blocked_training(database_path, model_dir, city, n_jobs):
+            release.wait(10)
+            return {"metrics": {"temp_rmse": 0.0}, "started_at": time.time()}
+
+        with patch.object(jobs, "train_city_model", blocked_training):
+            first = self.manager.submit("Москва")
+            duplicate = self.manager.submit("Москва")
+            second = self.manager.submit("Сочи")
+
+            self.assertIs(first, duplicate)
+            self.assertNotEqual(first.id, second.id)
+            with self.assertRaises(jobs.QueueFullError):
+                self.manager.submit("Казань")
+
+            release.set()
+            wait_for(self.manager, first.id)
+            wait_for(self.manager, second.id)
+
+        stats = self.manager.stats()
+        self.assertEqual(stats["submitted"], 2)
+        self.assertEqual(stats["deduplicated"], 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["active"], 0)
+
+        # После завершения задачу для города можно поставить снова
+        self.assertNotEqual(self.manager.submit("Москва").id, first.id)
+
+    def test_history_is_bounded(self):
+        """Тест ограничения истории завершённых задач"""
+        manager = jobs.JobManager(executor=self.executor, history_size=2)
+        ids = []
+        for _ in range(4):
+            job = manager.submit("Неизвестный город")
+            wait_for(manager, job.id)
+            ids.append(job.id)
+
+        self.assertIsNone(manager.get(ids[0]))
+        self.assertIsNotNone(manager.get(ids[-1]))
+
+    def test_process_pool_training(self):
+        """Тест обучения в отдельном процессе"""
+        manager = jobs.JobManager(max_workers=1)
+        try:
+            job = manager.submit("Сочи")
+            result = wait_for(manager, job.id)
+        finally:
+            manager.shutdown()
+
+        self.assertEqual(result["status"], jobs.SUCCEEDED, result["error"])
+        # Модель, обученная в другом процессе, доступна для прогноза здесь
+        self.assertEqual(ml_model.load_model("Сочи")["version"], 1)
+
+    def test_api_endpoints(self):
+        """Тест POST /train_model и GET /jobs/{id}"""
+        previous = jobs.set_job_manager(self.manager)
+        try:
+            client = TestClient(app)
+            response = client.post("/train_model", params={"city": "Москва"})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+
+            wait_for(self.manager, job_id)
+            response = client.get(f"/jobs/{job_id}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["status"], jobs.SUCCEEDED)
+
+            self.assertEqual(client.get("/jobs/unknown").status_code, 404)
+            self.assertEqual(client.post("/train_model", params={"city": "Казань"}).status_code, 400)
+        finally:
+            jobs.set_job_manager(previous)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from backend.app import database, metrics, ml_model, response_cache, scraper
+from backend.app.api import app
+from backend.app.models import ModelConfig, WeatherData
+
+class TestMetricTypes(unittest.TestCase):
+
+    def test_histogram_render(self):
+        """Тест накопленных корзин, суммы и числа наблюдений гистограммы"""
+        histogram = metrics.Histogram("test_seconds", "Тест", ("kind",), buckets=(0.1, 1.0))
+        child = histogram.labels("a")
+        for value in (0.05, 0.1, 0.5, 3.0):
+            child.observe(value)
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{kind="a",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{kind="a",le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{kind="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_sum{kind="a"} 3.65', lines)
+        self.assertIn('test_seconds_count{kind="a"} 4', lines)
+        self.assertIs(histogram.labels("a"), child)
+
+    def test_counter_labels_escaped(self):
+        """Тест счётчика и экранирования значений меток"""
+        counter = metrics.Counter("test_total", "Тест", ("path",))
+        counter.labels('a"b\\c').inc(2)
+        self.assertEqual(counter.render()[-1], 'test_total{path="a\\"b\\\\c"} 2')
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+    def test_timed_counts_errors(self):
+        """Тест декоратора timed для функций и корутин"""
+        histogram = metrics.Histogram("test_timed_seconds", "Тест")
+        errors = metrics.Counter("test_timed_errors_total", "Тест")
+
+        @metrics.timed(histogram.labels(), errors.labels())
+        def fail():
+            raise RuntimeError("ошибка")
+
+        @metrics.timed(histogram.labels(), errors.labels())
+        async def ok():
+            return 1
+
+        with self.assertRaises(RuntimeError):
+            fail()
+        self.assertEqual(asyncio.run(ok()), 1)
+        self.assertEqual(histogram.labels().count, 2)
+        self.assertEqual(errors.labels().value, 1)
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД, каталог моделей и пустой кэш ответов"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        self.original_model_dir = ml_model.MODEL_DIR
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        ml_model.MODEL_DIR = os.path.join(self.temp_dir.name, "models")
+        database.init_db()
+        response_cache.response_cache.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        response_cache.response_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        ml_model.MODEL_DIR = self.original_model_dir
+        self.temp_dir.cleanup()
+
+    def sample(self, text, line_prefix):
+        """Значение первой строки метрики с заданным началом"""
+        for line in text.splitlines():
+            if line.startswith(line_prefix + " "):
+                return float(line.rsplit(" ", 1)[1])
+        return 0.0
+
+    def test_routes_and_database(self):
+        """Тест метрик маршрутов (по шаблону пути) и функций БД"""
+        before = self.client.get("/metrics").text
+        self.client.get("/cities")
+        self.client.get("/jobs/unknown")
+        self.client.get("/jobs/other")
+        self.client.get("/no-such-route")
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        text = response.text
+
+        jobs_404 = 'weather_http_responses_total{method="GET",route="/jobs/{job_id}",status="4xx"}'
+        self.assertEqual(self.sample(text, jobs_404) - self.sample(before, jobs_404), 2)
+        unmatched = 'weather_http_request_duration_seconds_count{method="GET",route="unmatched"}'
+        self.assertEqual(self.sample(text, unmatched) - self.sample(before, unmatched), 1)
+        cities = 'weather_db_query_duration_seconds_count{function="get_all_cities"}'
+        self.assertGreaterEqual(self.sample(text, cities) - self.sample(before, cities), 1)
+        self.assertIn('weather_executor_queued{pool="io"}', text)
+        self.assertIn('weather_db_pool_connections{state="idle"}', text)
+
+    @patch('backend.app.http_client.HttpClient.get', side_effect=ConnectionError("нет сети"))
+    def test_upstream_errors(self, mock_get):
+        """Тест учёта неудачных запросов к OpenWeatherMap"""
+        errors = metrics.UPSTREAM_ERRORS.labels("geo")
+        latency = metrics.UPSTREAM_REQUEST_DURATION.labels("geo")
+        errors_before, count_before = errors.value, latency.count
+
+        self.assertIsNone(scraper.get_weather_from_api("Город-без-координат", datetime.date.today()))
+        self.assertEqual(errors.value - errors_before, 1)
+        self.assertEqual(latency.count - count_before, 1)
+
+    def test_fit_and_predict(self):
+        """Тест времени обучения модели и построения прогноза"""
+        today = datetime.date.today()
+        database.save_weather_data([
+            WeatherData(city="Москва", date=today - datetime.timedelta(days=i), temperature=15.0 + i % 5,
+                        humidity=60.0, pressure=1013.0, wind_speed=3.0, precipitation=0.0,
+                        weather_condition="Ясно")
+            for i in range(20)
+        ])
+        fit_before = metrics.MODEL_FIT_DURATION.labels().count
+        predict_before = metrics.MODEL_PREDICT_DURATION.labels().count
+
+        ml_model.train_model(database.get_weather_data("Москва", 30), ModelConfig(n_estimators=5))
+        self.assertEqual(self.client.get("/forecast", params={"city": "Москва"}).status_code, 200)
+
+        self.assertEqual(metrics.MODEL_FIT_DURATION.labels().count - fit_before, 1)
+        self.assertEqual(metrics.MODEL_PREDICT_DURATION.labels().count - predict_before, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,7 +12,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 
 # Импорт модулей для тестирования
 import ml_model
-from backend.app.models import WeatherData, WeatherForecast
+from backend.app import database
+from backend.app.models import WeatherData, WeatherForecast, ModelConfig
 
 class TestMLModel(unittest.TestCase):
     
@@ -21,16 +22,16 @@ class TestMLModel(unittest.TestCase):
         self.test_city = "Москва"
         self.today = datetime.date.today()
         
-        # Создаем временные пути для моделей и других файлов
+        # Создаем временные пути для моделей и БД
         self.temp_dir = tempfile.TemporaryDirectory()
-        # Заменяем константы в модуле на временные пути
-        self.original_model_path = ml_model.MODEL_PATH
-        self.original_scaler_path = ml_model.SCALER_PATH
-        self.original_encoder_path = ml_model.ENCODER_PATH
+        # Заменяем константы в модулях на временные пути
+        self.original_model_dir = ml_model.MODEL_DIR
+        self.original_database_path = database.DATABASE_PATH
         
-        ml_model.MODEL_PATH = os.path.join(self.temp_dir.name, "weather_model.joblib")
-        ml_model.SCALER_PATH = os.path.join(self.temp_dir.name, "weather_scaler.joblib")
-        ml_model.ENCODER_PATH = os.path.join(self.temp_dir.name, "weather_encoder.joblib")
+        ml_model.MODEL_DIR = os.path.join(self.temp_dir.name, "models")
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        ml_model.model_registry = ml_model.registry.ModelRegistry(max_entries=ml_model.MAX_RESIDENT_MODELS)
         
         # Создаем тестовые данные
         self.test_data = []
@@ -49,11 +50,11 @@ class TestMLModel(unittest.TestCase):
     
     def tearDown(self):
         """Очистка после каждого теста"""
+        database.close_pool()
         self.temp_dir.cleanup()
         # Восстанавливаем оригинальные пути
-        ml_model.MODEL_PATH = self.original_model_path
-        ml_model.SCALER_PATH = self.original_scaler_path
-        ml_model.ENCODER_PATH = self.original_encoder_path
+        ml_model.MODEL_DIR = self.original_model_dir
+        database.DATABASE_PATH = self.original_database_path
     
     def test_prepare_data(self):
         """Тест функции подготовки данных"""
@@ -74,6 +75,28 @@ class TestMLModel(unittest.TestCase):
         self.assertEqual(conditions[0], self.test_data[0].weather_condition)
         self.assertEqual(dates[0], self.test_data[0].date)
     
+    def test_prepare_data_columns(self):
+        """Тест совпадения признаков из массива столбцов и из списка WeatherData"""
+        database.save_weather_data(self.test_data)
+        columns = database.get_weather_columns(self.test_city, 30)
+        rows = database.get_weather_data(self.test_city, 30)
+        
+        X_columns, conditions, dates = ml_model.prepare_data(columns)
+        X_rows, _, _ = ml_model.prepare_data(rows)
+        
+        np.testing.assert_array_equal(X_columns, X_rows)
+        self.assertEqual(conditions.tolist(), [row.weather_condition for row in rows])
+        self.assertEqual(dates.tolist(), [row.date for row in rows])
+    
+    def test_train_model_columns(self):
+        """Тест обучения модели на данных, прочитанных по столбцам"""
+        database.save_weather_data(self.test_data)
+        
+        metrics = ml_model.train_model(database.get_weather_columns(self.test_city, 30))
+        
+        self.assertIn('temp_rmse', metrics)
+        self.assertEqual(database.get_model_record(self.test_city)['version'], 1)
+    
     def test_train_model_insufficient_data(self):
         """Тест обучения модели с недостаточным количеством данных"""
         with self.assertRaises(ValueError):
@@ -94,58 +117,170 @@ class TestMLModel(unittest.TestCase):
         self.assertIn('precip_mae', metrics)
         self.assertIn('precip_r2', metrics)
         
-        # Проверяем, что файлы модели созданы
-        self.assertTrue(os.path.exists(ml_model.MODEL_PATH))
-        self.assertTrue(os.path.exists(ml_model.SCALER_PATH))
-        self.assertTrue(os.path.exists(ml_model.ENCODER_PATH))
+        # Проверяем, что файл модели города создан и зарегистрирован в БД
+        record = database.get_model_record(self.test_city)
+        self.assertEqual(record['version'], 1)
+        self.assertEqual(record['file_path'], ml_model.model_path(self.test_city, 1))
+        self.assertTrue(os.path.exists(record['file_path']))
+        self.assertEqual(database.get_model_metrics(self.test_city), metrics)
     
-    @patch('joblib.load')
-    @patch('joblib.dump')
-    def test_make_forecast_no_model(self, mock_dump, mock_load):
-        """Тест создания прогноза когда модели ещё нет"""
-        # Настраиваем моки
-        mock_model_temp = Mock()
-        mock_model_temp.predict.return_value = np.array([15.0])
-        
-        mock_model_humidity = Mock()
-        mock_model_humidity.predict.return_value = np.array([70.0])
-        
-        mock_model_precip = Mock()
-        mock_model_precip.predict.return_value = np.array([0.5])
-        
-        mock_scaler = Mock()
-        mock_scaler.transform.return_value = np.array([[1, 2, 3, 4, 5, 6, 7, 8]])
-        
-        mock_encoder = Mock()
-        
-        # Настраиваем возвращаемые значения для joblib.load
-        mock_load.side_effect = [
-            {
-                'temperature': mock_model_temp,
-                'humidity': mock_model_humidity,
-                'precipitation': mock_model_precip,
-                'conditions_encoder': mock_encoder
-            },
-            mock_scaler,
-            mock_encoder
-        ]
+    def test_train_model_per_city_versions(self):
+        """Тест раздельных версионированных моделей для разных городов"""
+        other_city_data = [item.model_copy(update={"city": "Сочи"}) for item in self.test_data]
         
-        # Настраиваем существование файлов
-        with patch('os.path.exists', return_value=False):
-            with patch('ml_model.train_model') as mock_train:
-                mock_train.return_value = {}
-                
-                # Вызываем функцию
-                forecasts = ml_model.make_forecast(self.test_data, days=3)
-                
-                # Проверяем, что модель была обучена
-                mock_train.assert_called_once_with(self.test_data)
+        ml_model.train_model(self.test_data)
+        ml_model.train_model(other_city_data)
+        ml_model.train_model(self.test_data)
+        
+        self.assertEqual(database.get_model_record(self.test_city)['version'], 2)
+        self.assertEqual(database.get_model_record("Сочи")['version'], 1)
+        self.assertEqual(ml_model.load_model("Сочи")['city'], "Сочи")
+        self.assertEqual(ml_model.load_model(self.test_city)['version'], 2)
+        
+        # Предыдущая версия хранится на диске, пока их не больше MODEL_VERSIONS_TO_KEEP
+        self.assertTrue(os.path.exists(ml_model.model_path(self.test_city, 1)))
+    
+    def test_old_versions_removed(self):
+        """Тест удаления устаревших версий модели"""
+        for _ in range(ml_model.MODEL_VERSIONS_TO_KEEP + 1):
+            ml_model.train_model(self.test_data)
+        
+        self.assertFalse(os.path.exists(ml_model.model_path(self.test_city, 1)))
+        self.assertTrue(os.path.exists(ml_model.model_path(self.test_city, 2)))
+    
+    def test_training_strategies(self):
+        """Тест одинаковых моделей при последовательном и параллельном обучении"""
+        X, _, _ = ml_model.prepare_data(self.test_data)
+        Y = np.array([[d.temperature, d.humidity, d.precipitation] for d in self.test_data])
+        
+        sequential = ml_model.fit_targets(X, Y, ModelConfig(strategy="sequential", n_jobs=None, n_estimators=10))
+        parallel = ml_model.fit_targets(X, Y, ModelConfig(strategy="parallel", n_jobs=2, n_estimators=10))
+        multi_output = ml_model.fit_targets(X, Y, ModelConfig(strategy="multi_output", n_estimators=10))
+        
+        self.assertEqual(set(parallel), set(ml_model.TARGETS))
+        np.testing.assert_allclose(
+            ml_model.predict_targets(sequential, X),
+            ml_model.predict_targets(parallel, X)
+        )
+        self.assertEqual(list(multi_output), ['multi_output'])
+        self.assertEqual(ml_model.predict_targets(multi_output, X).shape, (len(self.test_data), 3))
+
+    def test_parallel_strategy_splits_threads(self):
+        """Тест деления потоков n_jobs между одновременно обучаемыми моделями"""
+        X, _, _ = ml_model.prepare_data(self.test_data)
+        Y = np.array([[d.temperature, d.humidity, d.precipitation] for d in self.test_data])
+
+        parallel = ml_model.fit_targets(X, Y, ModelConfig(strategy="parallel", n_jobs=6, n_estimators=5))
+        sequential = ml_model.fit_targets(X, Y, ModelConfig(strategy="sequential", n_jobs=6, n_estimators=5))
+
+        self.assertEqual({model.n_jobs for model in parallel.values()}, {2})
+        self.assertEqual({model.n_jobs for model in sequential.values()}, {6})
+        self.assertEqual(ml_model.thread_budget(None), 1)
+        self.assertEqual(ml_model.thread_budget(-1), os.cpu_count())
+    
+    def test_multi_output_forecast(self):
+        """Тест прогноза по модели с несколькими выходами"""
+        ml_model.train_model(self.test_data, ModelConfig(strategy="multi_output", n_estimators=10))
+        
+        forecasts = ml_model.make_forecast(self.test_data, days=3)
         
-        # Проверяем результат прогноза
         self.assertEqual(len(forecasts), 3)
-        self.assertIsInstance(forecasts[0], WeatherForecast)
-        self.assertEqual(forecasts[0].city, self.test_city)
-        self.assertEqual(forecasts[0].date, self.today + datetime.timedelta(days=1))
+        self.assertIn('multi_output', ml_model.load_model(self.test_city))
+    
+    def test_autoregressive_features(self):
+        """Тест лаговых признаков: день без истории в обучение не попадает"""
+        X, Y, dates = ml_model.prepare_autoregressive(self.test_data, lags=3)
+        
+        self.assertEqual(X.shape, (len(self.test_data) - 1, 3 + len(ml_model.features.feature_names(3))))
+        self.assertEqual(Y.shape, (len(self.test_data) - 1, 3))
+        self.assertEqual(dates[0], min(item.date for item in self.test_data) + datetime.timedelta(days=1))
+    
+    def test_training_skips_incomplete_windows(self):
+        """Тест: при длинной истории дни с неполными скользящими окнами не обучаются"""
+        history = [
+            item.model_copy(update={"date": self.today - datetime.timedelta(days=i)})
+            for i, item in enumerate(self.test_data * 3)
+        ]
+        ml_model.train_model(history, ModelConfig(n_estimators=5))
+        
+        # Из 90 дней без первого (нет истории) и 29 дней с неполным 30-дневным окном
+        self.assertEqual(ml_model.load_model(self.test_city)['scaler'].n_samples_seen_, 60)
+        self.assertIsNone(ml_model.load_model(self.test_city)['conditions_encoder'])
+    
+    def test_rollout_and_static_forecast(self):
+        """Тест прогноза моделью с лагами и моделью без лагов"""
+        ml_model.train_model(self.test_data, ModelConfig(n_estimators=10))
+        self.assertEqual(ml_model.load_model(self.test_city)['lags'], 7)
+        rollout = ml_model.make_forecast(self.test_data, days=10)
+        
+        ml_model.train_model(self.test_data, ModelConfig(n_estimators=10, lags=0))
+        static = ml_model.make_forecast(self.test_data, days=10)
+        
+        # Прогноз по массиву столбцов из БД совпадает с прогнозом по списку WeatherData
+        database.save_weather_data(self.test_data)
+        self.assertEqual(ml_model.make_forecast(database.get_weather_columns(self.test_city, 30), days=10), static)
+        
+        last_date = max(item.date for item in self.test_data)
+        for forecasts in (rollout, static):
+            self.assertEqual([f.date for f in forecasts],
+                             [last_date + datetime.timedelta(days=i) for i in range(1, 11)])
+    
+    def test_forecast_reads_store_with_model_lags(self):
+        """Тест: прогноз берёт из хранилища хвост ряда по числу лагов модели"""
+        database.save_weather_data(self.test_data)
+        ml_model.train_model(self.test_data, ModelConfig(n_estimators=5, lags=3))
+        store = ml_model.features.FeatureStore()
+        
+        with_store = ml_model.make_forecast(self.test_data, days=3, feature_store=store)
+        
+        self.assertEqual(with_store, ml_model.make_forecast(self.test_data, days=3))
+        self.assertEqual(store.stats()["builds"], 1)
+        store.get(self.test_city, 3)
+        self.assertEqual(store.stats()["hits"], 1)
+    
+    def test_unknown_strategy_rejected(self):
+        """Тест проверки способа обучения в ModelConfig"""
+        with self.assertRaises(ValueError):
+            ModelConfig(strategy="boosting")
+    
+    def test_forecast_features(self):
+        """Тест совпадения векторных признаков дат с datetime на стыке лет"""
+        last_date = datetime.date(2023, 12, 25)
+        dates, X = ml_model.forecast_features(self.test_data[0], last_date, 400)
+        
+        self.assertEqual(X.shape, (400, 8))
+        for i, forecast_date in enumerate(dates):
+            self.assertEqual(forecast_date, last_date + datetime.timedelta(days=i + 1))
+            self.assertEqual(X[i, 0], forecast_date.timetuple().tm_yday)
+            self.assertEqual(X[i, 1], forecast_date.weekday())
+            self.assertEqual(X[i, 2], forecast_date.month)
+        self.assertTrue(np.all(X[:, 3] == self.test_data[0].temperature))
+    
+    def test_derive_conditions(self):
+        """Тест векторного определения состояния погоды"""
+        conditions = ml_model.derive_conditions(
+            np.array([20.0, 10.0, 10.0, 10.0, 10.0, 10.0]),
+            np.array([50.0, 50.0, 50.0, 90.0, 70.0, 50.0]),
+            np.array([6.0, 6.0, 2.0, 0.0, 0.0, 0.0])
+        )
+        
+        self.assertEqual(conditions.tolist(), ["Гроза", "Дождь", "Пасмурно", "Туман", "Облачно", "Ясно"])
+    
+    def test_make_forecast_no_model(self):
+        """Тест создания прогноза когда модели ещё нет"""
+        with patch('ml_model.train_model') as mock_train:
+            with self.assertRaises(ml_model.ModelNotFoundError):
+                ml_model.make_forecast(self.test_data, days=3)
+            
+            # Прогноз не запускает обучение
+            mock_train.assert_not_called()
+    
+    def test_make_forecast_other_city_model_not_used(self):
+        """Тест отсутствия прогноза по модели другого города"""
+        ml_model.train_model([item.model_copy(update={"city": "Сочи"}) for item in self.test_data])
+        
+        with self.assertRaises(ml_model.ModelNotFoundError):
+            ml_model.make_forecast(self.test_data, days=3)
     
     def test_make_forecast_integration(self):
         """Интеграционный тест создания прогноза"""
@@ -172,6 +307,21 @@ class TestMLModel(unittest.TestCase):
             self.assertIsInstance(forecast.precipitation, float)
             self.assertIsInstance(forecast.weather_condition, str)
             
+    def test_make_forecast_uses_registry(self):
+        """Тест повторных прогнозов без чтения модели с диска"""
+        ml_model.train_model(self.test_data)
+        
+        with patch('joblib.load') as mock_load:
+            ml_model.make_forecast(self.test_data, days=3)
+            ml_model.make_forecast(self.test_data, days=3)
+            
+            # После обучения артефакты уже в памяти
+            mock_load.assert_not_called()
+        
+        stats = ml_model.model_registry.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertIn(ml_model.model_path(self.test_city, 1), stats["artifacts"])
+    
     def test_make_forecast_conditions(self):
         """Тест определения условий погоды на основе прогнозируемых значений"""
         # Создаем набор тестовых записей с разными условиями
@@ -185,8 +335,7 @@ class TestMLModel(unittest.TestCase):
         ]
         
         # Создаем мок-функции
-        with patch('joblib.load') as mock_load, \
-             patch('os.path.exists', return_value=True):
+        with patch('ml_model.load_model') as mock_load:
             
             for test_case in conditions_test:
                 mock_model_temp = Mock()
@@ -203,17 +352,14 @@ class TestMLModel(unittest.TestCase):
                 
                 mock_encoder = Mock()
                 
-                # Настраиваем возвращаемые значения для joblib.load
-                mock_load.side_effect = [
-                    {
-                        'temperature': mock_model_temp,
-                        'humidity': mock_model_humidity,
-                        'precipitation': mock_model_precip,
-                        'conditions_encoder': mock_encoder
-                    },
-                    mock_scaler,
-                    mock_encoder
-                ]
+                # Настраиваем возвращаемое значение для загрузки модели города
+                mock_load.return_value = {
+                    'temperature': mock_model_temp,
+                    'humidity': mock_model_humidity,
+                    'precipitation': mock_model_precip,
+                    'conditions_encoder': mock_encoder,
+                    'scaler': mock_scaler
+                }
                 
                 # Вызываем функцию
                 forecasts = ml_model.make_forecast(self.test_data, days=1)
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from backend.app import api, database, profiling, response_cache
+from backend.app.api import app
+
+def slow_cities():
+    time.sleep(0.05)
+    return ["Москва"]
+
+class TestProfilingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД, пустой кэш ответов и чистое хранилище профилей"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        response_cache.response_cache.clear()
+
+        self.profiler = profiling.profiler
+        self.original_settings = (self.profiler.keep, self.profiler.interval)
+        self.profiler.clear()
+        self.profiler.interval = 0.002
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.profiler.configure(enabled=False, sample_rate=0)
+        self.profiler.keep, self.profiler.interval = self.original_settings
+        self.profiler.clear()
+        response_cache.response_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def test_disabled_ignores_header(self):
+        """Тест: при выключенном профилировании заголовок X-Profile не действует"""
+        response = self.client.get("/cities", headers={"X-Profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.client.get("/admin/profiles").json(), [])
+
+    def test_profile_by_header_and_downloads(self):
+        """Тест профиля запроса по заголовку: работа в пуле потоков, .pstats и collapsed stacks"""
+        self.client.put("/admin/profiling", params={"enabled": True})
+
+        with patch("backend.app.database.get_all_cities", side_effect=slow_cities):
+            response = self.client.get("/cities", headers={"X-Profile": "1"})
+        self.assertEqual(response.json(), ["Москва"])
+        profile_id = response.headers["X-Profile-Id"]
+
+        self.assertNotIn("X-Profile-Id", self.client.get("/cities").headers)
+        summary, = self.client.get("/admin/profiles").json()
+        self.assertEqual((summary["id"], summary["path"], summary["status"]), (profile_id, "/cities", 200))
+        self.assertEqual(summary["threads"], 2)
+
+        downloaded = self.client.get(f"/admin/profiles/{profile_id}.pstats")
+        self.assertEqual(downloaded.status_code, 200)
+        path = os.path.join(self.temp_dir.name, "profile.pstats")
+        with open(path, "wb") as f:
+            f.write(downloaded.content)
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn("slow_cities", functions)
+
+        collapsed = self.client.get(f"/admin/profiles/{profile_id}.collapsed").text
+        stacks = [line.rsplit(" ", 1) for line in collapsed.splitlines()]
+        self.assertTrue(stacks)
+        self.assertTrue(all(count.isdigit() for _, count in stacks))
+        self.assertTrue(any(stack.startswith("weather-io") and "slow_cities" in stack for stack, _ in stacks))
+
+        self.assertEqual(self.client.get("/admin/profiles/unknown.pstats").status_code, 404)
+
+    def test_sampling_keeps_last_profiles(self):
+        """Тест случайной выборки запросов и хранения последних N профилей"""
+        self.profiler.keep = 2
+        self.client.put("/admin/profiling", params={"enabled": True, "sample_rate": 1})
+
+        ids = [self.client.get("/cities").headers["X-Profile-Id"] for _ in range(3)]
+
+        stored = [profile["id"] for profile in self.client.get("/admin/profiles").json()]
+        self.assertEqual(stored, ids[:0:-1])
+        self.assertEqual(self.client.put("/admin/profiling", params={"sample_rate": 2}).status_code, 422)
+
+    def test_admin_token(self):
+        """Тест защиты административных запросов токеном"""
+        with patch.object(api, "ADMIN_TOKEN", "admin-token"):
+            self.assertEqual(self.client.get("/admin/profiles").status_code, 403)
+            response = self.client.get("/admin/profiles", headers={"X-Admin-Token": "admin-token"})
+            self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
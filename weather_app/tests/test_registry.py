@@ -0,0 +1,141 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import joblib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import registry
+
+class TestModelRegistry(unittest.TestCase):
+    
+    def setUp(self):
+        """Временный каталог с артефактом"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "artifact.joblib")
+        joblib.dump({"version": 1}, self.path)
+        self.loads = []
+        self.registry = registry.ModelRegistry(loader=self.loader)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def loader(self, path):
+        """Загрузчик, запоминающий обращения к диску"""
+        self.loads.append(path)
+        return joblib.load(path)
+    
+    def test_loads_once(self):
+        """Тест однократной загрузки артефакта"""
+        for _ in range(3):
+            self.assertEqual(self.registry.get(self.path), {"version": 1})
+        
+        self.assertEqual(len(self.loads), 1)
+        stats = self.registry.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["loads"], 1)
+        self.assertEqual(stats["artifacts"][self.path]["hits"], 2)
+        self.assertGreater(stats["load_time_total"], 0.0)
+    
+    def test_reload_on_file_change(self):
+        """Тест перезагрузки после изменения файла"""
+        self.registry.get(self.path)
+        
+        joblib.dump({"version": 2, "payload": list(range(100))}, self.path)
+        # Гарантируем новое время модификации даже на ФС с грубой точностью
+        later = time.time() + 5
+        os.utime(self.path, (later, later))
+        
+        self.assertEqual(self.registry.get(self.path)["version"], 2)
+        self.assertEqual(len(self.loads), 2)
+    
+    def test_version_stamp(self):
+        """Тест инвалидации по номеру версии"""
+        self.registry.get(self.path, version=1)
+        self.registry.get(self.path, version=1)
+        self.registry.get(self.path, version=2)
+        
+        self.assertEqual(len(self.loads), 2)
+    
+    def test_publish_replaces_without_loading(self):
+        """Тест публикации нового объекта без чтения с диска"""
+        self.registry.get(self.path)
+        
+        joblib.dump({"version": 3}, self.path)
+        self.registry.publish({self.path: {"version": 3}})
+        
+        self.assertEqual(self.registry.get(self.path), {"version": 3})
+        self.assertEqual(len(self.loads), 1)
+    
+    def test_missing_file(self):
+        """Тест ошибки для отсутствующего файла"""
+        with self.assertRaises(FileNotFoundError):
+            self.registry.get(os.path.join(self.temp_dir.name, "missing.joblib"))
+    
+    def test_lru_eviction(self):
+        """Тест ограничения числа артефактов в памяти"""
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f"city_{i}.joblib")
+            joblib.dump({"city": i}, path)
+            paths.append(path)
+        
+        limited = registry.ModelRegistry(loader=self.loader, max_entries=2)
+        limited.get(paths[0])
+        limited.get(paths[1])
+        limited.get(paths[0])  # paths[0] становится самым свежим
+        limited.get(paths[2])  # вытесняется paths[1]
+        
+        stats = limited.stats()
+        self.assertEqual(stats["resident"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(set(stats["artifacts"]), {paths[0], paths[2]})
+    
+    def test_invalidate(self):
+        """Тест удаления записи из памяти"""
+        self.registry.get(self.path)
+        self.registry.invalidate(self.path)
+        self.registry.get(self.path)
+        
+        self.assertEqual(len(self.loads), 2)
+
+    def test_loading_locks_released(self):
+        """Тест: блокировки загрузки не копятся ни после загрузок, ни после ошибок"""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_loader(path):
+            started.set()
+            release.wait(5)
+            return self.loader(path)
+        
+        slow = registry.ModelRegistry(loader=slow_loader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow.get(self.path))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        self.assertEqual(slow.stats()["loading"], 1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        
+        self.assertEqual(results, [{"version": 1}] * 4)
+        self.assertEqual(len(self.loads), 1)
+        
+        for i in range(50):
+            path = os.path.join(self.temp_dir.name, f"city_{i}.joblib")
+            joblib.dump({"city": i}, path)
+            slow.get(path)
+        with self.assertRaises(FileNotFoundError):
+            slow.get(os.path.join(self.temp_dir.name, "missing.joblib"), version=1)
+        
+        self.assertEqual(slow.stats()["loading"], 0)
+        self.assertEqual(slow._loading, {})
+
+if __name__ == '__main__':
+    unittest.main()
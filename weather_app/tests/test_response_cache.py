@@ -0,0 +1,166 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from backend.app import database, ml_model, response_cache
+from backend.app.api import app
+from backend.app.models import ModelConfig, WeatherData
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_lru_and_ttl(self):
+        """Тест вытеснения давно не использованных и устаревших ответов"""
+        cache = response_cache.ResponseCache(max_entries=2, ttl=60)
+        cache.put("a", b"1", None)
+        cache.put("b", b"2", None)
+        cache.get("a")
+        cache.put("c", b"3", None)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a").body, b"1")
+
+        with patch("backend.app.response_cache.time.monotonic", return_value=10 ** 9):
+            self.assertIsNone(cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["expirations"], 1)
+
+    def test_stale_response_not_stored(self):
+        """Тест: ответ, вычисленный до записи данных, не попадает в кэш"""
+        cache = response_cache.ResponseCache()
+        generation = cache.generation("Москва")
+        cache.invalidate_city("Москва")
+        cache.put("weather", b"[]", "Москва", generation)
+
+        self.assertIsNone(cache.get("weather"))
+
+    def test_etag_matches(self):
+        """Тест разбора If-None-Match"""
+        self.assertTrue(response_cache.etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(response_cache.etag_matches("*", '"abc"'))
+        self.assertFalse(response_cache.etag_matches('"x"', '"abc"'))
+        self.assertFalse(response_cache.etag_matches(None, '"abc"'))
+
+class TestCachedEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД, каталог моделей и пустой кэш ответов"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        self.original_model_dir = ml_model.MODEL_DIR
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        ml_model.MODEL_DIR = os.path.join(self.temp_dir.name, "models")
+        database.init_db()
+        response_cache.response_cache.clear()
+
+        self.today = datetime.date.today()
+        database.save_weather_data([self.item("Москва", i) for i in range(10)])
+        response_cache.response_cache.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        response_cache.response_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        ml_model.MODEL_DIR = self.original_model_dir
+        self.temp_dir.cleanup()
+
+    def item(self, city, days_ago, temperature=15.0):
+        return WeatherData(
+            city=city,
+            date=self.today - datetime.timedelta(days=days_ago),
+            temperature=temperature + days_ago % 4,
+            humidity=60.0 + days_ago % 5,
+            pressure=1013.0,
+            wind_speed=3.0,
+            precipitation=float(days_ago % 3),
+            weather_condition="Ясно"
+        )
+
+    def test_cache_hit_and_not_modified(self):
+        """Тест повторного запроса из кэша и ответа 304 по ETag"""
+        with patch("backend.app.database.get_all_cities", wraps=database.get_all_cities) as mock_cities:
+            first = self.client.get("/cities")
+            second = self.client.get("/cities")
+            not_modified = self.client.get("/cities", headers={"If-None-Match": first.headers["ETag"]})
+
+        self.assertEqual(first.json(), ["Москва"])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(mock_cities.call_count, 1)
+
+        stats = self.client.get("/stats/response_cache").json()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["not_modified"], 1)
+
+    def test_params_normalized(self):
+        """Тест: значения по умолчанию и порядок параметров не меняют ключ"""
+        first = self.client.get("/weather", params={"city": "Москва"})
+        second = self.client.get("/weather?days=7&city=Москва")
+
+        self.assertEqual(len(first.json()), 8)
+        self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertEqual(response_cache.response_cache.stats()["hits"], 1)
+
+    def test_weather_range_pages(self):
+        """Тест постраничной выборки /weather: курсор сохраняется в кэшированном ответе"""
+        database.save_weather_data([self.item("Сочи", i) for i in range(3)])
+        params = {"city": ["Сочи", "Москва"], "days": 0, "fields": "city,date", "limit": 5}
+
+        first = self.client.get("/weather", params=params)
+        cached = self.client.get("/weather", params=params)
+        self.assertEqual(cached.headers["X-Next-Cursor"], first.headers["X-Next-Cursor"])
+        self.assertEqual([row["city"] for row in first.json()], ["Москва"] * 5)
+
+        rows = first.json()
+        cursor = first.headers["X-Next-Cursor"]
+        while cursor:
+            page = self.client.get("/weather", params={**params, "cursor": cursor})
+            rows += page.json()
+            cursor = page.headers.get("X-Next-Cursor")
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row["city"], row["date"])))
+
+        self.assertEqual(self.client.get("/weather", params={**params, "cursor": "???"}).status_code, 400)
+
+    def test_invalidated_by_weather_write(self):
+        """Тест сброса ответов города и общих ответов при сохранении данных"""
+        weather = self.client.get("/weather", params={"city": "Москва"})
+        cities = self.client.get("/cities")
+
+        database.save_weather_data([self.item("Москва", 0, temperature=30.0), self.item("Сочи", 0)])
+
+        new_weather = self.client.get("/weather", params={"city": "Москва"},
+                                      headers={"If-None-Match": weather.headers["ETag"]})
+        self.assertEqual(new_weather.status_code, 200)
+        self.assertNotEqual(new_weather.headers["ETag"], weather.headers["ETag"])
+        self.assertEqual(new_weather.json()[0]["temperature"], 30.0)
+        self.assertEqual(self.client.get("/cities").json(), ["Москва", "Сочи"])
+        self.assertNotEqual(cities.headers["ETag"], self.client.get("/cities").headers["ETag"])
+
+    def test_forecast_invalidated_by_training(self):
+        """Тест сброса кэшированного прогноза после обучения новой модели"""
+        self.assertEqual(self.client.get("/forecast", params={"city": "Москва"}).status_code, 404)
+
+        ml_model.train_model(database.get_weather_data("Москва", 30), ModelConfig(n_estimators=5))
+        first = self.client.get("/forecast", params={"city": "Москва", "days": 3})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get("/forecast", params={"city": "Москва", "days": 3}).headers["ETag"],
+                         first.headers["ETag"])
+
+        hits = response_cache.response_cache.stats()["hits"]
+        ml_model.train_model(database.get_weather_data("Москва", 30), ModelConfig(n_estimators=7))
+        self.client.get("/forecast", params={"city": "Москва", "days": 3})
+        self.assertEqual(response_cache.response_cache.stats()["hits"], hits)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,16 @@ import unittest
 from unittest.mock import patch, Mock
 import datetime
 import sys
+import time
 import os
+import tempfile
 
 # Путь к модулям, которые мы тестируем
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend', 'app')))
 
 # Импорт модулей для тестирования
 import scraper
+from backend.app import database
 from backend.app.models import WeatherData, WeatherForecast
 
 class TestWeatherScraper(unittest.TestCase):
@@ -19,6 +22,20 @@ class TestWeatherScraper(unittest.TestCase):
         self.today = datetime.date.today()
         self.yesterday = self.today - datetime.timedelta(days=1)
         
+        # Временная БД для кэша геокодирования
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        scraper.geocode_cache.clear()
+    
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        scraper.geocode_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+        
     def test_get_weather_condition(self):
         """Тест функции получения текстового описания погоды по коду"""
         # Проверяем различные коды погоды
@@ -61,7 +78,7 @@ class TestWeatherScraper(unittest.TestCase):
         
         self.assertGreater(sum(summer_temps)/len(summer_temps), sum(winter_temps)/len(winter_temps))
     
-    @patch('scraper.requests.get')
+    @patch('backend.app.http_client.HttpClient.get')
     def test_get_weather_from_api_success(self, mock_get):
         """Тест успешного получения данных о погоде через API"""
         # Мокаем ответ от API для геокоординат
@@ -101,7 +118,7 @@ class TestWeatherScraper(unittest.TestCase):
         self.assertEqual(result["precipitation"], 0)
         self.assertEqual(result["weather_condition"], "Ясно")
     
-    @patch('scraper.requests.get')
+    @patch('backend.app.http_client.HttpClient.get')
     def test_get_weather_from_api_city_not_found(self, mock_get):
         """Тест получения данных о погоде для несуществующего города"""
         # Мокаем ответ от API для геокоординат - пустой список
@@ -117,7 +134,7 @@ class TestWeatherScraper(unittest.TestCase):
         # Проверяем, что результат None для несуществующего города
         self.assertIsNone(result)
     
-    @patch('scraper.requests.get')
+    @patch('backend.app.http_client.HttpClient.get')
     def test_get_weather_from_api_with_rain(self, mock_get):
         """Тест получения данных о погоде с дождем"""
         # Мокаем ответ от API для геокоординат
@@ -156,6 +173,46 @@ class TestWeatherScraper(unittest.TestCase):
         self.assertEqual(result["precipitation"], 3.5)
         self.assertEqual(result["weather_condition"], "Дождь")
     
+    @patch('backend.app.http_client.HttpClient.get')
+    def test_get_weather_from_api_uses_geocode_cache(self, mock_get):
+        """Тест повторного использования координат города без запроса к API"""
+        mock_geo_response = Mock()
+        mock_geo_response.raise_for_status = Mock()
+        mock_geo_response.json.return_value = [{"lat": 55.7558, "lon": 37.6173}]
+        
+        mock_weather_response = Mock()
+        mock_weather_response.raise_for_status = Mock()
+        mock_weather_response.json.return_value = {
+            "main": {"temp": 10.5, "humidity": 70, "pressure": 1015},
+            "wind": {"speed": 5.2},
+            "weather": [{"id": 800}]
+        }
+        
+        # Геокодирование только при первом вызове, далее - только запросы погоды
+        mock_get.side_effect = [mock_geo_response, mock_weather_response, mock_weather_response]
+        
+        scraper.get_weather_from_api(self.test_city, self.today)
+        result = scraper.get_weather_from_api("  москва ", self.today)
+        
+        self.assertEqual(result["temperature"], 10.5)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_get.call_args_list[2].kwargs["params"]["lat"], 55.7558)
+        self.assertEqual(scraper.geocode_cache.stats()["memory_hits"], 1)
+    
+    @patch('backend.app.http_client.HttpClient.get')
+    def test_get_weather_from_api_negative_cache(self, mock_get):
+        """Тест кэширования ответа 'город не найден'"""
+        mock_geo_response = Mock()
+        mock_geo_response.raise_for_status = Mock()
+        mock_geo_response.json.return_value = []
+        mock_get.return_value = mock_geo_response
+        
+        self.assertIsNone(scraper.get_weather_from_api("НесуществующийГород", self.today))
+        self.assertIsNone(scraper.get_weather_from_api("НесуществующийГород", self.today))
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(scraper.geocode_cache.stats()["negative_hits"], 1)
+    
     @patch('scraper.get_weather_from_api')
     def test_scrape_weather_data(self, mock_get_weather):
         """Тест функции сбора данных о погоде за период"""
@@ -194,5 +251,110 @@ class TestWeatherScraper(unittest.TestCase):
         self.assertEqual(result[-1].date, self.today)
         self.assertEqual(result[0].date, self.today - datetime.timedelta(days=9))
 
+    def test_scrape_weather_data_long_period(self):
+        """Тест сбора данных за год без последовательных пауз"""
+        start_date = self.today - datetime.timedelta(days=364)
+        
+        started = time.perf_counter()
+        result = scraper.scrape_weather_data(self.test_city, start_date, self.today)
+        elapsed = time.perf_counter() - started
+        
+        self.assertEqual(len(result), 365)
+        self.assertEqual([item.date for item in result][:2], [start_date, start_date + datetime.timedelta(days=1)])
+        self.assertLess(elapsed, 5.0)
+
+    def test_plan_incremental_scrape(self):
+        """Тест выбора диапазонов для инкрементного сбора"""
+        start_date = self.today - datetime.timedelta(days=19)
+        day = lambda offset: start_date + datetime.timedelta(days=offset)
+        database.save_weather_data(
+            scraper.fetcher.run_sync(scraper.scrape_weather_ranges_async(self.test_city, [(day(0), day(9)), (day(12), day(16))]))
+        )
+        
+        self.assertEqual(scraper.plan_incremental_scrape(self.test_city, start_date, self.today),
+                         ([(day(10), day(11)), (day(17), day(19))], 15))
+        # Последние дни периода собираются заново, даже если данные за них есть
+        self.assertEqual(scraper.plan_incremental_scrape(self.test_city, start_date, day(16), refresh_days=3),
+                         ([(day(10), day(11)), (day(14), day(16))], 12))
+        self.assertEqual(scraper.plan_incremental_scrape(self.test_city, start_date, day(9)), ([], 10))
+
+class TestIncrementalScrapeEndpoint(unittest.TestCase):
+    
+    def setUp(self):
+        """Временная БД и клиент API"""
+        from fastapi.testclient import TestClient
+        from backend.app.api import app
+        
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        self.client = TestClient(app)
+        self.today = datetime.date.today()
+    
+    def tearDown(self):
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+    
+    def scrape(self, **params):
+        response = self.client.post("/scrape", params={
+            "city": "Москва",
+            "start_date": (self.today - datetime.timedelta(days=364)).isoformat(),
+            "end_date": self.today.isoformat(),
+            "incremental": True,
+            **params
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_repeated_backfill_fetches_nothing(self):
+        """Тест: повторный сбор за тот же год не запрашивает уже собранные даты"""
+        first = self.scrape()
+        self.assertEqual((first["fetched"], first["skipped"], first["updated"]), (365, 0, 0))
+        
+        with patch("backend.app.scraper.fetch_weather_async") as mock_fetch:
+            second = self.scrape()
+        mock_fetch.assert_not_called()
+        self.assertEqual((second["fetched"], second["skipped"], second["updated"]), (0, 365, 0))
+        
+        refreshed = self.scrape(refresh_days=3)
+        self.assertEqual((refreshed["fetched"], refreshed["skipped"], refreshed["updated"]), (3, 362, 3))
+        
+        log = max((log for log in database.get_scraping_logs("Москва", 10) if log["status"] == "success"),
+                  key=lambda log: log["id"])
+        self.assertEqual((log["fetched"], log["skipped"], log["updated"]), (3, 362, 3))
+        self.assertEqual(database.get_data_availability("Москва")["count"], 365)
+
+    def test_failed_days_not_counted_as_skipped(self):
+        """Тест: дни, которые не удалось собрать, не считаются пропущенными"""
+        generate = scraper.generate_weather_data
+
+        def flaky_generate(city, date):
+            # Каждый пятый день приходит с недопустимой влажностью и отбрасывается проверкой
+            data = generate(city, date)
+            return {**data, "humidity": 150.0} if date.toordinal() % 5 == 0 else data
+
+        with patch("backend.app.scraper.generate_weather_data", side_effect=flaky_generate):
+            first = self.scrape()
+        self.assertEqual((first["fetched"], first["skipped"]), (292, 0))
+
+        # Повторный сбор запрашивает только недостающие дни
+        second = self.scrape()
+        self.assertEqual((second["fetched"], second["skipped"]), (73, 292))
+
+    def test_startup_does_not_wait_for_geocode_warm_up(self):
+        """Тест: прогрев кэша геокодирования идёт в фоне и не задерживает запуск"""
+        import threading
+        release = threading.Event()
+        
+        with patch("backend.app.scraper.warm_up_geocode_cache", side_effect=lambda cities: release.wait(10)) as warm_up:
+            try:
+                with self.client:
+                    self.assertEqual(self.client.get("/cities").status_code, 200)
+            finally:
+                release.set()
+        warm_up.assert_called_once_with([])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import unittest
+import datetime
+import json
+import os
+import sys
+import tempfile
+
+import msgpack
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from backend.app import database, response_cache, serialization
+from backend.app.api import app
+from backend.app.models import WeatherData
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [
+            WeatherData(id=i, city="Москва", date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                        temperature=-1.5 + i, humidity=60.0, pressure=1013.0, wind_speed=3.0,
+                        precipitation=0.0, weather_condition="Ясно",
+                        created_at=datetime.datetime(2024, 2, 1, 12, 30))
+            for i in range(3)
+        ]
+
+    def test_json_matches_default_encoder(self):
+        """Тест: orjson даёт тот же JSON, что и jsonable_encoder"""
+        encoded = serialization.encode_json(self.items)
+        self.assertEqual(json.loads(encoded), jsonable_encoder(self.items))
+        self.assertIn("Москва".encode("utf-8"), encoded)
+
+    def test_msgpack_round_trip(self):
+        """Тест: MessagePack содержит те же значения, что и JSON"""
+        decoded = msgpack.unpackb(serialization.encode_msgpack(self.items))
+        self.assertEqual(decoded, jsonable_encoder(self.items))
+
+    @unittest.skipUnless(serialization.pa is not None, "pyarrow не установлен")
+    def test_arrow_columns(self):
+        """Тест таблицы Arrow: даты из строк ISO приводятся к date32"""
+        rows = [{"date": "2024-01-01", "temperature": 1.5}, {"date": "2024-01-02", "temperature": None}]
+        table = serialization.pa.ipc.open_stream(serialization.encode_arrow(rows)).read_all()
+
+        self.assertEqual(table.schema.field("date").type, serialization.pa.date32())
+        self.assertEqual(table.column("date").to_pylist(), [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)])
+        self.assertEqual(table.column("temperature").to_pylist(), [1.5, None])
+
+        table = serialization.pa.ipc.open_stream(serialization.encode_arrow(self.items)).read_all()
+        self.assertEqual(table.num_rows, 3)
+        with self.assertRaises(serialization.NotAcceptableError):
+            serialization.encode_arrow({"a": 1})
+
+    def test_negotiate(self):
+        """Тест выбора формата по заголовку Accept"""
+        offered = (serialization.JSON_MEDIA_TYPE, serialization.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(serialization.negotiate(None, offered), serialization.JSON_MEDIA_TYPE)
+        self.assertEqual(serialization.negotiate("*/*", offered), serialization.JSON_MEDIA_TYPE)
+        self.assertEqual(serialization.negotiate("application/x-msgpack", offered), serialization.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(
+            serialization.negotiate("application/json;q=0.5, application/*;q=0.9", offered),
+            serialization.JSON_MEDIA_TYPE
+        )
+        self.assertEqual(
+            serialization.negotiate("application/json;q=0.5, application/msgpack", offered),
+            serialization.MSGPACK_MEDIA_TYPE
+        )
+        with self.assertRaises(serialization.NotAcceptableError):
+            serialization.negotiate("text/csv, application/json;q=0", offered)
+
+class TestWeatherFormats(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД и пустой кэш ответов"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        today = datetime.date.today()
+        database.save_weather_data([
+            WeatherData(city="Москва", date=today - datetime.timedelta(days=i), temperature=10.0 + i,
+                        humidity=60.0, pressure=1013.0, wind_speed=3.0, precipitation=0.0,
+                        weather_condition="Ясно")
+            for i in range(5)
+        ])
+        response_cache.response_cache.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        response_cache.response_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def test_weather_content_negotiation(self):
+        """Тест: /weather отдаёт JSON по умолчанию и MessagePack по Accept"""
+        params = {"city": "Москва"}
+        as_json = self.client.get("/weather", params=params)
+        as_msgpack = self.client.get("/weather", params=params, headers={"Accept": "application/msgpack"})
+
+        self.assertEqual(as_json.headers["content-type"], "application/json")
+        self.assertEqual(as_msgpack.headers["content-type"], "application/msgpack")
+        self.assertEqual(as_msgpack.headers["vary"], "Accept")
+        self.assertEqual(msgpack.unpackb(as_msgpack.content), as_json.json())
+        self.assertNotEqual(as_msgpack.headers["ETag"], as_json.headers["ETag"])
+
+        self.assertEqual(self.client.get("/weather", params=params, headers={"Accept": "text/csv"}).status_code, 406)
+        # Остальные эндпоинты отдают только JSON
+        self.assertEqual(self.client.get("/cities", headers={"Accept": "application/msgpack"}).status_code, 406)
+
+    @unittest.skipUnless(serialization.pa is not None, "pyarrow не установлен")
+    def test_weather_arrow(self):
+        """Тест загрузки /weather в pandas из Arrow IPC"""
+        response = self.client.get(
+            "/weather", params={"city": "Москва", "days": 0, "fields": "date,temperature"},
+            headers={"Accept": serialization.ARROW_MEDIA_TYPE}
+        )
+        frame = serialization.pa.ipc.open_stream(response.content).read_pandas()
+
+        self.assertEqual(response.headers["content-type"], serialization.ARROW_MEDIA_TYPE)
+        self.assertEqual(list(frame.columns), ["date", "temperature"])
+        self.assertEqual(frame["temperature"].tolist(), [14.0, 13.0, 12.0, 11.0, 10.0])
+
+if __name__ == '__main__':
+    unittest.main()
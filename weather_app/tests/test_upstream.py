@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, scraper
+from benchmarks import load
+from benchmarks.fake_openweather import FakeOpenWeather
+
+class TestFakeOpenWeather(unittest.TestCase):
+
+    def setUp(self):
+        """Временная БД, локальная замена OpenWeatherMap и её адрес в скрапере"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_database_path = database.DATABASE_PATH
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, "weather.db")
+        database.init_db()
+        scraper.geocode_cache.clear()
+
+        self.original_api = (scraper.OPENWEATHER_BASE_URL, scraper.OPENWEATHER_API_KEY)
+        self.upstream = FakeOpenWeather(unknown_cities=["Атлантида"], seed=1).start()
+        scraper.configure_api(self.upstream.url, self.upstream.api_key)
+        self.today = datetime.date.today()
+
+    def tearDown(self):
+        scraper.configure_api(*self.original_api)
+        self.upstream.stop()
+        scraper.geocode_cache.clear()
+        database.close_pool()
+        database.DATABASE_PATH = self.original_database_path
+        self.temp_dir.cleanup()
+
+    def test_configure_api(self):
+        """Тест смены адреса и ключа OpenWeatherMap API"""
+        self.assertEqual(scraper.GEO_URL, f"{self.upstream.url}/geo/1.0/direct")
+        self.assertEqual(scraper.WEATHER_URL, f"{self.upstream.url}/data/2.5/weather")
+        self.assertTrue(scraper.is_api_configured())
+
+    def test_current_weather(self):
+        """Тест запроса текущей погоды через замену: координаты запрашиваются один раз"""
+        first = scraper.get_weather_from_api("Тверь", self.today)
+        second = scraper.get_weather_from_api("Тверь", self.today)
+
+        for weather in (first, second):
+            self.assertEqual(set(weather), {"temperature", "humidity", "pressure", "wind_speed",
+                                            "precipitation", "weather_condition"})
+        stats = self.upstream.stats()
+        self.assertEqual((stats["geo 200"], stats["weather 200"]), (1, 2))
+
+    def test_invalid_key_and_unknown_city(self):
+        """Тест ответа 401 на неверный ключ и пустого ответа геокодирования"""
+        self.assertIsNone(scraper.get_weather_from_api("Атлантида", self.today))
+
+        scraper.configure_api(api_key="неверный-ключ")
+        self.assertIsNone(scraper.get_weather_from_api("Тверь", self.today))
+        self.assertEqual(self.upstream.stats()["geo 401"], 1)
+
+    @patch('backend.app.fetcher.backoff_delay', return_value=0.0)
+    def test_rate_limited_scrape_falls_back(self, mock_backoff):
+        """Тест ответов 429: после всех повторов данные за сегодня генерируются"""
+        self.upstream.configure(rate_limit_rate=1.0)
+
+        data = scraper.scrape_weather_data("Тверь", self.today, self.today)
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(self.upstream.stats()["geo 429"], 4)
+
+    def test_load_driver(self):
+        """Тест нагрузочного драйвера на встроенном бэкенде"""
+        with load.embedded_backend(["Тверь"], self.upstream, history_days=20) as base_url:
+            samples, elapsed = asyncio.run(load.drive(
+                base_url, load.ENDPOINTS, ["Тверь"], concurrency=4, requests=10, duration=None
+            ))
+
+        summary = load.summarize(samples, elapsed)
+        self.assertEqual(summary["всего"]["requests"], 10)
+        self.assertEqual(summary["scrape"]["statuses"], {"200": 5})
+        self.assertEqual(summary["forecast"]["statuses"], {"200": 5})
+        self.assertLessEqual(summary["всего"]["p50_ms"], summary["всего"]["p99_ms"])
+        self.assertEqual(self.upstream.stats()["weather 200"], 5)
+
+    def test_percentile(self):
+        """Тест процентилей с линейной интерполяцией"""
+        values = [1.0, 2.0, 3.0, 4.0]
+        self.assertEqual(load.percentile(values, 50), 2.5)
+        self.assertEqual(load.percentile(values, 100), 4.0)
+        self.assertEqual(load.percentile([], 99), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
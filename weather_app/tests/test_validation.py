@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import ValidationError
+
+from backend.app import models, scraper, validation
+from backend.app.models import WeatherData
+
+class TestValidateWeatherBatch(unittest.TestCase):
+
+    def row(self, **overrides):
+        row = {
+            "city": "Москва", "date": "2024-01-01", "temperature": 15.04, "humidity": 60.0,
+            "pressure": 1013.0, "wind_speed": 3.0, "precipitation": 0.0, "weather_condition": "Ясно",
+        }
+        row.update(overrides)
+        return row
+
+    def test_matches_model_validation(self):
+        """Тест: корректные строки совпадают с WeatherData, построенными по одной"""
+        rng = random.Random(42)
+        conditions = list(models.WEATHER_CONDITIONS) + ["сильный дождь", "Ясно, ветрено", "Смог"]
+        rows = [
+            self.row(
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                temperature=rng.uniform(-40, 40), humidity=rng.uniform(0, 100),
+                pressure=rng.uniform(950, 1050), wind_speed=rng.uniform(0, 20),
+                precipitation=rng.uniform(0, 10), weather_condition=rng.choice(conditions),
+            )
+            for i in range(500)
+        ]
+
+        batch = validation.validate_weather_batch(rows)
+
+        self.assertEqual(batch.errors, [])
+        self.assertEqual(batch.to_models(), [WeatherData(**row) for row in rows])
+
+    def test_error_report(self):
+        """Тест отчёта об ошибках: некорректные строки не мешают остальным"""
+        rows = [
+            self.row(),
+            self.row(temperature=150, humidity=None),
+            self.row(date="не дата", wind_speed="быстро"),
+            self.row(pressure=float("nan"), weather_condition=None),
+            self.row(date=datetime.date(2024, 1, 2), temperature="-3.25"),
+        ]
+
+        batch = validation.validate_weather_batch(rows)
+
+        self.assertEqual([record["date"] for record in batch.records],
+                         [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)])
+        self.assertEqual(batch.records[1]["temperature"], WeatherData(**rows[4]).temperature)
+        self.assertEqual([error["index"] for error in batch.errors], [1, 2, 3])
+        self.assertEqual(batch.errors[0]["errors"], {
+            "temperature": models.WEATHER_VALUE_RANGES["temperature"][2],
+            "humidity": "Ожидается число",
+        })
+        self.assertEqual(set(batch.errors[1]["errors"]), {"date", "wind_speed"})
+        self.assertEqual(set(batch.errors[2]["errors"]), {"pressure", "weather_condition"})
+
+        # Одиночная модель на границе API по-прежнему отклоняет такие строки
+        with self.assertRaises(ValidationError):
+            WeatherData(**rows[1])
+
+    def test_rounding_matches_round(self):
+        """Тест округления до десятых на значениях около половины десятой"""
+        values = [0.15, 0.25, 2.675, 1.05, -0.05, -2.45, 12.349999, 10.95, 0.04999999999]
+        batch = validation.validate_weather_batch([self.row(precipitation=abs(v), temperature=v) for v in values])
+
+        self.assertEqual([record["temperature"] for record in batch.records], [round(v, 1) for v in values])
+        self.assertEqual([record["precipitation"] for record in batch.records], [round(abs(v), 1) for v in values])
+
+    def test_normalize_weather_condition(self):
+        """Тест нормализации описания погоды"""
+        self.assertEqual(models.normalize_weather_condition("Снег"), "Снег")
+        self.assertEqual(models.normalize_weather_condition("Небольшой ДОЖДЬ"), "Дождь")
+        self.assertEqual(models.normalize_weather_condition("Смог"), "Неизвестно")
+
+    def test_scraper_skips_invalid_rows(self):
+        """Тест: скрапер сохраняет корректные дни, если данные за один день некорректны"""
+        start = datetime.date(2024, 1, 1)
+
+        async def fetch(client, city, date):
+            data = scraper.generate_weather_data(city, date)
+            if date == start:
+                data["humidity"] = 250.0
+            return data
+
+        with patch("backend.app.scraper.fetch_weather_async", side_effect=fetch):
+            result = scraper.fetcher.run_sync(
+                scraper.scrape_weather_ranges_async("Москва", [(start, start + datetime.timedelta(days=4))])
+            )
+
+        self.assertEqual([item.date for item in result], [start + datetime.timedelta(days=i) for i in range(1, 5)])
+        self.assertIsInstance(result[0], WeatherData)
+
+if __name__ == '__main__':
+    unittest.main()